@@ -1,21 +1,127 @@
 from __future__ import (absolute_import, division, print_function)
 from future.utils import iteritems
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import numpy as np
 import pandas as pd
 # import fastparquet as fp
-import netCDF4 as nc
 # import xarray as xr
-from collections import OrderedDict
+from collections import namedtuple, OrderedDict
 
-from pyPRMS.prms_helpers import dparse
+from pyPRMS.prms_helpers import datetime_index, set_time_index
 from pyPRMS.constants import REGIONS
 
 CBH_VARNAMES = ['prcp', 'tmin', 'tmax']
 CBH_INDEX_COLS = [0, 1, 2, 3, 4, 5]
 
 
+def _read_columns(filename, columns):
+    """Read the time information and the given columns of a CBH file.
+
+    :param str filename: name of the CBH file (plain or gzip-compressed)
+    :param list[int] columns: 0-based columns to read
+    :returns: time information (one row per time step), and the values of the columns in the given order
+    :rtype: (np.ndarray, np.ndarray)
+    """
+
+    # Override Pandas' rather stupid default of float64
+    df = pd.read_csv(filename, sep=' ', skipinitialspace=True,
+                     usecols=CBH_INDEX_COLS + list(columns), dtype={xx: np.float32 for xx in columns},
+                     skiprows=3, engine='c', header=None, na_values=[-99.0, -999.0, 'NaN', 'inf'])
+    return df[CBH_INDEX_COLS].to_numpy(dtype=np.int64), df[list(columns)].to_numpy(dtype=np.float32)
+
+
+CbhBlock = namedtuple('CbhBlock', ['time', 'values'])
+CbhBlock.__doc__ = """A block of consecutive time steps of CBH data.
+
+time is a DatetimeIndex of the time steps and values is a float32 array
+with one row per time step and one column per HRU.
+"""
+
+
+def _block_reader(filename, columns, block_size):
+    """Open a reader which returns blocks of rows of a CBH file.
+
+    :param str filename: name of the CBH file (plain or gzip-compressed)
+    :param columns: 0-based columns to read; None reads all columns
+    :type columns: list[int] or None
+    :param int block_size: number of time steps per block
+    :rtype: pd.io.parsers.TextFileReader
+    """
+
+    # Time information is exact in float32 and converted to integers per block
+    return pd.read_csv(filename, sep=' ', skipinitialspace=True,
+                       usecols=None if columns is None else CBH_INDEX_COLS + list(columns), dtype=np.float32,
+                       skiprows=3, engine='c', header=None, na_values=[-99.0, -999.0, 'NaN', 'inf'],
+                       chunksize=block_size)
+
+
+def _next_block(reader, columns):
+    """Read the next block of rows from a reader of _block_reader().
+
+    :returns: time information and values of the columns in the given order; None at the end of the file
+    :rtype: (np.ndarray, np.ndarray) or None
+    """
+
+    try:
+        df = next(reader)
+    except StopIteration:
+        return None
+
+    values = df.iloc[:, len(CBH_INDEX_COLS):] if columns is None else df[list(columns)]
+    return df[CBH_INDEX_COLS].to_numpy(dtype=np.int64), values.to_numpy(dtype=np.float32)
+
+
+def _restrict_block(time_fields, values, st_date=None, en_date=None):
+    """Create a CbhBlock restricted to a date range.
+
+    :returns: the block (possibly empty), and True if the block reaches past the end date
+    :rtype: (CbhBlock, bool)
+    """
+
+    index = datetime_index(*time_fields.T, name='time')
+    rows = index.slice_indexer(st_date, en_date)
+
+    past_end = en_date is not None and len(index) > 0 and index[-1] >= en_date
+    return CbhBlock(index[rows], values[rows]), past_end
+
+
+def iter_cbh_blocks(filename, columns=None, block_size=366, st_date=None, en_date=None):
+    """Read a CBH file in blocks of time steps.
+
+    Only one block of the file is held in memory at a time, so files of any
+    size (plain text or gzip-compressed) can be processed. Blocks have at
+    most block_size time steps; the first and last blocks of a restricted
+    date range can have fewer.
+
+    :param str filename: name of the CBH file
+    :param columns: 0-based columns to read (the first HRU is column 6); None reads all HRUs
+    :type columns: list[int] or None
+    :param int block_size: number of time steps per block
+    :param st_date: first date to return; None starts at the beginning of the file
+    :type st_date: datetime or None
+    :param en_date: last date to return; None continues to the end of the file
+    :type en_date: datetime or None
+    :returns: generator of blocks with the columns in the given order
+    :rtype: generator[CbhBlock]
+    """
+
+    with _block_reader(filename, columns, block_size) as reader:
+        while True:
+            chunk = _next_block(reader, columns)
+
+            if chunk is None:
+                break
+
+            block, past_end = _restrict_block(chunk[0], chunk[1], st_date, en_date)
+
+            if len(block.time) > 0:
+                yield block
+            if past_end:
+                break
+
+
 class CbhAscii(object):
 
     """Class for handling classic climate-by-hru (CBH) files.
@@ -41,11 +147,13 @@ class CbhAscii(object):
     # took care of those corrections itself. This would provide a more seamless workflow
     # from GDP to PRMS. At this point I'm not taking this on though -- for a future revision.
 
-    def __init__(self, src_path=None, st_date=None, en_date=None, indices=None, nhm_hrus=None, mapping=None):
+    def __init__(self, src_path=None, st_date=None, en_date=None, indices=None, nhm_hrus=None, mapping=None,
+                 verbose=False):
         """Create CbhAscii object.
         """
 
         self.__src_path = src_path
+        self.__verbose = verbose
 
         # self.__indices = [str(kk) for kk in indices]
         self.__indices = indices    # OrdereDict: nhm_ids -> local_ids
@@ -59,6 +167,23 @@ class CbhAscii(object):
         self.__dataset = None
         self.__final_outorder = None
 
+        # Data read from the regional files (see read_cbh_multivar())
+        self.__region_cols = None
+        self.__var_data = OrderedDict()
+        self.__time_fields = None
+        self.__time_index = None
+        self.__time_slice = None
+
+    @property
+    def hru_ids(self):
+        """Get the NHM ids of the HRUs read from the regional CBH files.
+
+        :returns: HRU ids in the order of the columns of the data
+        :rtype: list[int]
+        """
+
+        return self._region_columns()[0]
+
     def read_cbh(self):
         """Reads an entire CBH file.
         """
@@ -76,8 +201,8 @@ class CbhAscii(object):
         # Columns 0-5 always represent date/time information
         self.__data = pd.read_csv(self.__src_path, sep=' ', skipinitialspace=True, usecols=incl_cols,
                                   skiprows=3, engine='c', memory_map=True,
-                                  date_parser=dparse, parse_dates={'time': CBH_INDEX_COLS},
-                                  index_col='time', header=None, na_values=[-99.0, -999.0])
+                                  header=None, na_values=[-99.0, -999.0])
+        set_time_index(self.__data, CBH_INDEX_COLS)
 
         if self.__stdate is not None and self.__endate is not None:
             self.__data = self.__data[self.__stdate:self.__endate]
@@ -103,8 +228,8 @@ class CbhAscii(object):
         # Columns 0-5 always represent date/time information
         self.__data = pd.read_csv(self.__src_path, sep=' ', skipinitialspace=True,
                                   skiprows=3, engine='c', memory_map=True,
-                                  date_parser=dparse, parse_dates={'time': CBH_INDEX_COLS},
-                                  index_col='time', header=None, na_values=[-99.0, -999.0])
+                                  header=None, na_values=[-99.0, -999.0])
+        set_time_index(self.__data, CBH_INDEX_COLS)
 
         if self.__stdate is not None and self.__endate is not None:
             self.__data = self.__data[self.__stdate:self.__endate]
@@ -124,6 +249,22 @@ class CbhAscii(object):
         self.__data['minute'] = 0
         self.__data['second'] = 0
 
+    def iter_cbh(self, block_size=366):
+        """Read the CBH file in blocks of time steps.
+
+        This is the streaming equivalent of read_cbh(); only one block is
+        held in memory at a time. When indices are given only those HRUs are
+        read, in the order of the indices.
+
+        :param int block_size: number of time steps per block
+        :returns: generator of blocks
+        :rtype: generator[CbhBlock]
+        """
+
+        columns = None if self.__indices is None else [xx + 5 for xx in self.__indices.values()]
+        return iter_cbh_blocks(self.__src_path, columns=columns, block_size=block_size,
+                               st_date=self.__stdate, en_date=self.__endate)
+
     def read_ascii_file(self, filename, columns=None):
         """Reads a single CBH file.
 
@@ -135,14 +276,12 @@ class CbhAscii(object):
             df = pd.read_csv(filename, sep=' ', skipinitialspace=True,
                              usecols=columns,
                              skiprows=3, engine='c', memory_map=True,
-                             date_parser=dparse, parse_dates={'time': CBH_INDEX_COLS},
-                             index_col='time', header=None, na_values=[-99.0, -999.0, 'NaN', 'inf'])
+                             header=None, na_values=[-99.0, -999.0, 'NaN', 'inf'])
         else:
             df = pd.read_csv(filename, sep=' ', skipinitialspace=True,
                              skiprows=3, engine='c', memory_map=True,
-                             date_parser=dparse, parse_dates={'time': CBH_INDEX_COLS},
-                             index_col='time', header=None, na_values=[-99.0, -999.0, 'NaN', 'inf'])
-        return df
+                             header=None, na_values=[-99.0, -999.0, 'NaN', 'inf'])
+        return set_time_index(df, CBH_INDEX_COLS)
 
     def check_region(self, region):
         if self.__indices is not None:
@@ -162,78 +301,211 @@ class CbhAscii(object):
             return idx_retrieve
         return None
 
-    def read_cbh_multifile(self, var=None):
-        """Read cbh data from multiple csv files"""
+    def read_cbh_multifile(self, var=None, max_workers=None):
+        """Read cbh data for a variable from the regional CBH files.
+
+        :param str var: name of the variable
+        :param max_workers: maximum number of threads to use (see read_cbh_multivar())
+        :type max_workers: int or None
+        :returns: time by HRU data, with columns named by NHM HRU id (see get_var())
+        :rtype: pd.DataFrame
+        """
 
         if var is None:
             raise ValueError('Variable name (var) must be provided')
 
-        first = True
-        self.__dataframe = None
+        self.read_cbh_multivar(vars=[var], max_workers=max_workers)
+        self.__dataframe = self.get_var(var)
+        return self.__dataframe
 
-        for rr in REGIONS:
-            idx_retrieve = self.check_region(region=rr)
+    def read_cbh_multivar(self, vars=None, max_workers=None):
+        """Read cbh data for several variables from the regional CBH files.
+
+        The files of every region and variable are read (and decompressed)
+        concurrently in threads. Each file is read once, only for the columns
+        of the selected HRUs, and its values are placed directly into a
+        preallocated float32 time by HRU array for the variable. The HRUs are
+        ordered by region and, within a region, in the order of the indices.
+        The time index is built once from the first region and shared by all
+        variables. Variables which have already been read are not read again.
+
+        :param list[str] vars: names of the variables; None reads all CBH variables
+        :param max_workers: maximum number of threads to use
+        :type max_workers: int or None
+        :returns: time by HRU array of each variable, and the time index
+        :rtype: (dict[str, np.ndarray], pd.DatetimeIndex)
+        :raises IOError: if a required CBH file is missing
+        :raises ValueError: if the files have different time steps
+        """
 
-            if len(idx_retrieve) > 0:
-                # Build the list of columns to load
-                # The given local ids must be adjusted by 5 to reflect:
-                #     1) the presence of 6 columns of time information
-                #     2) 0-based column names
-                load_cols = list(CBH_INDEX_COLS)
-                load_cols.extend([xx+5 for xx in idx_retrieve.keys()])
-            else:
-                load_cols = None
+        var_list = list(CBH_VARNAMES if vars is None else vars)
+        out_ids, region_cols = self._region_columns()
 
-            if len(idx_retrieve) > 0:
-                # The current region contains HRUs in the model subset
-                # Read in the data for those HRUs
-                cbh_file = '{}/{}_{}.cbh.gz'.format(self.__src_path, rr, var)
+        tasks = []
+        for cvar in var_list:
+            if cvar in self.__var_data:
+                continue
 
-                print('\tLoad {} HRUs from {}'.format(len(idx_retrieve), rr))
+            for rr, (columns, positions) in iteritems(region_cols):
+                cbh_file = '{}/{}_{}.cbh.gz'.format(self.__src_path, rr, cvar)
 
                 if not os.path.isfile(cbh_file):
                     # Missing data file for this variable and region
                     raise IOError('Required CBH file, {}, is missing.'.format(cbh_file))
+                tasks.append((cvar, rr, cbh_file, columns, positions))
+
+        if tasks:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = OrderedDict()
+                for cvar, rr, cbh_file, columns, positions in tasks:
+                    futures[executor.submit(_read_columns, cbh_file, columns)] = (cvar, rr, cbh_file, positions)
+
+                if self.__time_fields is None:
+                    # The time index is built once from the first file of the first region
+                    time_fields = next(iter(futures)).result()[0]
+                    index = datetime_index(*time_fields.T, name='time')
+                    self.__time_slice = index.slice_indexer(self.__stdate, self.__endate)
+                    self.__time_fields = time_fields
+                    self.__time_index = index[self.__time_slice]
+
+                # Place the values of each file as soon as it has been read
+                for ff in as_completed(futures):
+                    cvar, rr, cbh_file, positions = futures[ff]
+                    time_fields, values = ff.result()
+
+                    if not np.array_equal(time_fields, self.__time_fields):
+                        raise ValueError('The time steps of {} do not match the other CBH files'.format(cbh_file))
+
+                    if self.__verbose:
+                        print('\tLoaded {} HRUs of {} from {}'.format(values.shape[1], cvar, rr))
+
+                    if cvar not in self.__var_data:
+                        self.__var_data[cvar] = np.full((len(self.__time_index), len(out_ids)), np.nan,
+                                                        dtype=np.float32)
+                    self.__var_data[cvar][:, positions] = values[self.__time_slice]
+
+        return dict([(cvar, self.__var_data[cvar]) for cvar in var_list if cvar in self.__var_data]), \
+            self.__time_index
+
+    def iter_cbh_multifile(self, var=None, block_size=366, max_workers=None):
+        """Read cbh data for a variable from the regional CBH files in blocks of time steps.
+
+        This is the streaming equivalent of read_cbh_multifile(). The regional
+        files are read in step, the next block of each file is read in
+        parallel threads, and each block is assembled in the HRU order of
+        read_cbh_multivar(). Only one block of each file is held in
+        memory at a time.
+
+        :param str var: name of the variable
+        :param int block_size: number of time steps per block
+        :param max_workers: maximum number of threads to use
+        :type max_workers: int or None
+        :returns: generator of blocks
+        :rtype: generator[CbhBlock]
+        :raises IOError: if a required CBH file is missing
+        :raises ValueError: if the files have different time steps
+        """
+
+        if var is None:
+            raise ValueError('Variable name (var) must be provided')
 
-                # df = self.read_ascii_file(cbh_file, columns=load_cols)
+        out_ids, region_cols = self._region_columns()
+        cbh_files = ['{}/{}_{}.cbh.gz'.format(self.__src_path, rr, var) for rr in region_cols.keys()]
 
-                # Small read to get number of columns
-                df = pd.read_csv(cbh_file, sep=' ', skipinitialspace=True,
-                                 usecols=load_cols, nrows=2,
-                                 skiprows=3, engine='c', memory_map=True,
-                                 date_parser=dparse, parse_dates={'time': CBH_INDEX_COLS},
-                                 index_col='time', header=None, na_values=[-99.0, -999.0, 'NaN', 'inf'])
+        for cbh_file in cbh_files:
+            if not os.path.isfile(cbh_file):
+                # Missing data file for this variable and region
+                raise IOError('Required CBH file, {}, is missing.'.format(cbh_file))
 
-                # Override Pandas' rather stupid default of float64
-                col_dtypes = {xx: np.float32 for xx in df.columns}
+        all_columns = [columns for columns, positions in region_cols.values()]
+        all_positions = [positions for columns, positions in region_cols.values()]
+        readers = []
 
-                # Now read the whole file using float32 instead of float64
-                df = pd.read_csv(cbh_file, sep=' ', skipinitialspace=True,
-                                 usecols=load_cols, dtype=col_dtypes,
-                                 skiprows=3, engine='c', memory_map=True,
-                                 date_parser=dparse, parse_dates={'time': CBH_INDEX_COLS},
-                                 index_col='time', header=None, na_values=[-99.0, -999.0, 'NaN', 'inf'])
+        try:
+            for cbh_file, columns in zip(cbh_files, all_columns):
+                readers.append(_block_reader(cbh_file, columns, block_size))
 
-                if self.__stdate is not None and self.__endate is not None:
-                    # Restrict the date range
-                    df = df[self.__stdate:self.__endate]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                while True:
+                    chunks = list(executor.map(_next_block, readers, all_columns))
 
-                # Rename columns with NHM HRU ids
-                ren_dict = {k+5: v for k, v in iteritems(idx_retrieve)}
+                    if all([cc is None for cc in chunks]):
+                        break
+                    if any([cc is None for cc in chunks]):
+                        raise ValueError('The CBH files of {} have different numbers of time steps'.format(var))
 
-                # NOTE: The rename is an expensive operation
-                df.rename(columns=ren_dict, inplace=True)
+                    time_fields = chunks[0][0]
+                    values = np.full((time_fields.shape[0], len(out_ids)), np.nan, dtype=np.float32)
 
-                if first:
-                    self.__dataframe = df.copy()
-                    first = False
-                else:
-                    self.__dataframe = self.__dataframe.join(df, how='left')
-        return self.__dataframe
+                    for cbh_file, (cfields, cvalues), positions in zip(cbh_files, chunks, all_positions):
+                        if not np.array_equal(cfields, time_fields):
+                            raise ValueError('The time steps of {} do not match the other CBH files'.format(cbh_file))
+                        values[:, positions] = cvalues
+
+                    block, past_end = _restrict_block(time_fields, values, self.__stdate, self.__endate)
+
+                    if len(block.time) > 0:
+                        yield block
+                    if past_end:
+                        break
+        finally:
+            for reader in readers:
+                reader.close()
+
+    def _region_columns(self):
+        """Get the output HRU ids and, for each region, the file columns to read and their output positions.
+
+        The HRUs are output by region and, within a region, in the order of
+        the indices. The file column of an HRU is its local id adjusted by 5
+        to reflect the 6 columns of time information and 0-based column names.
+
+        :returns: output HRU ids, and region to (file columns, output positions)
+        :rtype: (list[int], OrderedDict)
+        """
+
+        if self.__region_cols is None:
+            out_ids = []
+            region_cols = OrderedDict()
+
+            for rr in REGIONS:
+                idx_retrieve = self.check_region(region=rr)
+
+                if len(idx_retrieve) > 0:
+                    # The current region contains HRUs in the model subset
+                    columns = [xx + 5 for xx in idx_retrieve.keys()]
+                    region_cols[rr] = (columns, slice(len(out_ids), len(out_ids) + len(columns)))
+                    out_ids.extend(idx_retrieve.values())
+
+            self.__region_cols = (out_ids, region_cols)
+        return self.__region_cols
+
+    def _hru_positions(self, hrus):
+        """Get the positions of HRUs in the data read from the regional files.
+
+        :param list[int] hrus: NHM HRU ids
+        :rtype: np.ndarray
+        :raises KeyError: if an HRU is not in the indices
+        """
+
+        positions = pd.Index(self._region_columns()[0]).get_indexer(hrus)
+
+        if (positions < 0).any():
+            raise KeyError('HRUs {} are not in the indices'.format(np.asarray(hrus)[positions < 0].tolist()))
+        return positions
 
     def get_var(self, var):
-        data = self.read_cbh_multifile(var=var)
-        return data
+        """Get the data of a variable, reading it from the regional CBH files if needed.
+
+        :param str var: name of the variable
+        :returns: time by HRU data; the DataFrame shares the array that was read
+        :rtype: pd.DataFrame
+        """
+
+        if var not in self.__var_data:
+            self.read_cbh_multivar(vars=[var])
+
+        return pd.DataFrame(self.__var_data[var], index=self.__time_index, columns=self._region_columns()[0],
+                            copy=False)
 
     def write_ascii(self, pathname=None, fileprefix=None, vars=None):
         # For out_order the first six columns contain the time information and
@@ -245,11 +517,15 @@ class CbhAscii(object):
         var_list = []
         if vars is None:
             var_list = CBH_VARNAMES
-        elif isinstance(list, vars):
+        elif isinstance(vars, list):
             var_list = vars
 
+        # Read all variables at once
+        self.read_cbh_multivar(vars=var_list)
+
         for cvar in var_list:
-            data = self.get_var(var=cvar)
+            # Copy so the time columns are not added to the shared data
+            data = self.get_var(var=cvar).copy()
 
             # Add time information as columns
             data['year'] = data.index.year
@@ -280,10 +556,22 @@ class CbhAscii(object):
     def write_netcdf(self, filename=None, vars=None):
         """Write CBH to netcdf format file"""
 
+        import netCDF4 as nc
+
         # NetCDF-related variables
         var_desc = {'tmax': 'Maximum Temperature', 'tmin': 'Minimum temperature', 'prcp': 'Precipitation'}
         var_units = {'tmax': 'C', 'tmin': 'C', 'prcp': 'inches'}
 
+        var_list = []
+        if vars is None:
+            var_list = CBH_VARNAMES
+        elif isinstance(vars, list):
+            var_list = vars
+
+        # Read all variables at once
+        var_data, time_index = self.read_cbh_multivar(vars=var_list)
+        hru_pos = self._hru_positions(self.__nhm_hrus)
+
         # Create a netCDF file for the CBH data
         nco = nc.Dataset(filename, 'w', clobber=True)
         nco.createDimension('hru', len(self.__nhm_hrus))
@@ -297,12 +585,6 @@ class CbhAscii(object):
         hruo = nco.createVariable('hru', 'i4', ('hru'))
         hruo.long_name = 'Hydrologic Response Unit ID (HRU)'
 
-        var_list = []
-        if vars is None:
-            var_list = CBH_VARNAMES
-        elif isinstance(list, vars):
-            var_list = vars
-
         for cvar in var_list:
             varo = nco.createVariable(cvar, 'f4', ('time', 'hru'), fill_value=nc.default_fillvals['f4'], zlib=True)
             varo.long_name = var_desc[cvar]
@@ -315,18 +597,13 @@ class CbhAscii(object):
         # Write the HRU ids
         hruo[:] = self.__nhm_hrus
 
-        first = True
-        for cvar in var_list:
-            data = self.get_var(var=cvar)
-
-            if first:
-                timeo[:] = nc.date2num(data.index.tolist(),
-                                       units='days since 1980-01-01 00:00:00',
-                                       calendar='standard')
-                first = False
+        timeo[:] = nc.date2num(time_index.to_pydatetime().tolist(),
+                               units='days since 1980-01-01 00:00:00',
+                               calendar='standard')
 
+        for cvar in var_list:
             # Write the CBH values
-            nco.variables[cvar][:, :] = data[self.__nhm_hrus].values
+            nco.variables[cvar][:, :] = var_data[cvar][:, hru_pos]
 
         nco.close()
 
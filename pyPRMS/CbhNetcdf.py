@@ -1,10 +1,6 @@
 from __future__ import (absolute_import, division, print_function)
 # from future.utils import iteritems
 
-import pandas as pd
-import netCDF4 as nc
-import xarray as xr
-
 CBH_VARNAMES = ['prcp', 'tmin', 'tmax']
 CBH_INDEX_COLS = [0, 1, 2, 3, 4, 5]
 
@@ -41,6 +37,8 @@ class CbhNetcdf(object):
     def read_netcdf(self):
         """Read CBH files stored in netCDF format"""
 
+        import xarray as xr
+
         if self.__nhm_hrus:
             # print('\t\tOpen dataset')
             # self.__dataset = xr.open_mfdataset(self.__src_path)
@@ -102,6 +100,9 @@ class CbhNetcdf(object):
     def write_netcdf(self, filename=None, vars=None):
         """Write CBH to netcdf format file"""
 
+        import netCDF4 as nc
+        import pandas as pd
+
         # NetCDF-related variables
         var_desc = {'tmax': 'Maximum Temperature', 'tmin': 'Minimum temperature', 'prcp': 'Precipitation'}
         var_units = {'tmax': 'C', 'tmin': 'C', 'prcp': 'inches'}
@@ -4,17 +4,11 @@ from __future__ import (absolute_import, division, print_function)
 # from future.utils import iteritems
 
 # from collections import OrderedDict
-# try:
-#     import xml.etree.cElementTree as xmlET
-# except ImportError:
-import xml.etree.ElementTree as xmlET
-
-import io
-import pkgutil
 
 from pyPRMS.constants import DATA_TYPES, VAR_DELIM
 from pyPRMS.Control import Control
 from pyPRMS.Exceptions_custom import ControlError
+from pyPRMS.metadata import get_registry
 
 
 class ControlFile(Control):
@@ -54,46 +48,26 @@ class ControlFile(Control):
         # Read the control file into memory and parse it
         self.__isloaded = False
 
-        # First read control.xml from the library
+        # First add the control variables compiled from the library control.xml
         # This makes sure any missing variables from the control file
         # end up with default values
-        xml_fh = io.StringIO(pkgutil.get_data('pyPRMS', 'xml/control.xml').decode('utf-8'))
-        xml_tree = xmlET.parse(xml_fh)
-        xml_root = xml_tree.getroot()
-
-        for elem in xml_root.findall('control_param'):
-            name = elem.attrib.get('name')
-            datatype = int(elem.find('type').text)
-
+        for name, info in get_registry().control.items():
             self.add(name)
-            self.get(name).datatype = datatype
+            self.get(name).datatype = info.datatype
 
             if name in ['start_time', 'end_time']:
-                # Hack to handle PRMS weird approach to dates
-                dt = elem.find('default').text.split('-')
-                if len(dt) < 6:
-                    # pad short date with zeros for hms
-                    dt.extend([0 for _ in range(6 - len(dt))])
-                self.get(name).default = dt
+                self.get(name).default = list(info.default)
             else:
-                # print('{}: {} {}'.format(name, type(elem.find('default').text), elem.find('default').text))
-                self.get(name).default = elem.find('default').text
-
-            self.get(name).description = elem.find('desc').text
-
-            if elem.find('force_default') is not None:
-                self.get(name).force_default = elem.find('force_default').text
+                self.get(name).default = info.default
 
-            outvals = {}
-            for cvals in elem.findall('./values'):
-                self.get(name).value_repr = cvals.attrib.get('type')
+            self.get(name).description = info.description
 
-                for cv in cvals.findall('./value'):
-                    outvals[cv.attrib.get('name')] = []
+            if info.force_default is not None:
+                self.get(name).force_default = info.force_default
 
-                    for xx in cv.text.split(','):
-                        outvals[cv.attrib.get('name')].append(xx)
-            self.get(name).valid_values = outvals
+            if info.value_repr is not None:
+                self.get(name).value_repr = info.value_repr
+            self.get(name).valid_values = {kk: list(vv) for kk, vv in info.valid_values}
 
         header_tmp = []
         infile = open(self.filename, 'r')
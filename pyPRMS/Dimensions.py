@@ -169,6 +169,11 @@ class Dimensions(object):
         self.__dimensions = OrderedDict()
         self.__verbose = verbose
 
+        # Incremented whenever a dimension is added or removed; indexes built
+        # from the dimension names (e.g. the dimension to parameter index of
+        # Parameters) are rebuilt when it changes
+        self.__names_version = 0
+
     def __str__(self):
         outstr = ''
         if len(self.__dimensions) == 0:
@@ -180,6 +185,10 @@ class Dimensions(object):
 
     def __getattr__(self, name):
         # print('ATTR: {}'.format(name))
+        if name.startswith('_'):
+            # Private attributes are not delegated; they are looked up before
+            # they exist when the object is copied or unpickled
+            raise AttributeError(name)
         return getattr(self.__dimensions, name)
 
     def __getitem__(self, item):
@@ -196,6 +205,16 @@ class Dimensions(object):
 
         return self.__dimensions
 
+    @property
+    def names_version(self):
+        """Get the version of the dimension names.
+
+        :returns: counter which changes whenever a dimension is added or removed
+        :rtype: int
+        """
+
+        return self.__names_version
+
     @property
     def ndims(self):
         """Get number of dimensions.
@@ -239,6 +258,7 @@ class Dimensions(object):
         if name not in self.__dimensions:
             try:
                 self.__dimensions[name] = Dimension(name=name, size=size)
+                self._names_changed()
             except ValueError as err:
                 if self.__verbose:
                     print(err)
@@ -272,6 +292,7 @@ class Dimensions(object):
             if name not in self.__dimensions:
                 try:
                     self.__dimensions[name] = Dimension(name=name, size=size)
+                    self._names_changed()
                 except ValueError as err:
                     print(err)
             else:
@@ -279,6 +300,11 @@ class Dimensions(object):
                     # NOTE: This will always try to grow a dimension if it already exists!
                     self.__dimensions[name].size += size
 
+    def _names_changed(self):
+        """Record that a dimension was added or removed."""
+
+        self.__names_version += 1
+
     def exists(self, name):
         """Check if dimension exists.
 
@@ -312,6 +338,7 @@ class Dimensions(object):
 
         if self.exists(name):
             del self.__dimensions[name]
+            self._names_changed()
 
     def tostructure(self):
         """Get data structure of Dimensions data for serialization.
@@ -379,6 +406,7 @@ class ParamDimensions(Dimensions):
             if name not in self.dimensions:
                 try:
                     self.dimensions[name] = Dimension(name=name, size=size)
+                    self._names_changed()
                 except ValueError as err:
                     print(err)
             else:
@@ -0,0 +1,466 @@
+
+from __future__ import (absolute_import, division, print_function)
+
+from collections import namedtuple, OrderedDict
+import numpy as np
+import os
+
+from pyPRMS.Grouping import Grouping
+from pyPRMS.ParameterFileTemplate import ParameterFileTemplate, _encode, _write_buffers
+from pyPRMS.ParameterSet import _render_parameter
+from pyPRMS.ParamStorage import storage_dtype
+from pyPRMS.constants import NETCDF_DATATYPES
+from pyPRMS.worker_pool import run_tasks
+
+# Sampling designs supported by EnsembleSampler.sample()
+SAMPLE_DESIGNS = ('lhs', 'sobol', 'uniform')
+
+# Ways a sampled value is applied to the base values of a parameter
+PERTURB_METHODS = ('value', 'scale', 'offset')
+
+Perturbation = namedtuple('Perturbation', ['name', 'method', 'lower', 'upper', 'codes', 'labels'])
+Perturbation.__doc__ = """A parameter perturbed by an EnsembleSampler.
+
+codes holds, for each entry of the leading dimension of the parameter, the
+index into labels of the group it belongs to (-1 if it is not perturbed).
+A parameter without groups has a single group labelled None.
+"""
+
+# Ensemble members written by each process before reporting back
+_MEMBERS_PER_TASK = 16
+
+
+def sample_unit(nsamples, nfactors, design='lhs', rng=None):
+    """Draw samples from the unit hypercube.
+
+    :param int nsamples: number of samples
+    :param int nfactors: number of dimensions of the hypercube
+    :param str design: one of 'lhs' (Latin hypercube), 'sobol' (scrambled Sobol sequence; requires scipy), or 'uniform'
+    :param rng: random number generator or seed
+    :type rng: np.random.Generator or int or None
+    :returns: samples in [0, 1)
+    :rtype: np.ndarray of shape (nsamples, nfactors)
+    :raises ValueError: if the design is not supported
+    :raises ImportError: if the design is 'sobol' and scipy is not installed
+    """
+
+    rng = np.random.default_rng(rng)
+
+    if design == 'uniform':
+        return rng.random((nsamples, nfactors))
+    elif design == 'lhs':
+        # One sample in each of nsamples equal strata of every dimension; the
+        # strata are paired at random across dimensions
+        strata = np.argsort(rng.random((nsamples, nfactors)), axis=0)
+        return (strata + rng.random((nsamples, nfactors))) / nsamples
+    elif design == 'sobol':
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            raise ImportError('Sobol sampling requires scipy')
+
+        return qmc.Sobol(d=nfactors, scramble=True, seed=rng).random(nsamples)
+
+    raise ValueError('Sampling design must be one of {}'.format(', '.join(SAMPLE_DESIGNS)))
+
+
+def _init_writer(sampler, buffers, slots):
+    """Get the state of a worker process of EnsembleSampler.write_parameter_files().
+
+    :param EnsembleSampler sampler: sampler whose ParameterSet has only the perturbed parameters
+    :param list[bytes] buffers: rendered content of the base parameter file
+    :param dict slots: name of each perturbed parameter to the position of its block in buffers
+    """
+
+    return {'sampler': sampler, 'overlay': sampler.parameter_set.overlay(), 'buffers': buffers, 'slots': slots}
+
+
+def _write_members(state, members, filenames):
+    """Write parameter files for a range of ensemble members in a worker process."""
+
+    sampler = state['sampler']
+    overlay = state['overlay']
+    buffers = list(state['buffers'])
+
+    values = [(pp, sampler.member_values(pp.name, members)) for pp in sampler.perturbations]
+
+    for ii, filename in enumerate(filenames):
+        for pp, vv in values:
+            cparam = overlay.parameters.get(pp.name)
+            cparam.data = vv[ii].reshape(cparam.storage.shape, order='F')
+
+            if pp.method == 'value':
+                # Replaced values have few distinct values; encoded data is
+                # rendered by formatting each distinct value once
+                cparam.encode()
+
+            buffers[state['slots'][pp.name]] = _encode(_render_parameter(cparam))
+
+        _write_buffers(filename, buffers)
+    return len(filenames)
+
+
+class EnsembleSampler(object):
+
+    """Generate an ensemble of perturbed parameter sets.
+
+    Parameters are added with the range to sample and how the sampled value
+    is applied: 'value' replaces the base values, 'scale' multiplies them,
+    and 'offset' is added to them. Each parameter is perturbed by one sampled
+    value, or by one value for each group of HRUs (or segments) when groups
+    are given. The perturbed values are clipped to the valid range of the
+    parameter (ParameterSet.get_bounds()), including bounded parameters.
+
+    The ensemble members are computed, vectorized, from the sample matrix
+    when they are written, so an ensemble of thousands of members takes
+    little memory. Parameter files are written in parallel processes, each of
+    which renders only the perturbed parameters of a member
+    (see ParameterFileTemplate).
+    """
+
+    def __init__(self, pset, seed=None):
+        """Create an EnsembleSampler.
+
+        :param ParameterSet pset: the base ParameterSet
+        :param seed: seed for the random number generator
+        :type seed: int or None
+        """
+
+        self.__pset = pset
+        self.__seed = seed
+        self.__perturbations = OrderedDict()
+        self.__samples = None
+
+        # Parameter name to the flattened (Fortran-order) base data and the
+        # group code of each element
+        self.__base = {}
+
+    @property
+    def parameter_set(self):
+        """Get the base ParameterSet.
+
+        :rtype: ParameterSet
+        """
+
+        return self.__pset
+
+    @property
+    def perturbations(self):
+        """Get the perturbed parameters in the order they were added.
+
+        :rtype: list[Perturbation]
+        """
+
+        return list(self.__perturbations.values())
+
+    @property
+    def factors(self):
+        """Get the (parameter name, group label) of each column of the samples.
+
+        :rtype: list[tuple]
+        """
+
+        return [(pp.name, label) for pp in self.__perturbations.values() for label in pp.labels]
+
+    @property
+    def samples(self):
+        """Get the sampled values.
+
+        :returns: sampled values, one row per member and one column per factor, or None if nothing was sampled
+        :rtype: np.ndarray or None
+        """
+
+        return self.__samples
+
+    @property
+    def size(self):
+        """Get the number of ensemble members.
+
+        :rtype: int
+        """
+
+        return 0 if self.__samples is None else self.__samples.shape[0]
+
+    def add(self, name, method='value', lower=None, upper=None, groups=None):
+        """Add a parameter to perturb.
+
+        For the 'value' method the range defaults to the valid range of the
+        parameter; for 'scale' and 'offset' it must be given.
+
+        :param str name: name of the parameter
+        :param str method: one of 'value', 'scale', or 'offset'
+        :param lower: lower limit of the sampled values
+        :type lower: float or None
+        :param upper: upper limit of the sampled values
+        :type upper: float or None
+        :param groups: grouping, or the group label for each entry of the leading dimension of the parameter (e.g. one per HRU); entries labelled None are not perturbed
+        :type groups: Grouping or list or np.ndarray or None
+        :raises ValueError: if the method, range, or groups are not valid or the parameter is not numeric or has no data
+        """
+
+        if method not in PERTURB_METHODS:
+            raise ValueError('Perturbation method must be one of {}'.format(', '.join(PERTURB_METHODS)))
+
+        cparam = self.__pset.parameters.get(name)
+
+        if cparam.datatype not in [1, 2, 3]:
+            raise ValueError('{} is not a numeric parameter'.format(name))
+
+        if method == 'value':
+            minimum, maximum = self.__pset.get_bounds(name)
+            lower = minimum if lower is None else lower
+            upper = maximum if upper is None else upper
+
+        if lower is None or upper is None:
+            raise ValueError('{}: the range of sampled values must be given'.format(name))
+        if lower > upper:
+            raise ValueError('{}: lower limit is greater than the upper limit'.format(name))
+
+        if cparam.storage is None:
+            raise ValueError('{} has no data'.format(name))
+
+        nrows = cparam.storage.shape[0]
+
+        if groups is None:
+            codes = np.zeros(nrows, dtype=np.int64)
+            labels = [None]
+        elif isinstance(groups, Grouping):
+            if not groups.applies_to(list(cparam.dimensions.keys())[0]) or groups.size != nrows:
+                raise ValueError('{}: grouping of {} {} does not match the parameter'.format(name, groups.size,
+                                                                                          groups.dimension))
+            codes, labels = groups.codes, groups.labels
+        else:
+            import pandas as pd
+
+            groups = np.asarray(groups, dtype=object)
+
+            if groups.shape != (nrows, ):
+                raise ValueError('{}: groups must have one label for each of the {} entries of dimension {}'.
+                                 format(name, nrows, list(cparam.dimensions.keys())[0]))
+
+            # Labels are numbered in order of first appearance; None is coded -1
+            codes, labels = pd.factorize(groups)
+            codes = codes.astype(np.int64)
+            labels = labels.tolist()
+
+            if len(labels) == 0:
+                raise ValueError('{}: no entries are selected by the groups'.format(name))
+
+        self.__perturbations[name] = Perturbation(name=name, method=method, lower=float(lower),
+                                                  upper=float(upper), codes=codes, labels=labels)
+        self.__base.pop(name, None)
+        self.__samples = None
+
+    def remove(self, name):
+        """Remove a perturbed parameter.
+
+        :param str name: name of the parameter
+        """
+
+        del self.__perturbations[name]
+        self.__base.pop(name, None)
+        self.__samples = None
+
+    def sample(self, nmembers, design='lhs'):
+        """Draw the samples for an ensemble.
+
+        :param int nmembers: number of ensemble members
+        :param str design: one of 'lhs' (Latin hypercube), 'sobol' (requires scipy), or 'uniform'
+        :returns: sampled values, one row per member and one column per factor
+        :rtype: np.ndarray
+        """
+
+        unit = sample_unit(nmembers, len(self.factors), design=design, rng=self.__seed)
+
+        lower = np.array([pp.lower for pp in self.__perturbations.values() for _ in pp.labels])
+        upper = np.array([pp.upper for pp in self.__perturbations.values() for _ in pp.labels])
+
+        self.__samples = lower + unit * (upper - lower)
+        return self.__samples
+
+    def member_values(self, name, members):
+        """Get the perturbed data of a parameter for one or more ensemble members.
+
+        Each row of the result is the data of one member flattened in Fortran
+        order, e.g. result[ii].reshape(shape, order='F') is the data of the
+        parameter for members[ii].
+
+        :param str name: name of the perturbed parameter
+        :param members: indices of the ensemble members
+        :type members: slice or list[int] or np.ndarray
+        :returns: array with the storage dtype of the parameter
+        :rtype: np.ndarray of shape (number of members, size of the parameter)
+        :raises ValueError: if no samples have been drawn
+        """
+
+        if self.__samples is None:
+            raise ValueError('Samples have not been drawn; call sample() first')
+
+        pert = self.__perturbations[name]
+        cparam = self.__pset.parameters.get(name)
+
+        if name not in self.__base:
+            shape = cparam.storage.shape
+            base = np.asarray(cparam.values, dtype=np.float64).ravel(order='F')
+
+            # Group code of every element; the leading dimension varies fastest
+            codes = np.tile(pert.codes, int(np.prod(shape[1:])))
+            self.__base[name] = (base, codes)
+
+        base, codes = self.__base[name]
+
+        col = 0
+        for pp in self.__perturbations.values():
+            if pp.name == name:
+                break
+            col += len(pp.labels)
+
+        group_values = self.__samples[members, col:col + len(pert.labels)]
+        if group_values.ndim == 1:
+            group_values = group_values[np.newaxis, :]
+
+        # Broadcast the sampled value of each group to its elements
+        selected = codes >= 0
+        values = np.broadcast_to(base, (group_values.shape[0], base.size)).copy()
+        sampled = group_values[:, codes[selected]]
+
+        if pert.method == 'value':
+            values[:, selected] = sampled
+        elif pert.method == 'scale':
+            values[:, selected] *= sampled
+        else:
+            values[:, selected] += sampled
+
+        minimum, maximum = self.__pset.get_bounds(name)
+        if minimum is not None or maximum is not None:
+            np.clip(values, minimum, maximum, out=values)
+
+        if cparam.datatype == 1:
+            np.rint(values, out=values)
+        return values.astype(storage_dtype(cparam.datatype))
+
+    def member(self, index):
+        """Get an ensemble member.
+
+        :param int index: index of the member
+        :returns: copy-on-write overlay of the base ParameterSet with the perturbed data
+        :rtype: OverlayParameterSet
+        """
+
+        overlay = self.__pset.overlay()
+
+        for pp in self.__perturbations.values():
+            cparam = overlay.parameters.get(pp.name)
+            cparam.data = self.member_values(pp.name, [index])[0].reshape(cparam.storage.shape, order='F')
+        return overlay
+
+    def write_parameter_files(self, output_dir, filename_format='member_{:05d}.param', header=None,
+                              max_workers=None):
+        """Write a parameter file for each ensemble member.
+
+        The base parameter file is rendered once. The members are divided
+        among worker processes; each worker receives the rendered file and the
+        base data of the perturbed parameters once, and computes and renders
+        the perturbed data itself.
+
+        :param str output_dir: directory for the parameter files
+        :param str filename_format: format for the filenames; formatted with the member index
+        :param list[str] header: list of header lines
+        :param max_workers: number of processes; 1 writes the files in this process
+        :type max_workers: int or None
+        :returns: names of the files written, in member order
+        :rtype: list[str]
+        :raises ValueError: if no samples have been drawn
+        """
+
+        if self.__samples is None:
+            raise ValueError('Samples have not been drawn; call sample() first')
+
+        filenames = [os.path.join(output_dir, filename_format.format(ii)) for ii in range(self.size)]
+        tasks = [(np.arange(ii, min(ii + _MEMBERS_PER_TASK, self.size)), filenames[ii:ii + _MEMBERS_PER_TASK])
+                 for ii in range(0, self.size, _MEMBERS_PER_TASK)]
+
+        # The base file is rendered once; render() returns the header and
+        # dimension sections followed by one block per parameter
+        buffers = ParameterFileTemplate(self.__pset, header=header).render(self.__pset)[0]
+        first = len(buffers) - len(self.__pset.parameters.keys())
+        slots = dict([(kk, first + ii) for ii, kk in enumerate(self.__pset.parameters.keys())
+                      if kk in self.__perturbations])
+
+        run_tasks(_write_members, tasks, initializer=_init_writer, initargs=(self.__for_workers(), buffers, slots),
+                  max_workers=max_workers)
+        return filenames
+
+    def __for_workers(self):
+        """Get a copy of the sampler whose ParameterSet has only the perturbed parameters.
+
+        :rtype: EnsembleSampler
+        """
+
+        sampler = EnsembleSampler(self.__pset.view().detach(names=list(self.__perturbations.keys())),
+                                  seed=self.__seed)
+        sampler.__perturbations = self.__perturbations
+        sampler.__samples = self.__samples
+        return sampler
+
+    def write_netcdf(self, filename, chunk_size=256):
+        """Write the ensemble to a single netcdf file.
+
+        Perturbed parameters are stacked along a leading 'member' dimension;
+        all other parameters are written once, as by ParameterSet.write_netcdf().
+        The sampled values are written to the variable 'samples' with
+        dimensions (member, factor).
+
+        :param str filename: full path for output file
+        :param int chunk_size: number of members computed and written at a time
+        :raises ValueError: if no samples have been drawn
+        """
+
+        import netCDF4 as nc
+
+        if self.__samples is None:
+            raise ValueError('Samples have not been drawn; call sample() first')
+
+        # Write the unperturbed parameters
+        overlay = self.__pset.overlay()
+        for name in self.__perturbations.keys():
+            overlay.parameters.remove(name)
+        overlay.write_netcdf(filename)
+
+        nc_hdl = nc.Dataset(filename, 'a')
+        nc_hdl.createDimension('member', self.size)
+        nc_hdl.createDimension('factor', self.__samples.shape[1])
+
+        samples = nc_hdl.createVariable('samples', 'f8', ('member', 'factor'), zlib=True)
+        samples.description = 'Sampled values; factors: {}'.format(', '.join(['{}[{}]'.format(kk, '' if gg is None else gg)
+                                                                              for kk, gg in self.factors]))
+        samples[:, :] = self.__samples
+
+        for pp in self.__perturbations.values():
+            cparam = self.__pset.parameters.get(pp.name)
+            curr_datatype = NETCDF_DATATYPES[cparam.datatype]
+
+            # Dimensions are written slowest to fastest (see ParameterSet.write_netcdf())
+            dims = [dd for dd in cparam.dimensions.keys() if dd != 'one'][::-1]
+            shape = [cparam.dimensions.get(dd).size for dd in dims]
+
+            curr_param = nc_hdl.createVariable(pp.name, curr_datatype, tuple(['member'] + dims),
+                                               fill_value=nc.default_fillvals[curr_datatype], zlib=True)
+
+            if cparam.help:
+                curr_param.description = cparam.help
+            elif cparam.description:
+                curr_param.description = cparam.description
+
+            if cparam.units:
+                curr_param.units = cparam.units
+
+            curr_param.perturbation = '{} [{}, {}]'.format(pp.method, pp.lower, pp.upper)
+
+            for ii in range(0, self.size, chunk_size):
+                members = np.arange(ii, min(ii + chunk_size, self.size))
+
+                # Fortran-order data is C-order data with the dimensions reversed
+                curr_param[ii:members[-1] + 1] = self.member_values(pp.name, members).reshape([members.size] + shape)
+
+        nc_hdl.close()
@@ -0,0 +1,195 @@
+
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+
+from pyPRMS.ParamStorage import select_index
+from pyPRMS.constants import HRU_DIMS
+
+
+class Grouping(object):
+
+    """Assignment of the HRUs or segments of a ParameterSet to groups.
+
+    The grouping is stored as a group index (code) for each entry of the
+    dimension and the label of each group; entries which are not in any
+    group have a code of -1. Groupings are created once (e.g. from the
+    hru_type parameter, or from a mapping of nhm_id to region) and reused
+    for any parameter with that leading dimension.
+    """
+
+    def __init__(self, codes, labels, dimension='nhru'):
+        """Create a Grouping.
+
+        :param codes: index into labels for each entry of the dimension; -1 for entries not in a group
+        :type codes: list[int] or np.ndarray
+        :param list labels: label of each group
+        :param str dimension: name of the grouped dimension
+        :raises ValueError: if a code is not a valid group index
+        """
+
+        codes = np.asarray(codes, dtype=np.int64)
+        labels = list(labels)
+
+        if codes.ndim != 1:
+            raise ValueError('Group codes must be one-dimensional')
+        if codes.size and (codes.min() < -1 or codes.max() >= len(labels)):
+            raise ValueError('Group codes must be between -1 and {}'.format(len(labels) - 1))
+
+        codes.flags.writeable = False
+
+        self.__codes = codes
+        self.__labels = labels
+        self.__dimension = dimension
+        self.__counts = None
+
+    def __len__(self):
+        return len(self.__labels)
+
+    def __repr__(self):
+        return 'Grouping(dimension={}, size={}, groups={})'.format(self.__dimension, self.size, len(self))
+
+    @classmethod
+    def from_labels(cls, labels, dimension='nhru'):
+        """Create a Grouping from the group label of each entry.
+
+        :param labels: group label for each entry of the dimension; None (or NaN) for entries not in a group
+        :type labels: list or np.ndarray
+        :param str dimension: name of the grouped dimension
+        :returns: the grouping; groups are sorted by label
+        :rtype: Grouping
+        """
+
+        import pandas as pd
+
+        codes, uniques = pd.factorize(np.asarray(labels, dtype=object), sort=True)
+        return cls(codes, uniques.tolist(), dimension=dimension)
+
+    @classmethod
+    def from_parameter(cls, pset, name):
+        """Create a Grouping from the values of a one-dimensional parameter (e.g. hru_type or hru_segment).
+
+        :param ParameterSet pset: the ParameterSet
+        :param str name: name of the parameter
+        :returns: one group for each distinct value of the parameter, sorted by value
+        :rtype: Grouping
+        :raises ValueError: if the parameter is not one-dimensional
+        """
+
+        cparam = pset.parameters.get(name)
+
+        if cparam.dimensions.ndims != 1:
+            raise ValueError('{} is not a one-dimensional parameter'.format(name))
+
+        labels, codes = np.unique(cparam.values, return_inverse=True)
+        return cls(codes.ravel(), labels.tolist(), dimension=list(cparam.dimensions.keys())[0])
+
+    @classmethod
+    def from_mapping(cls, pset, mapping, dimension='nhru'):
+        """Create a Grouping from a mapping of global ids to group labels.
+
+        HRUs are identified by nhm_id and segments by nhm_seg; local 1-based
+        ids are used when the ParameterSet does not have the id parameter.
+        Ids which are not in the mapping are not in any group.
+
+        :param ParameterSet pset: the ParameterSet
+        :param dict mapping: global id to group label (e.g. {nhm_id: region})
+        :param str dimension: name of the grouped dimension
+        :returns: the grouping; groups are sorted by label
+        :rtype: Grouping
+        :raises ValueError: if an id does not exist
+        """
+
+        id_param = 'nhm_id' if dimension in HRU_DIMS else 'nhm_seg'
+        size = pset.dimensions.get(dimension).size
+
+        if pset.parameters.exists(id_param):
+            ids = pset.parameters.get(id_param).values
+        else:
+            ids = np.arange(1, size + 1)
+
+        labels = np.full(size, None, dtype=object)
+
+        if len(mapping):
+            rows = select_index(ids, np.fromiter(mapping.keys(), dtype=ids.dtype, count=len(mapping)))
+            labels[rows] = list(mapping.values())
+        return cls.from_labels(labels, dimension=dimension)
+
+    @property
+    def codes(self):
+        """Get the group index of each entry of the dimension (read-only).
+
+        :rtype: np.ndarray
+        """
+
+        return self.__codes
+
+    @property
+    def counts(self):
+        """Get the number of entries in each group.
+
+        :rtype: np.ndarray
+        """
+
+        if self.__counts is None:
+            self.__counts = np.bincount(self.__codes[self.__codes >= 0], minlength=len(self.__labels))
+        return self.__counts
+
+    @property
+    def dimension(self):
+        """Get the name of the grouped dimension.
+
+        :rtype: str
+        """
+
+        return self.__dimension
+
+    @property
+    def labels(self):
+        """Get the label of each group.
+
+        :rtype: list
+        """
+
+        return list(self.__labels)
+
+    @property
+    def size(self):
+        """Get the number of entries of the dimension.
+
+        :rtype: int
+        """
+
+        return self.__codes.size
+
+    def applies_to(self, dim_name):
+        """Check if the grouping can be used for a dimension.
+
+        The HRU dimensions (nhru, ngw, nssr) are interchangeable.
+
+        :param str dim_name: name of a dimension
+        :rtype: bool
+        """
+
+        if self.__dimension in HRU_DIMS:
+            return dim_name in HRU_DIMS
+        return dim_name == self.__dimension
+
+    def index(self, label):
+        """Get the group index of a label.
+
+        :param label: label of a group
+        :rtype: int
+        :raises ValueError: if there is no group with the label
+        """
+
+        return self.__labels.index(label)
+
+    def members(self, label):
+        """Get the 0-based positions of the entries in a group.
+
+        :param label: label of a group
+        :rtype: np.ndarray
+        """
+
+        return np.flatnonzero(self.__codes == self.index(label))
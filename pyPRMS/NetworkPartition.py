@@ -0,0 +1,320 @@
+
+from __future__ import (absolute_import, division, print_function)
+
+import heapq
+import numpy as np
+import os
+
+from pyPRMS.worker_pool import run_tasks
+
+
+def segment_outlets(tosegment):
+    """Get the outlet and the distance to the outlet of every segment.
+
+    The downstream segment pointers are followed by pointer doubling, so the
+    number of array operations grows with the logarithm of the longest flow
+    path.
+
+    :param np.ndarray tosegment: 1-based local downstream segment of each segment; values < 1 are outlets
+    :returns: 0-based index of the outlet segment, and the number of segments to the outlet
+    :rtype: (np.ndarray, np.ndarray)
+    :raises ValueError: if tosegment refers to a segment that does not exist or the network has a cycle
+    """
+
+    tosegment = np.asarray(tosegment, dtype=np.int64)
+    nseg = tosegment.size
+
+    if nseg and tosegment.max() > nseg:
+        raise ValueError('tosegment refers to segments that do not exist')
+
+    index = np.arange(nseg)
+    outlet = tosegment < 1
+
+    # Outlets point to themselves
+    nxt = np.where(outlet, index, tosegment - 1)
+    depth = (~outlet).astype(np.int64)
+
+    for _ in range(max(nseg, 1).bit_length() + 1):
+        # Segments on a cycle never reach an outlet (a cycle can still be a
+        # fixed point of nxt[nxt], e.g. two segments pointing to each other)
+        if outlet[nxt].all():
+            return nxt, depth
+
+        depth = depth + depth[nxt]
+        nxt = nxt[nxt]
+
+    raise ValueError('The stream network (tosegment) has a cycle')
+
+
+def _write_partition(state, pset, filename, header):
+    """Write the parameter file of one partition in a worker process."""
+
+    pset.write_parameter_file(filename, header=header)
+    return filename
+
+
+class NetworkPartition(object):
+
+    """Decomposition of a ParameterSet into independent sub-models along the stream network.
+
+    Segments are grouped into units which are whole watersheds or, where a
+    watershed costs more than the unit limit (an equal share divided by the
+    granularity), subbasins cut off at confluences. A unit only costs more
+    than the limit if a single segment (with its HRUs) does. The units are
+    assigned to the partitions largest first, each to the partition with
+    the lowest total cost, so the partitions differ by about one unit.
+    HRUs go with the segment they drain to (hru_segment); HRUs that are not
+    connected to a segment are assigned as separate units. POIs go with
+    their segment (poi_gage_segment); POIs that are not on a segment are not
+    part of any partition.
+
+    The cost of an HRU is 1 (balance by HRU count) or a user-defined weight.
+    Segments that flow into a segment of another partition are boundary
+    segments; they become outlets of their partition (see boundaries).
+    """
+
+    def __init__(self, pset, nparts, cost=None, granularity=4):
+        """Create a NetworkPartition.
+
+        :param ParameterSet pset: the ParameterSet to partition; it must have tosegment and hru_segment
+        :param int nparts: number of partitions
+        :param cost: name of an HRU parameter or an array with the cost of each HRU; None uses 1 per HRU
+        :type cost: str or np.ndarray or None
+        :param int granularity: number of units an equal share is divided into; higher values balance the partitions
+                                better but cut more boundary segments
+        :raises ValueError: if there are fewer units than partitions or the cost is not valid
+        """
+
+        self.__pset = pset
+        self.__nparts = nparts
+
+        nhru = pset.dimensions.get('nhru').size
+        tosegment = pset.parameters.get('tosegment').values
+        hru_segment = pset.parameters.get('hru_segment').values.astype(np.int64)
+        nseg = tosegment.size
+
+        if isinstance(cost, str):
+            cost = pset.parameters.get(cost).values
+        hru_cost = np.ones(nhru) if cost is None else np.asarray(cost, dtype=np.float64)
+
+        if hru_cost.shape != (nhru, ):
+            raise ValueError('cost must have one value for each of the {} HRUs'.format(nhru))
+
+        connected = (hru_segment > 0) & (hru_segment <= nseg)
+        seg_cost = np.bincount(hru_segment[connected] - 1, weights=hru_cost[connected], minlength=nseg)
+
+        depth = segment_outlets(tosegment)[1]
+        down = np.where(tosegment > 0, tosegment - 1, -1)
+
+        target = hru_cost.sum() / nparts / granularity
+
+        # Accumulate the cost downstream, from the headwaters to the outlets;
+        # when a segment costs more than the unit limit its largest upstream
+        # subbasins are cut off as units until it does not.
+        acc = seg_cost.copy()
+        children = [[] for _ in range(nseg)]
+        unit_root = np.zeros(nseg, dtype=bool)
+
+        for ss in np.argsort(-depth, kind='stable').tolist():
+            if acc[ss] > target and children[ss]:
+                for cc in sorted(children[ss], key=lambda xx: acc[xx], reverse=True):
+                    if acc[ss] <= target:
+                        break
+                    unit_root[cc] = True
+                    acc[ss] -= acc[cc]
+
+            if down[ss] < 0:
+                unit_root[ss] = True
+            else:
+                acc[down[ss]] += acc[ss]
+                children[down[ss]].append(ss)
+
+        # Unit of each segment: the nearest unit root downstream (or itself)
+        seg_unit = np.where(unit_root, np.arange(nseg), -1)
+        for ss in np.argsort(depth, kind='stable').tolist():
+            if seg_unit[ss] < 0:
+                seg_unit[ss] = seg_unit[down[ss]]
+
+        # Unconnected HRUs are units of their own, numbered after the segments
+        unconnected = np.flatnonzero(~connected)
+        unit_cost = np.concatenate((np.where(unit_root, acc, 0.0), hru_cost[unconnected]))
+        units = np.concatenate((np.flatnonzero(unit_root), nseg + np.arange(unconnected.size)))
+
+        if units.size < nparts:
+            raise ValueError('The network has only {} independent units; cannot split into {} partitions'.
+                             format(units.size, nparts))
+
+        # Largest units first, each to the partition with the lowest cost
+        unit_part = np.zeros(nseg + unconnected.size, dtype=np.int64)
+        loads = [(0.0, pp) for pp in range(nparts)]
+
+        for uu in units[np.argsort(-unit_cost[units], kind='stable')].tolist():
+            load, pp = heapq.heappop(loads)
+            unit_part[uu] = pp
+            heapq.heappush(loads, (load + unit_cost[uu], pp))
+
+        self.__seg_part = unit_part[seg_unit]
+
+        hru_part = np.zeros(nhru, dtype=np.int64)
+        hru_part[connected] = self.__seg_part[hru_segment[connected] - 1]
+        hru_part[unconnected] = unit_part[nseg + np.arange(unconnected.size)]
+        self.__hru_part = hru_part
+
+        self.__costs = np.bincount(hru_part, weights=hru_cost, minlength=nparts)
+
+        self.__poi_part = None
+        if pset.parameters.exists('poi_gage_segment'):
+            poi_segment = pset.parameters.get('poi_gage_segment').values.astype(np.int64)
+            on_network = (poi_segment > 0) & (poi_segment <= nseg)
+
+            self.__poi_part = np.full(poi_segment.size, -1, dtype=np.int64)
+            self.__poi_part[on_network] = self.__seg_part[poi_segment[on_network] - 1]
+
+    @property
+    def boundaries(self):
+        """Get the segments which flow into a segment of another partition.
+
+        Local segment numbers are 1-based positions within the partition.
+
+        :returns: DataFrame with columns nhm_seg, partition, local_seg, to_nhm_seg, to_partition, to_local_seg
+        :rtype: pd.DataFrame
+        """
+
+        import pandas as pd
+
+        tosegment = self.__pset.parameters.get('tosegment').values
+        seg_ids = self._ids('nhm_seg', 'nsegment')
+
+        # 1-based position of each segment within its partition
+        order = np.argsort(self.__seg_part, kind='stable')
+        starts = np.cumsum(np.bincount(self.__seg_part, minlength=self.__nparts)) - \
+            np.bincount(self.__seg_part, minlength=self.__nparts)
+        local = np.empty(order.size, dtype=np.int64)
+        local[order] = np.arange(order.size) - starts[self.__seg_part[order]] + 1
+
+        up = np.flatnonzero(tosegment > 0)
+        down = tosegment[up] - 1
+
+        crossing = self.__seg_part[up] != self.__seg_part[down]
+        up, down = up[crossing], down[crossing]
+
+        return pd.DataFrame({'nhm_seg': seg_ids[up], 'partition': self.__seg_part[up], 'local_seg': local[up],
+                             'to_nhm_seg': seg_ids[down], 'to_partition': self.__seg_part[down],
+                             'to_local_seg': local[down]},
+                            columns=['nhm_seg', 'partition', 'local_seg', 'to_nhm_seg', 'to_partition',
+                                     'to_local_seg'])
+
+    @property
+    def costs(self):
+        """Get the total cost of each partition.
+
+        :rtype: np.ndarray
+        """
+
+        return self.__costs
+
+    @property
+    def hru_partition(self):
+        """Get the partition of each HRU.
+
+        :rtype: np.ndarray
+        """
+
+        return self.__hru_part
+
+    @property
+    def nparts(self):
+        """Get the number of partitions.
+
+        :rtype: int
+        """
+
+        return self.__nparts
+
+    @property
+    def poi_partition(self):
+        """Get the partition of each POI; POIs which are not on a segment are -1.
+
+        :returns: partition of each POI, or None if the ParameterSet has no poi_gage_segment
+        :rtype: np.ndarray or None
+        """
+
+        return self.__poi_part
+
+    @property
+    def segment_partition(self):
+        """Get the partition of each segment.
+
+        :rtype: np.ndarray
+        """
+
+        return self.__seg_part
+
+    def _ids(self, id_param, dim_name):
+        """Get the global ids of a dimension, or 1-based local ids if there is no global id parameter."""
+
+        if self.__pset.parameters.exists(id_param):
+            return self.__pset.parameters.get(id_param).values
+        return np.arange(1, self.__pset.dimensions.get(dim_name).size + 1)
+
+    def members(self, part):
+        """Get the global ids of the HRUs, segments, and POIs of a partition, in their original order.
+
+        :param int part: index of the partition
+        :returns: nhm_id, nhm_seg, and poi_gage_id values (1-based local ids if the ParameterSet has no global
+                  ids); the POIs are None if the ParameterSet has no poi_gage_segment
+        :rtype: (np.ndarray, np.ndarray, np.ndarray or None)
+        """
+
+        pois = None
+        if self.__poi_part is not None:
+            pois = self._ids('poi_gage_id', 'npoigages')[self.__poi_part == part]
+
+        return (self._ids('nhm_id', 'nhru')[self.__hru_part == part],
+                self._ids('nhm_seg', 'nsegment')[self.__seg_part == part],
+                pois)
+
+    def get(self, part):
+        """Get the ParameterSet of a partition.
+
+        Segment indices (hru_segment, tosegment, poi_gage_segment) are
+        renumbered to the partition; segments flowing into another partition
+        become outlets. Only the POIs on the segments of the partition are
+        included.
+
+        :param int part: index of the partition
+        :returns: read-only view of the partition
+        :rtype: ParameterSetView
+        """
+
+        hrus, segs, pois = self.members(part)
+        return self.__pset.view(hrus=hrus, segs=segs, pois=pois)
+
+    def write_parameter_files(self, output_dir, filename_format='part_{:03d}.param', header=None, max_workers=None):
+        """Write a parameter file for each partition and the boundary manifest.
+
+        The partitions are written in parallel processes; each process is
+        sent the data of its partition (see ParameterSetView.detach()). The
+        boundary segments (see boundaries) are written to boundaries.csv.
+
+        :param str output_dir: directory for the files
+        :param str filename_format: format for the parameter filenames; formatted with the partition index
+        :param list[str] header: list of header lines
+        :param max_workers: number of processes; 1 writes the files in this process
+        :type max_workers: int or None
+        :returns: names of the parameter files, in partition order
+        :rtype: list[str]
+        """
+
+        filenames = [os.path.join(output_dir, filename_format.format(pp)) for pp in range(self.__nparts)]
+        parts = [self.get(pp) for pp in range(self.__nparts)]
+
+        if max_workers != 1:
+            # Each worker receives only the data of its partition
+            parts = [part.detach() for part in parts]
+
+        run_tasks(_write_partition, [(part, filename, header) for part, filename in zip(parts, filenames)],
+                  max_workers=max_workers)
+
+        self.boundaries.to_csv(os.path.join(output_dir, 'boundaries.csv'), index=False)
+        return filenames
@@ -0,0 +1,216 @@
+
+from __future__ import (absolute_import, division, print_function)
+from future.utils import iteritems
+
+import numpy as np
+
+from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.ParamStorage import CompactStorage, PatchStorage, freeze, select_index
+from pyPRMS.constants import HRU_DIMS
+
+
+def _shared(data):
+    """Get a read-only reference to parameter data that can be shared.
+
+    Arrays are shared through a read-only view; writeable (e.g. materialized)
+    data of the base is not copied.
+
+    :param data: stored parameter data
+    :type data: np.ndarray or CompactStorage or None
+    :rtype: np.ndarray or CompactStorage or None
+    """
+
+    if data is None or isinstance(data, CompactStorage):
+        # Compact storage objects are never modified in place
+        return data
+
+    data = data.view()
+    data.flags.writeable = False
+    return data
+
+
+class OverlayParameterSet(ParameterSet):
+
+    """Copy-on-write overlay of a ParameterSet.
+
+    The overlay starts out sharing the data arrays and metadata of the base
+    ParameterSet; only the dimensions and the small Parameter objects are its
+    own. Shared data is read-only: getting Parameter.data makes a private
+    copy before data is modified in place, and update_values() stores changes
+    to a few HRUs or segments as a patch on the shared data. The overlay is a
+    normal ParameterSet for readers and writers.
+
+    The base ParameterSet must not be modified in place while overlays of it
+    are in use.
+    """
+
+    def __init__(self, base):
+        """Create an OverlayParameterSet.
+
+        :param ParameterSet base: the ParameterSet to overlay
+        """
+
+        super(OverlayParameterSet, self).__init__(verbose=base.verbose, verify=False)
+
+        self.__base = base
+
+        # Parameter name to the shared data it started with
+        self.__shared = {}
+
+        for kk, vv in iteritems(base.dimensions):
+            self.dimensions.add(kk, vv.size)
+
+        for bparam in base.parameters.values():
+            self.parameters.add(bparam.name, info=bparam)
+            cparam = self.parameters.get(bparam.name)
+
+            for kk, vv in iteritems(bparam.dimensions):
+                cparam.dimensions.add(kk, vv.size)
+
+            self.__shared[bparam.name] = _shared(bparam.storage)
+
+            if bparam.storage is not None:
+                cparam.data = self.__shared[bparam.name]
+
+    @property
+    def base(self):
+        """Get the ParameterSet being overlaid.
+
+        :rtype: ParameterSet
+        """
+
+        return self.__base
+
+    @property
+    def changed(self):
+        """Get the names of the parameters which differ from the base.
+
+        A parameter has changed if it was added, its data was replaced or
+        patched, or its metadata or dimensions were changed.
+
+        :rtype: list[str]
+        """
+
+        changed = []
+
+        for cparam in self.parameters.values():
+            if cparam.name not in self.__shared or not self.__base.parameters.exists(cparam.name):
+                changed.append(cparam.name)
+                continue
+
+            bparam = self.__base.parameters.get(cparam.name)
+
+            if (cparam.storage is not self.__shared[cparam.name] or cparam.meta is not bparam.meta or
+                    list(cparam.dimensions.keys()) != list(bparam.dimensions.keys()) or
+                    [vv.size for vv in cparam.dimensions.values()] != [vv.size for vv in bparam.dimensions.values()]):
+                changed.append(cparam.name)
+        return changed
+
+    @property
+    def master_parameters(self):
+        """Get master parameters of the base.
+
+        :rtype: ValidParams
+        """
+
+        return self.__base.master_parameters
+
+    @property
+    def nbytes(self):
+        """Get the number of bytes of parameter data owned by the overlay.
+
+        Shared data and the shared base of patched data are not counted.
+
+        :rtype: int
+        """
+
+        total = 0
+        for cparam in self.parameters.values():
+            if cparam.storage is not self.__shared.get(cparam.name):
+                total += cparam.nbytes
+        return total
+
+    def reset(self, name=None):
+        """Revert one or all parameters to the data and metadata of the base.
+
+        Parameters which do not exist in the base are removed.
+
+        :param name: name of the parameter; None resets all parameters
+        :type name: str or None
+        """
+
+        names = list(self.parameters.keys()) if name is None else [name]
+
+        for cname in names:
+            self.parameters.remove(cname)
+
+            if cname in self.__shared and self.__base.parameters.exists(cname):
+                bparam = self.__base.parameters.get(cname)
+                self.parameters.add(cname, info=bparam)
+                cparam = self.parameters.get(cname)
+
+                for kk, vv in iteritems(bparam.dimensions):
+                    cparam.dimensions.add(kk, vv.size)
+
+                if self.__shared[cname] is not None:
+                    cparam.data = self.__shared[cname]
+
+        if name is None:
+            for kk, vv in iteritems(self.__base.dimensions):
+                if self.dimensions.exists(kk):
+                    self.dimensions.get(kk).size = vv.size
+
+    def update_values(self, name, values, hrus=None, segs=None):
+        """Change the values of a parameter for all or some HRUs or segments.
+
+        When hrus or segs is given only the selected rows are stored (as a
+        patch on the shared data); otherwise the data is replaced. The values
+        are broadcast (with the numpy rules) to the shape of the selected data,
+        e.g. one value per selected HRU of an (nhru, nmonths) parameter is
+        given as an array of shape (n, 1).
+
+        :param str name: name of the parameter
+        :param values: new values
+        :param hrus: global HRU ids (nhm_id) to change; the parameter must have an HRU dimension
+        :param segs: global segment ids (nhm_seg) to change; the parameter must have the nsegment dimension
+        :raises ValueError: if the parameter does not have the dimension for the selected ids
+        """
+
+        cparam = self.parameters.get(name)
+        shape = cparam.storage.shape
+
+        if hrus is None and segs is None:
+            cparam.data = np.array(np.broadcast_to(np.asarray(values), shape), order='F')
+            return
+
+        if hrus is not None:
+            id_param, dim_set, selected = 'nhm_id', HRU_DIMS, hrus
+        else:
+            id_param, dim_set, selected = 'nhm_seg', ['nsegment'], segs
+
+        dim_names = list(cparam.dimensions.keys())
+        if dim_names[0] not in dim_set:
+            raise ValueError('{} does not have the leading dimension {}'.format(name, dim_set[0]))
+
+        if self.parameters.exists(id_param):
+            rows = select_index(self.parameters.get(id_param).values, selected)
+        else:
+            # Local 1-based ids
+            rows = np.asarray(list(selected) if not isinstance(selected, np.ndarray) else selected) - 1
+
+        # Fortran-order positions of every element in the selected rows
+        ncols = int(np.prod(shape[1:]))
+        positions = np.add.outer(rows, shape[0] * np.arange(ncols)).ravel(order='F')
+        new_values = np.broadcast_to(values, (rows.size, ) + tuple(shape[1:])).ravel(order='F')
+
+        storage = cparam.storage
+
+        if isinstance(storage, PatchStorage):
+            cparam.data = storage.patch(positions, new_values)
+        elif storage is self.__shared.get(name):
+            cparam.data = PatchStorage(storage, positions, new_values)
+        else:
+            # The overlay already owns the data
+            data = np.array(cparam.values, order='F')
+            data.ravel(order='F')[positions] = new_values
+            cparam.data = freeze(data)
@@ -7,6 +7,7 @@ from collections import OrderedDict
 from pyPRMS.prms_helpers import read_xml
 from pyPRMS.Exceptions_custom import ConcatError
 from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.ParamStorage import compact_encoding_enabled
 from pyPRMS.constants import REGIONS, NHM_DATATYPES
 from pyPRMS.constants import PARAMETERS_XML
 
@@ -271,5 +272,9 @@ class ParamDbRegion(ParameterSet):
 
                 crv_offset = self.parameters.get(xml_param_name).data.size
 
+        if compact_encoding_enabled():
+            # The regions are concatenated first; encode the complete parameters
+            self.encode()
+
         # self.parameters['tosegment'].data = self.parameters['tosegment_nhm'].data
         # self.parameters['hru_segment'].data = self.parameters['hru_segment_nhm'].data
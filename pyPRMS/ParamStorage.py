@@ -0,0 +1,757 @@
+
+from __future__ import (absolute_import, division, print_function)
+
+import hashlib
+import numpy as np
+
+# Storage dtypes for the PRMS datatypes (see DATA_TYPES). These match the
+# precision PRMS itself uses; strings are stored as fixed-width bytes.
+STORAGE_DTYPES = {1: np.dtype(np.int32), 2: np.dtype(np.float32), 3: np.dtype(np.float64), 4: np.dtype('S')}
+
+# When True, float parameters (datatype 2) are stored as float64
+_double_precision = False
+
+# Parameter data arrays are always stored in Fortran (column-major) order, the
+# same as PRMS. Flattening with order='F' (e.g. when writing parameter files),
+# transposing for netCDF, and taking whole columns are views instead of copies.
+
+
+def use_double_precision(flag=True):
+    """Set whether float parameters are stored in double precision.
+
+    By default float parameters (datatype 2) are stored as float32, the same as
+    PRMS. This only applies to parameter data created after the call.
+
+    :param bool flag: store float parameters as float64
+    """
+
+    global _double_precision
+    _double_precision = bool(flag)
+
+
+def storage_dtype(datatype):
+    """Get the numpy dtype used to store data for a PRMS datatype.
+
+    :param int datatype: The datatype for the parameter (1-Integer, 2-Float, 3-Double, 4-String)
+    :rtype: np.dtype
+    :raises TypeError: if the datatype is not valid
+    """
+
+    if datatype not in STORAGE_DTYPES:
+        raise TypeError('Datatype {} is not valid'.format(datatype))
+
+    if datatype == 2 and _double_precision:
+        return np.dtype(np.float64)
+    return STORAGE_DTYPES[datatype]
+
+
+def to_storage(data, datatype):
+    """Convert data to the storage dtype for a PRMS datatype.
+
+    Arrays which already have the storage dtype and are Fortran-contiguous
+    are returned without a copy.
+
+    :param data: list or array of data
+    :param int datatype: The datatype for the parameter (1-Integer, 2-Float, 3-Double, 4-String)
+    :returns: Fortran-ordered array
+    :rtype: np.ndarray
+    """
+
+    dtype = storage_dtype(datatype)
+
+    if dtype.kind == 'S':
+        data = np.asarray(data)
+        if data.dtype.kind == 'U':
+            data = np.char.encode(data, 'utf-8')
+        return np.asarray(data.astype(dtype, copy=False), order='F')
+    return np.asarray(data, dtype=dtype, order='F')
+
+
+def can_store(dtype, datatype):
+    """Check that an array dtype can be stored as a PRMS datatype without losing its meaning.
+
+    Casts within the same kind (e.g. int64 to int32, float64 to float32) and
+    from integer to float are allowed. Casts which truncate or reinterpret the
+    values (e.g. float to integer, numbers to strings) are not.
+
+    :param np.dtype dtype: dtype of the incoming data
+    :param int datatype: The datatype for the parameter (1-Integer, 2-Float, 3-Double, 4-String)
+    :rtype: bool
+    :raises TypeError: if the datatype is not valid
+    """
+
+    target = storage_dtype(datatype)
+    dtype = np.dtype(dtype)
+
+    if target.kind == 'S':
+        return dtype.kind in 'SU'
+    if dtype.kind in 'SUO':
+        return False
+    return bool(np.can_cast(dtype, target, casting='same_kind'))
+
+
+def take(data, indices, axis=0):
+    """Select entries along an axis of an array.
+
+    This is the same as np.take() except the result is always Fortran-ordered.
+    The selected entries are copied directly into the result so no temporary
+    C-ordered array is created.
+
+    :param np.ndarray data: array of data
+    :param indices: 0-based indices to select
+    :param int axis: axis to select along
+    :returns: Fortran-ordered array
+    :rtype: np.ndarray
+    :raises IndexError: if an index is out of range
+    """
+
+    indices = np.asarray(indices, dtype=np.intp).ravel()
+    size = data.shape[axis]
+
+    if indices.size and (indices.min() < -size or indices.max() >= size):
+        raise IndexError('Index out of range for axis {} with size {}'.format(axis, size))
+    indices = np.where(indices < 0, indices + size, indices)
+
+    out_shape = list(data.shape)
+    out_shape[axis] = indices.size
+
+    out = np.empty(out_shape, dtype=data.dtype, order='F')
+
+    # Indices have been checked; mode='clip' lets np.take write directly into out
+    np.take(data, indices, axis=axis, out=out, mode='clip')
+    return out
+
+
+def select_index(ids, selected):
+    """Get the 0-based positions of selected ids.
+
+    :param np.ndarray ids: global ids (e.g. nhm_id) in their current order
+    :param selected: global ids to select; the order is preserved
+    :returns: 0-based index positions
+    :rtype: np.ndarray
+
+    :raises ValueError: if a selected id does not exist
+    """
+
+    selected = np.asarray(list(selected) if not isinstance(selected, np.ndarray) else selected)
+    order = np.argsort(ids, kind='stable')
+    pos = np.searchsorted(ids, selected, sorter=order)
+    pos[pos == ids.size] = 0
+
+    idx = order[pos]
+    missing = ids[idx] != selected
+
+    if missing.any():
+        raise ValueError('Ids do not exist: {}'.format(selected[missing][0:10].tolist()))
+    return idx
+
+
+def freeze(data):
+    """Make an array allocated for a parameter read-only.
+
+    Only call this for arrays nothing else refers to; arrays of the caller
+    are never frozen. Compact storage is never modified in place and is
+    returned unchanged.
+
+    :param data: array of data
+    :type data: np.ndarray or CompactStorage
+    :returns: the data
+    :rtype: np.ndarray or CompactStorage
+    """
+
+    if isinstance(data, np.ndarray):
+        data.flags.writeable = False
+    return data
+
+
+def is_read_only(data):
+    """Check that data cannot be modified in place, either directly or through another array.
+
+    :param data: array of data
+    :type data: np.ndarray or CompactStorage
+    :rtype: bool
+    """
+
+    while isinstance(data, np.ndarray):
+        if data.flags.writeable:
+            return False
+        data = data.base
+    return True
+
+
+def is_fortran_layout(data):
+    """Check that an array has the internal (Fortran-contiguous) layout.
+
+    :param np.ndarray data: array of data
+    :rtype: bool
+    """
+
+    return bool(data.flags.f_contiguous)
+
+
+def to_native(data):
+    """Convert stored data to python-friendly values.
+
+    float32 values are converted to the float64 value with the same shortest
+    decimal representation (e.g. 0.1 instead of 0.10000000149011612) and bytes
+    are decoded to str.
+
+    :param np.ndarray data: array of data
+    :rtype: np.ndarray
+    """
+
+    if data.dtype == np.float32:
+        return data.astype(str).astype(np.float64)
+    if data.dtype.kind == 'S':
+        return np.char.decode(data, 'utf-8')
+    return data
+
+
+def as_storage_scalar(value, dtype):
+    """Convert a minimum or maximum value to the precision of the stored data.
+
+    Comparisons between float32 data and float64 limits would otherwise treat
+    a value equal to the limit as out of range.
+
+    :param value: numeric value
+    :param np.dtype dtype: dtype of the stored data
+    """
+
+    if dtype.kind == 'f':
+        return dtype.type(value)
+    return value
+
+
+class CompactStorage(object):
+
+    """Base class for compact in-memory representations of parameter data.
+
+    A compact storage object stands in for a full numpy array in a Parameter.
+    The full array is only created by materialize(); writers and reductions
+    work on the distinct values (factorize() and value_counts()) instead.
+    """
+
+    @property
+    def dtype(self):
+        """Get the datatype of the logical array.
+
+        :rtype: np.dtype
+        """
+
+        raise NotImplementedError
+
+    @property
+    def shape(self):
+        """Get the shape of the logical array.
+
+        :rtype: tuple[int]
+        """
+
+        raise NotImplementedError
+
+    @property
+    def ndim(self):
+        """Get the number of dimensions of the logical array.
+
+        :rtype: int
+        """
+
+        return len(self.shape)
+
+    @property
+    def size(self):
+        """Get the total number of elements in the logical array.
+
+        :rtype: int
+        """
+
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        """Get the number of bytes used by the compact representation.
+
+        :rtype: int
+        """
+
+        raise NotImplementedError
+
+    def factorize(self):
+        """Get a table of values and the code (index into the table) for each element.
+
+        :returns: table of values and array of codes with the logical shape
+        :rtype: (np.ndarray, np.ndarray)
+        """
+
+        raise NotImplementedError
+
+    def materialize(self):
+        """Get a new, writeable, full array of the data.
+
+        :rtype: np.ndarray
+        """
+
+        table, codes = self.factorize()
+        return np.asarray(table[codes], order='F')
+
+    def max(self):
+        """Get the maximum value."""
+        return self.value_counts()[0].max()
+
+    def min(self):
+        """Get the minimum value."""
+        return self.value_counts()[0].min()
+
+    def unique(self):
+        """Get the sorted unique values.
+
+        :rtype: np.ndarray
+        """
+
+        return np.unique(self.value_counts()[0])
+
+    def value_counts(self):
+        """Get the stored values and how many times each one occurs in the logical array.
+
+        Values are not necessarily unique or sorted.
+
+        :returns: values and counts
+        :rtype: (np.ndarray, np.ndarray)
+        """
+
+        raise NotImplementedError
+
+    def view(self):
+        """Get a read-only array of the data.
+
+        :rtype: np.ndarray
+        """
+
+        data = self.materialize()
+        data.flags.writeable = False
+        return data
+
+
+class BroadcastStorage(CompactStorage):
+
+    """Compact storage for data that is a smaller source array broadcast to a larger shape.
+
+    This is used for parameters that have been expanded (e.g. from 'one' or
+    'nmonths' to 'nhru' x 'nmonths'). Only the source array is stored.
+    """
+
+    def __init__(self, source, shape, out_shape=None):
+        """Create a BroadcastStorage object.
+
+        :param np.ndarray source: source array; must be broadcastable to shape
+        :param shape: shape the source is broadcast to
+        :type shape: tuple[int]
+        :param out_shape: optional shape the broadcast array is reshaped (C-order) to
+        :type out_shape: tuple[int] or None
+        """
+
+        self.__source = np.array(source)
+        self.__bshape = tuple(shape)
+        self.__shape = tuple(out_shape) if out_shape is not None else self.__bshape
+
+        # Raises a ValueError if the source cannot be broadcast to the shape
+        np.broadcast_to(self.__source, self.__bshape)
+
+        if int(np.prod(self.__shape)) != int(np.prod(self.__bshape)):
+            raise ValueError('Cannot reshape broadcast shape {} to {}'.format(self.__bshape, self.__shape))
+
+    @property
+    def dtype(self):
+        return self.__source.dtype
+
+    @property
+    def nbytes(self):
+        return self.__source.nbytes
+
+    @property
+    def shape(self):
+        return self.__shape
+
+    @property
+    def source(self):
+        """Get the source array.
+
+        :rtype: np.ndarray
+        """
+
+        return self.__source
+
+    def factorize(self):
+        codes = np.arange(self.__source.size).reshape(self.__source.shape)
+        return self.__source.ravel(), self.__reshape(np.broadcast_to(codes, self.__bshape))
+
+    def materialize(self):
+        return np.array(self.__reshape(np.broadcast_to(self.__source, self.__bshape)), order='F')
+
+    def max(self):
+        return self.__source.max()
+
+    def min(self):
+        return self.__source.min()
+
+    def unique(self):
+        return np.unique(self.__source)
+
+    def value_counts(self):
+        # Every source element is repeated the same number of times
+        return self.__source.ravel(), np.full(self.__source.size, self.size // max(self.__source.size, 1))
+
+    def view(self):
+        if self.__shape == self.__bshape:
+            # Zero-copy, read-only view
+            return np.broadcast_to(self.__source, self.__bshape)
+        return super(BroadcastStorage, self).view()
+
+    def __reshape(self, arr):
+        if self.__shape == self.__bshape:
+            return arr
+        return arr.reshape(self.__shape)
+
+
+class ConstantStorage(BroadcastStorage):
+
+    """Compact storage for data where every value is the same."""
+
+    def __init__(self, value, shape, dtype=None):
+        """Create a ConstantStorage object.
+
+        :param value: the value of every element
+        :param shape: shape of the data
+        :type shape: tuple[int]
+        :param dtype: dtype of the data; by default the dtype of value is used
+        :type dtype: np.dtype or None
+        """
+
+        super(ConstantStorage, self).__init__(np.array(value, dtype=dtype).reshape([1] * len(shape)), shape)
+
+    @property
+    def value(self):
+        """Get the value of every element.
+
+        :returns: the value
+        """
+
+        return self.source.ravel()[0]
+
+
+class DictionaryStorage(CompactStorage):
+
+    """Compact storage for data with few distinct values.
+
+    The distinct values are stored once in a sorted table; each element is
+    stored as the smallest unsigned integer code that can index the table.
+    """
+
+    def __init__(self, table, codes):
+        """Create a DictionaryStorage object.
+
+        :param np.ndarray table: sorted distinct values
+        :param np.ndarray codes: 0-based index into table for every element, with the shape of the data
+        """
+
+        self.__table = np.asarray(table)
+        self.__codes = np.asarray(codes, order='F')
+
+    @property
+    def dtype(self):
+        return self.__table.dtype
+
+    @property
+    def nbytes(self):
+        return self.__table.nbytes + self.__codes.nbytes
+
+    @property
+    def shape(self):
+        return self.__codes.shape
+
+    def factorize(self):
+        # The stored codes are returned read-only so the storage cannot be modified
+        codes = self.__codes.view()
+        codes.flags.writeable = False
+        return self.__table, codes
+
+    def max(self):
+        return self.__table.max()
+
+    def min(self):
+        return self.__table.min()
+
+    def unique(self):
+        return self.__table
+
+    def value_counts(self):
+        return self.__table, np.bincount(self.__codes.ravel(order='F'), minlength=self.__table.size)
+
+
+class SparseStorage(CompactStorage):
+
+    """Compact storage for data where most elements have the same value (e.g. zero).
+
+    Only the positions (in Fortran order) and values of the other elements are stored.
+    """
+
+    def __init__(self, fill_value, positions, values, shape):
+        """Create a SparseStorage object.
+
+        :param fill_value: value of the elements which are not stored
+        :param np.ndarray positions: 0-based Fortran-order positions of the stored elements
+        :param np.ndarray values: values of the stored elements
+        :param shape: shape of the data
+        :type shape: tuple[int]
+        """
+
+        self.__values = np.asarray(values)
+        self.__fill_value = np.array(fill_value, dtype=self.__values.dtype)
+        self.__positions = np.asarray(positions)
+        self.__shape = tuple(shape)
+
+    @property
+    def dtype(self):
+        return self.__values.dtype
+
+    @property
+    def fill_value(self):
+        """Get the value of the elements which are not stored."""
+        return self.__fill_value[()]
+
+    @property
+    def nbytes(self):
+        return self.__fill_value.nbytes + self.__positions.nbytes + self.__values.nbytes
+
+    @property
+    def shape(self):
+        return self.__shape
+
+    def factorize(self):
+        table, inverse = np.unique(np.concatenate((self.__fill_value.reshape(1), self.__values)),
+                                   return_inverse=True)
+        inverse = inverse.ravel().astype(code_dtype(table.size))
+
+        codes = np.full(self.size, inverse[0], dtype=inverse.dtype)
+        codes[self.__positions] = inverse[1:]
+        return table, codes.reshape(self.__shape, order='F')
+
+    def materialize(self):
+        data = np.full(self.size, self.__fill_value, dtype=self.dtype)
+        data[self.__positions] = self.__values
+        return data.reshape(self.__shape, order='F')
+
+    def max(self):
+        if self.__values.size:
+            return max(self.__fill_value[()], self.__values.max())
+        return self.__fill_value[()]
+
+    def min(self):
+        if self.__values.size:
+            return min(self.__fill_value[()], self.__values.min())
+        return self.__fill_value[()]
+
+    def value_counts(self):
+        values, counts = np.unique(self.__values, return_counts=True)
+        return (np.concatenate((self.__fill_value.reshape(1), values)),
+                np.concatenate(([self.size - self.__values.size], counts)))
+
+
+class PatchStorage(CompactStorage):
+
+    """Compact storage for data that differs from a shared base array at a few elements.
+
+    The base (a numpy array or another CompactStorage object) is shared and
+    never modified; only the positions (in Fortran order) and new values of
+    the changed elements are stored.
+    """
+
+    def __init__(self, base, positions, values):
+        """Create a PatchStorage object.
+
+        :param base: shared data the patch applies to
+        :type base: np.ndarray or CompactStorage
+        :param np.ndarray positions: 0-based Fortran-order positions of the changed elements
+        :param np.ndarray values: new values of the changed elements
+        """
+
+        self.__base = base
+        self.__positions = np.asarray(positions)
+        self.__values = np.asarray(values, dtype=base.dtype)
+
+    @property
+    def base(self):
+        """Get the shared data the patch applies to."""
+        return self.__base
+
+    @property
+    def dtype(self):
+        return self.__base.dtype
+
+    @property
+    def nbytes(self):
+        # The base is shared so it is not counted
+        return self.__positions.nbytes + self.__values.nbytes
+
+    @property
+    def shape(self):
+        return self.__base.shape
+
+    def factorize(self):
+        # Every element gets its own code; the data is only expanded once
+        data = self.materialize()
+        return data.ravel(order='F'), np.arange(data.size).reshape(data.shape, order='F')
+
+    def materialize(self):
+        if isinstance(self.__base, CompactStorage):
+            data = self.__base.materialize()
+        else:
+            data = np.array(self.__base, order='F')
+
+        flat = data.ravel(order='F')
+        flat[self.__positions] = self.__values
+        return flat.reshape(self.shape, order='F')
+
+    def patch(self, positions, values):
+        """Create a new patch of the same base with additional changes.
+
+        :param np.ndarray positions: 0-based Fortran-order positions of the changed elements
+        :param np.ndarray values: new values of the changed elements
+        :rtype: PatchStorage
+        """
+
+        positions = np.concatenate((self.__positions, np.asarray(positions, dtype=self.__positions.dtype)))
+        values = np.concatenate((self.__values, np.asarray(values, dtype=self.dtype)))
+
+        # Later changes to the same position replace earlier ones
+        keep_pos, keep_idx = np.unique(positions[::-1], return_index=True)
+        return PatchStorage(self.__base, keep_pos, values[::-1][keep_idx])
+
+    def value_counts(self):
+        return np.unique(self.materialize(), return_counts=True)
+
+
+# Arrays with fewer elements than this are never encoded
+MIN_ENCODE_SIZE = 64
+
+# When True, parameter data read from files is encoded (see encode())
+_compact_encoding = False
+
+
+def use_compact_encoding(flag=True):
+    """Set whether parameter data is encoded when it is read.
+
+    When enabled, the data for each parameter read by ParameterFile, ParamDb,
+    or ParamDbRegion is stored with the most compact encoding (see encode()).
+    Encoded data is read-only; getting Parameter.data converts it back to a
+    regular array.
+
+    :param bool flag: encode parameter data when it is read
+    """
+
+    global _compact_encoding
+    _compact_encoding = bool(flag)
+
+
+def compact_encoding_enabled():
+    """Check if parameter data is encoded when it is read.
+
+    :rtype: bool
+    """
+
+    return _compact_encoding
+
+
+def code_dtype(size):
+    """Get the smallest unsigned integer dtype that can index a table.
+
+    :param int size: number of entries in the table
+    :rtype: np.dtype
+    """
+
+    for dtype in [np.uint8, np.uint16, np.uint32]:
+        if size <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def encode(data, max_ratio=0.5):
+    """Choose the most compact storage for an array.
+
+    The array is stored as a ConstantStorage if all values are the same,
+    otherwise as a DictionaryStorage or SparseStorage, whichever is smaller.
+    If neither uses at most max_ratio of the memory of the array (or the
+    array is small) the array is returned unchanged.
+
+    :param np.ndarray data: array of data
+    :param float max_ratio: maximum size of the encoding relative to the array
+    :returns: compact storage or the original array
+    :rtype: CompactStorage or np.ndarray
+    """
+
+    if isinstance(data, CompactStorage) or data.size < MIN_ENCODE_SIZE:
+        return data
+
+    flat = data.ravel(order='F')
+    table, inverse, counts = np.unique(flat, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+
+    if table.size == 1:
+        return ConstantStorage(table[0], data.shape, dtype=data.dtype)
+
+    # Memory used by each encoding
+    cdtype = code_dtype(table.size)
+    dict_nbytes = table.nbytes + data.size * cdtype.itemsize
+
+    common = int(counts.argmax())
+    nstored = data.size - int(counts[common])
+    pdtype = np.dtype(np.uint32) if data.size <= np.iinfo(np.uint32).max else np.dtype(np.int64)
+    sparse_nbytes = nstored * (data.itemsize + pdtype.itemsize)
+
+    if min(dict_nbytes, sparse_nbytes) > max_ratio * data.nbytes:
+        return data
+
+    if sparse_nbytes < dict_nbytes:
+        positions = np.flatnonzero(inverse != common).astype(pdtype)
+        return SparseStorage(table[common], positions, flat[positions], data.shape)
+    return DictionaryStorage(table, inverse.astype(cdtype).reshape(data.shape, order='F'))
+
+
+# Number of elements of compact data expanded at a time when hashing
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def content_hash(data, datatype, dimensions):
+    """Compute a stable content hash (BLAKE2b) of parameter data.
+
+    The hash covers the datatype, the dtype of the data, the dimension names
+    and sizes, and the raw values in Fortran order. Compact storage hashes the
+    same as the equivalent full array; it is expanded a chunk at a time.
+
+    :param data: parameter data
+    :type data: np.ndarray or CompactStorage or None
+    :param int datatype: The datatype for the parameter (1-Integer, 2-Float, 3-Double, 4-String)
+    :param dimensions: dimension names and sizes in position order
+    :type dimensions: list[(str, int)]
+    :returns: hex digest
+    :rtype: str
+    """
+
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr((datatype, tuple(dimensions))).encode('utf-8'))
+
+    if data is None:
+        return hasher.hexdigest()
+
+    hasher.update(data.dtype.str.encode('utf-8'))
+
+    if isinstance(data, CompactStorage):
+        table, codes = data.factorize()
+        codes = codes.ravel(order='F')
+
+        for ii in range(0, codes.size, HASH_CHUNK_SIZE):
+            hasher.update(np.ascontiguousarray(table[codes[ii:ii + HASH_CHUNK_SIZE]]))
+    else:
+        # A view of the data buffer for Fortran-ordered arrays
+        hasher.update(np.ascontiguousarray(data.ravel(order='F')))
+    return hasher.hexdigest()
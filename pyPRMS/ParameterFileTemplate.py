@@ -0,0 +1,184 @@
+
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import os
+
+from pyPRMS.ParameterSet import _render_dimensions, _render_header, _render_parameter
+from pyPRMS.ParamStorage import is_read_only
+from pyPRMS.constants import CATEGORY_DELIM
+
+# Maximum number of buffers passed to a single os.writev() call
+_MAX_IOV = 1024
+
+
+def _data_key(param):
+    """Get a key which identifies the data and structure of a parameter.
+
+    Arrays are identified by their buffer, shape, strides, and dtype so a
+    read-only view of the same data (e.g. in an OverlayParameterSet) has the
+    same key. Compact storage objects are never modified in place and are
+    identified by the object. Data which can be modified in place (see
+    ParamStorage.is_read_only()) can change without being replaced, so it has
+    no identity (None) and is matched by content.
+
+    :param Parameter param: the parameter
+    :rtype: tuple
+    """
+
+    data = param.storage
+    dims = tuple([(kk, vv.size) for kk, vv in param.dimensions.items()])
+
+    if isinstance(data, np.ndarray):
+        if not is_read_only(data):
+            data_id = None
+        else:
+            data_id = (data.__array_interface__['data'][0], data.shape, data.strides, data.dtype.str)
+    else:
+        data_id = id(data)
+    return param.name, param.datatype, dims, data_id
+
+
+def _encode(text):
+    """Encode rendered text the same way a text-mode file would."""
+
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return text.encode('utf-8')
+
+
+def _write_buffers(filename, buffers):
+    """Write a list of byte strings to a file with as few system calls as possible.
+
+    :param str filename: name of the file
+    :param list[bytes] buffers: content of the file
+    """
+
+    if not hasattr(os, 'writev'):
+        with open(filename, 'wb') as fh:
+            fh.write(b''.join(buffers))
+        return
+
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        for ii in range(0, len(buffers), _MAX_IOV):
+            chunk = buffers[ii:ii + _MAX_IOV]
+            nbytes = os.writev(fd, chunk)
+
+            remaining = sum([len(bb) for bb in chunk]) - nbytes
+            if remaining:
+                # Partial write; write the rest of the chunk directly
+                data = memoryview(b''.join(chunk))[nbytes:]
+                while data:
+                    data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+class ParameterFileTemplate(object):
+
+    """Pre-rendered parameter file for writing many ParameterSets with the same structure.
+
+    The header, dimension section, and the block of each parameter are
+    rendered once, as bytes, from a reference ParameterSet. Writing another
+    ParameterSet only renders the parameters whose data, dimensions, or
+    datatype differ from the reference; the rest are written from the
+    cached bytes. The output is the same as ParameterSet.write_parameter_file().
+
+    Parameter data is matched by identity (the same read-only array buffer or
+    compact storage object), which is what an OverlayParameterSet of the
+    reference shares with it. A read-only buffer always has the same content;
+    data which can be modified in place (e.g. after getting Parameter.data)
+    is matched by its fingerprint.
+    """
+
+    def __init__(self, pset, header=None):
+        """Create a ParameterFileTemplate.
+
+        :param ParameterSet pset: the reference ParameterSet
+        :param list[str] header: list of header lines
+        """
+
+        self.__header = _encode(_render_header(header))
+        self.__params_hdr = _encode('{} Parameters {}\n'.format(CATEGORY_DELIM, CATEGORY_DELIM))
+
+        self.__dims_key = None
+        self.__dims_block = None
+        self.__set_dimensions(pset.dimensions)
+
+        # Parameter name to (data key, fingerprint, rendered bytes, storage);
+        # the storage is kept so its id and buffer address are not reused
+        self.__blocks = {}
+
+        for cparam in pset.parameters.values():
+            self.__blocks[cparam.name] = (_data_key(cparam), cparam.fingerprint(), _encode(_render_parameter(cparam)),
+                                          cparam.storage)
+
+    @property
+    def nbytes(self):
+        """Get the number of bytes of cached content.
+
+        :rtype: int
+        """
+
+        return (len(self.__header) + len(self.__params_hdr) + len(self.__dims_block) +
+                sum([len(vv[2]) for vv in self.__blocks.values()]))
+
+    def __set_dimensions(self, dimensions):
+        self.__dims_key = tuple([(kk, vv.size) for kk, vv in dimensions.items()])
+        self.__dims_block = _encode(_render_dimensions(dimensions))
+
+    def render(self, pset, check_fingerprints=False):
+        """Get the content of the parameter file for a ParameterSet.
+
+        :param ParameterSet pset: ParameterSet to render
+        :param bool check_fingerprints: match unchanged parameters by content fingerprint instead of data identity
+        :returns: the file content as a list of byte strings, and the names of the parameters that were rendered
+        :rtype: (list[bytes], list[str])
+        """
+
+        buffers = [self.__header]
+
+        if tuple([(kk, vv.size) for kk, vv in pset.dimensions.items()]) == self.__dims_key:
+            buffers.append(self.__dims_block)
+        else:
+            buffers.append(_encode(_render_dimensions(pset.dimensions)))
+
+        buffers.append(self.__params_hdr)
+
+        rendered = []
+        for cparam in pset.parameters.values():
+            cached = self.__blocks.get(cparam.name)
+
+            if cached is not None:
+                key = _data_key(cparam)
+
+                if check_fingerprints or key[3] is None:
+                    same = cached[0][0:3] == key[0:3] and cached[1] == cparam.fingerprint()
+                else:
+                    same = cached[0] == key
+
+                if same:
+                    buffers.append(cached[2])
+                    continue
+
+            buffers.append(_encode(_render_parameter(cparam)))
+            rendered.append(cparam.name)
+        return buffers, rendered
+
+    def write(self, pset, filename, check_fingerprints=False):
+        """Write a parameter file for a ParameterSet.
+
+        The file is written with os.writev() where available, otherwise with
+        a single buffered write.
+
+        :param ParameterSet pset: ParameterSet to write
+        :param str filename: name of parameter file
+        :param bool check_fingerprints: match unchanged parameters by content fingerprint instead of data identity
+        :returns: names of the parameters that were rendered (i.e. not taken from the template)
+        :rtype: list[str]
+        """
+
+        buffers, rendered = self.render(pset, check_fingerprints=check_fingerprints)
+        _write_buffers(filename, buffers)
+        return rendered
@@ -2,7 +2,9 @@
 from __future__ import (absolute_import, division, print_function)
 from future.utils import iteritems
 
-import netCDF4 as nc
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import numpy as np
 import os
 import sys
@@ -10,12 +12,172 @@ import xml.dom.minidom as minidom
 import xml.etree.ElementTree as xmlET
 
 from pyPRMS.Parameters import Parameters
-from pyPRMS.Dimensions import Dimensions
+from pyPRMS.Dimensions import Dimension, Dimensions
+from pyPRMS.Grouping import Grouping
+from pyPRMS.NetworkPartition import NetworkPartition
+from pyPRMS.ParamStorage import BroadcastStorage, as_storage_scalar, freeze, is_fortran_layout, is_read_only, \
+                                storage_dtype, take
 from pyPRMS.ValidParams import ValidParams
-from pyPRMS.constants import CATEGORY_DELIM, NETCDF_DATATYPES, NHM_DATATYPES, PARAMETERS_XML
-from pyPRMS.constants import DIMENSIONS_XML, VAR_DELIM, HRU_DIMS
+from pyPRMS.ParameterTransform import Adjustment, ParameterTransform
+from pyPRMS.param_stats import ParamStats, grouped_mode, grouped_statistics
+from pyPRMS.constants import CATEGORY_DELIM, NETCDF_DATATYPES, NETCDF_FILLVALUES, NHM_DATATYPES, PARAMETERS_XML
+from pyPRMS.constants import DATA_TYPES, DIMENSIONS_XML, VAR_DELIM, HRU_DIMS
 from pyPRMS.prms_helpers import float_to_str
 
+# OverlayParameterSet, ParameterFileTemplate and ParameterSetView import this
+# module, so they are imported in the methods which use them.
+
+
+def _format_values(values, datatype):
+    """Format parameter values for a PRMS parameter file.
+
+    Floats are written in positional notation with at most six decimals and
+    without extraneous zeroes. Float32 values are formatted from their
+    shortest representation, so they are not first converted with to_native().
+
+    :param np.ndarray values: 1D array of values (e.g. the table from Parameter.factorize())
+    :param int datatype: the datatype for the parameter
+    :returns: each formatted value followed by a newline
+    :rtype: list[str]
+    """
+
+    if datatype in [2, 3]:
+        # Float and double types have to be formatted specially so
+        # they aren't written in exponential notation or with
+        # extraneous zeroes
+        return ['{}\n'.format(np.format_float_positional(xx, precision=6, unique=True, trim='0'))
+                for xx in values]
+    if values.dtype.kind == 'S':
+        values = np.char.decode(values, 'utf-8')
+    return ['{}\n'.format(xx) for xx in values.tolist()]
+
+
+def _render_header(header):
+    """Render the header lines of a parameter file.
+
+    :param header: list of header lines
+    :type header: list[str] or None
+    :rtype: str
+    """
+
+    return ''.join(['{}\n'.format(hh) for hh in header or []])
+
+
+def _render_dimensions(dimensions):
+    """Render the dimension section of a parameter file.
+
+    :param Dimensions dimensions: global dimensions
+    :rtype: str
+    """
+
+    outstr = ['{} Dimensions {}\n'.format(CATEGORY_DELIM, CATEGORY_DELIM)]
+
+    for (kk, vv) in dimensions.items():
+        # Write each dimension name and size separated by VAR_DELIM
+        outstr.append('{}\n{}\n{:d}\n'.format(VAR_DELIM, kk, vv.size))
+    return ''.join(outstr)
+
+
+def _render_parameter(param):
+    """Render the block for a single parameter of a parameter file.
+
+    :param Parameter param: the parameter
+    :rtype: str
+    """
+
+    datatype = param.datatype
+
+    # Delimiter, name, number of dimensions, and the dimension names
+    outstr = ['{}\n{}\n{}\n'.format(VAR_DELIM, param.name, param.dimensions.ndims)]
+    outstr.extend(['{}\n'.format(dd.name) for dd in param.dimensions.values()])
+
+    # dimsize (which is computed) must be written before datatype
+    outstr.append('{}\n{}\n'.format(param.values.size, datatype))
+
+    # Write one value per line; each distinct value is formatted once and
+    # written out by code. Parameter data is stored Fortran-ordered so the
+    # codes are raveled in that order.
+    table, codes = param.factorize()
+    table_str = np.array(_format_values(table, datatype), dtype=object)
+    outstr.extend(table_str[codes.ravel(order='F')].tolist())
+    return ''.join(outstr)
+
+
+ParameterSetDiff = namedtuple('ParameterSetDiff', ['added', 'removed', 'dimensions', 'hrus_added', 'hrus_removed',
+                                                   'segs_added', 'segs_removed', 'parameters'])
+ParameterSetDiff.__doc__ = """Differences between two ParameterSets (see ParameterSet.diff()).
+
+added and removed are the names of parameters which only exist in the other
+or in this ParameterSet; dimensions maps the name of each global dimension
+with a different size to (size, other size), where a missing dimension has
+a size of None; hrus_added, hrus_removed, segs_added, and segs_removed are
+arrays of the global ids (nhm_id, nhm_seg) which only exist in one of the
+sets. parameters is a DataFrame with one row per parameter in both sets.
+"""
+
+
+def _align_ids(ids, other_ids):
+    """Match global ids between two ParameterSets.
+
+    :param ids: global ids of the first set; None if it has no ids
+    :type ids: np.ndarray or None
+    :param other_ids: global ids of the second set; None if it has no ids
+    :type other_ids: np.ndarray or None
+    :returns: 0-based positions of the common ids in each set (None for the
+              same positions in both), the common ids, and the ids only in the
+              first and only in the second set
+    :rtype: tuple
+    """
+
+    if ids is None or other_ids is None:
+        return None, None, None, np.array([], dtype=int), np.array([], dtype=int)
+
+    if np.array_equal(ids, other_ids):
+        return None, None, ids, ids[0:0], ids[0:0]
+
+    common, idx, other_idx = np.intersect1d(ids, other_ids, assume_unique=True, return_indices=True)
+
+    # Keep the order of the first set
+    order = np.argsort(idx, kind='stable')
+    idx, other_idx = idx[order], other_idx[order]
+    return (idx, other_idx, ids[idx], np.setdiff1d(ids, other_ids, assume_unique=True),
+            np.setdiff1d(other_ids, ids, assume_unique=True))
+
+
+def _compare_values(data, other_data, rtol, atol):
+    """Compare two aligned arrays of parameter values.
+
+    :param np.ndarray data: first array
+    :param np.ndarray other_data: second array with the same shape
+    :param float rtol: relative tolerance for float values
+    :param float atol: absolute tolerance for float values
+    :returns: boolean array of changed values, maximum absolute difference, maximum relative difference
+    :rtype: (np.ndarray, float, float)
+    """
+
+    if data.dtype.kind in 'iuf' and other_data.dtype.kind in 'iuf':
+        aa = data.astype(np.float64)
+        bb = other_data.astype(np.float64)
+
+        if data.dtype.kind == 'f' or other_data.dtype.kind == 'f':
+            changed = ~np.isclose(aa, bb, rtol=rtol, atol=atol, equal_nan=True)
+        else:
+            changed = aa != bb
+
+        if not changed.any():
+            return changed, 0.0, 0.0
+
+        abs_diff = np.abs(aa[changed] - bb[changed])
+        denom = np.abs(bb[changed])
+        nonzero = denom > 0
+
+        max_abs = float(np.nanmax(abs_diff)) if not np.isnan(abs_diff).all() else np.nan
+        max_rel = float(np.nanmax(abs_diff[nonzero] / denom[nonzero])) if nonzero.any() else np.nan
+        return changed, max_abs, max_rel
+
+    changed = data != other_data
+    return changed, np.nan, np.nan
+
 
 class ParameterSet(object):
 
@@ -39,6 +201,113 @@ class ParameterSet(object):
 
         self.verbose = verbose
 
+        # Filename to (key, file size, modification time) of parameter files
+        # written with skip_unchanged=True
+        self.__written = {}
+
+    @classmethod
+    def from_arrays(cls, arrays, dimensions=None, verbose=False, verify=True, copy=True):
+        """Create a ParameterSet from arrays of parameter data.
+
+        Each entry of arrays is (dimension names, data) or (dimension names,
+        data, datatype). When verify is True the metadata comes from the master
+        parameters; otherwise the datatype is inferred from the dtype of the
+        data. A datatype given in an entry always takes precedence.
+
+        By default the data is copied into read-only arrays of the ParameterSet,
+        so the statistics and fingerprints of the parameters can be cached. With
+        copy=False arrays which already have the storage dtype and Fortran
+        layout are used without a copy; they are not made read-only, and changes
+        the caller makes to them are seen by the ParameterSet.
+
+        :param arrays: parameter name to (dimension names, data[, datatype])
+        :type arrays: dict[str, tuple]
+        :param dimensions: global dimension sizes; if None they are inferred from the shapes of the arrays
+        :type dimensions: dict[str, int] or Dimensions or None
+        :param bool verbose: output debugging information
+        :param bool verify: whether to use the master parameters for the metadata (default=True)
+        :param bool copy: copy arrays which could otherwise be shared with the caller (default=True)
+        :returns: new ParameterSet
+        :rtype: ParameterSet
+
+        :raises ValueError: if a parameter is not a valid PRMS parameter, a dimension is undefined,
+                            or the shape of the data doesn't match the dimension sizes
+        :raises TypeError: if the datatype cannot be determined or the data cannot be cast to it
+        """
+
+        pset = cls(verbose=verbose, verify=verify)
+
+        entries = OrderedDict()
+        for name, entry in iteritems(arrays):
+            dim_names = (entry[0], ) if isinstance(entry[0], str) else tuple(entry[0])
+            data = entry[1] if isinstance(entry[1], np.ndarray) else np.asarray(entry[1])
+            datatype = entry[2] if len(entry) > 2 else None
+
+            if data.ndim != len(dim_names):
+                raise ValueError('{} has {} dimension names for {}-dimensional data'.format(name, len(dim_names),
+                                                                                             data.ndim))
+            entries[name] = (dim_names, data, datatype)
+
+        # Global dimensions
+        if dimensions is None:
+            dimensions = OrderedDict()
+
+            for name, (dim_names, data, _) in iteritems(entries):
+                for dd, dsize in zip(dim_names, data.shape):
+                    if dimensions.setdefault(dd, dsize) != dsize:
+                        raise ValueError('Size of dimension {} for {} ({}) doesn\'t match '
+                                         'other parameters ({})'.format(dd, name, dsize, dimensions[dd]))
+
+        for dd, dsize in iteritems(dimensions):
+            pset.dimensions.add(dd, dsize.size if isinstance(dsize, Dimension) else int(dsize))
+
+        for name, (dim_names, data, datatype) in iteritems(entries):
+            dim_sizes = []
+            for dd in dim_names:
+                if not pset.dimensions.exists(dd):
+                    raise ValueError('Dimension {} for {} is not defined'.format(dd, name))
+                dim_sizes.append(pset.dimensions.get(dd).size)
+
+            if data.shape != tuple(dim_sizes):
+                raise ValueError('Shape of {} {} doesn\'t match the dimension sizes {}'.format(name, data.shape,
+                                                                                              tuple(dim_sizes)))
+
+            if pset.master_parameters is not None:
+                if not pset.master_parameters.exists(name):
+                    raise ValueError('{} is not a valid PRMS parameter'.format(name))
+
+                # Share the metadata record of the master parameter
+                pset.parameters.add(name, info=pset.master_parameters[name])
+
+                if datatype is not None:
+                    pset.parameters.get(name).datatype = datatype
+            else:
+                if datatype is None:
+                    datatype = {'b': 1, 'i': 1, 'u': 1, 'S': 4, 'U': 4}.get(data.dtype.kind)
+
+                    if data.dtype.kind == 'f':
+                        datatype = 3 if data.dtype.itemsize > 4 else 2
+
+                    if datatype is None:
+                        raise TypeError('Cannot determine the datatype of {} from {} data'.format(name, data.dtype))
+
+                pset.parameters.add(name, datatype=datatype)
+
+            cparam = pset.parameters.get(name)
+
+            for dd, dsize in zip(dim_names, dim_sizes):
+                cparam.dimensions.add(dd, dsize)
+
+            cparam.data = data
+
+            if np.may_share_memory(cparam.storage, data):
+                if data is not arrays[name][1]:
+                    # The array was created here from a list; nothing else refers to it
+                    freeze(cparam.storage)
+                elif copy:
+                    cparam.data = freeze(np.array(cparam.storage, order='F'))
+        return pset
+
     @property
     def dimensions(self):
         """Get dimensions object.
@@ -103,8 +372,8 @@ class ParameterSet(object):
 
         params_xml = xmlET.Element('parameters')
 
-        for pk in sorted(list(self.__parameters.keys())):
-            vv = self.__parameters[pk]
+        for pk in sorted(list(self.parameters.keys())):
+            vv = self.parameters[pk]
         # for vv in self.parameters.values():
             # print(vv.name, inv_map[vv.datatype])
             param_sub = xmlET.SubElement(params_xml, 'parameter')
@@ -152,20 +421,315 @@ class ParameterSet(object):
 
         assert False, 'ParameterSet._read() must be defined by child class'
 
+    def adjust(self, adjustments, method='scale', grouping=None, clip=True):
+        """Adjust the values of several parameters.
+
+        Each parameter is multiplied by ('scale'), offset by ('offset'), or
+        set to ('value') one value per group of the grouping, or a single
+        value when there is no grouping. The adjusted values are clipped to
+        the valid range of each parameter (see get_bounds()).
+
+        :param dict adjustments: parameter name to the adjustment values (see Adjustment)
+        :param str method: one of 'scale', 'offset', or 'value'
+        :param grouping: grouping of the HRUs or segments (see grouping())
+        :type grouping: Grouping or None
+        :param bool clip: clip the adjusted values to the valid range of the parameter
+        :returns: record of the adjustments, which can be replayed on another ParameterSet or restored
+        :rtype: ParameterTransform
+        """
+
+        return ParameterTransform([Adjustment(name=kk, method=method, values=vv, grouping=grouping, clip=clip)
+                                   for kk, vv in iteritems(adjustments)]).apply(self)
+
+    def aggregate_hrus(self, grouping, weights='hru_area'):
+        """Aggregate groups of HRUs into single HRUs.
+
+        Each group of the grouping (e.g. a mapping of nhm_id to the id of the
+        aggregated HRU) becomes one HRU of the new ParameterSet. Parameters
+        with a leading HRU dimension are aggregated per column: float
+        parameters by the weighted mean, hru_area by the sum, and integer and
+        string parameters (e.g. hru_type, cov_type) by the dominant value,
+        i.e. the value with the most weight. hru_segment and hru_deplcrv are
+        the dominant segment and depletion curve; hru_segment_nhm follows
+        hru_segment and snarea_curve is reduced to the curves still used.
+        The new nhm_id is the group label, or 1..n if the labels are not
+        integers. Other parameters share the read-only data of this
+        ParameterSet; writeable data is copied.
+
+        :param grouping: grouping of the HRUs; anything else is passed to grouping()
+        :type grouping: Grouping or str or dict
+        :param weights: name of the parameter to weight by, or None for equal weights
+        :type weights: str or None
+        :returns: new ParameterSet with one HRU per group
+        :rtype: ParameterSet
+        :raises ValueError: if the grouping is not of the HRUs or does not include every HRU
+        """
+
+        if not isinstance(grouping, Grouping):
+            grouping = self.grouping(grouping)
+
+        if grouping.dimension not in HRU_DIMS:
+            raise ValueError('Grouping of {} cannot be used to aggregate HRUs'.format(grouping.dimension))
+        if grouping.size != self.dimensions.get('nhru').size:
+            raise ValueError('Grouping has {} HRUs; expected {}'.format(grouping.size,
+                                                                        self.dimensions.get('nhru').size))
+        if (grouping.codes < 0).any():
+            raise ValueError('{} HRUs are not in any group'.format(int((grouping.codes < 0).sum())))
+
+        codes = grouping.codes
+        nhru = len(grouping)
+
+        hru_weights = None
+        if weights is not None and self.parameters.exists(weights):
+            hru_weights = self.parameters.get(weights).values
+
+        hru_params = [cparam for cparam in self.parameters.by_dimension('nhru')
+                      if list(cparam.dimensions.keys())[0] in HRU_DIMS]
+
+        new_data = {}
+
+        # Weighted means of all float parameters are computed together
+        mean_params = [cparam for cparam in hru_params if cparam.datatype in [2, 3] and cparam.name != 'hru_area']
+
+        if mean_params:
+            blocks = [cparam.values.reshape((grouping.size, -1), order='F') for cparam in mean_params]
+            means = grouped_statistics(codes, nhru, np.column_stack(blocks), weights=hru_weights,
+                                       stats=['mean'])['mean']
+
+            col = 0
+            for cparam, block in zip(mean_params, blocks):
+                new_data[cparam.name] = means[:, col:col + block.shape[1]]
+                col += block.shape[1]
+
+        for cparam in hru_params:
+            if cparam.name in new_data or cparam.name in ['nhm_id', 'hru_segment_nhm']:
+                continue
+
+            data = cparam.values.reshape((grouping.size, -1), order='F')
+
+            if cparam.name == 'hru_area':
+                new_data[cparam.name] = grouped_statistics(codes, nhru, data, stats=['sum'])['sum']
+            else:
+                new_data[cparam.name] = grouped_mode(codes, nhru, data, weights=hru_weights)
+
+        if self.parameters.exists('nhm_id'):
+            labels = np.asarray(grouping.labels)
+            new_data['nhm_id'] = labels if labels.dtype.kind in 'iu' else np.arange(1, nhru + 1)
+
+        if self.parameters.exists('hru_segment_nhm'):
+            if self.parameters.exists('hru_segment') and self.parameters.exists('nhm_seg'):
+                # The global id of the local segment
+                hru_segment = new_data['hru_segment'].ravel()
+                nhm_seg = np.concatenate(([0], self.parameters.get('nhm_seg').values))
+                new_data['hru_segment_nhm'] = nhm_seg[np.where(hru_segment > 0, hru_segment, 0)]
+            else:
+                new_data['hru_segment_nhm'] = grouped_mode(codes, nhru,
+                                                           self.parameters.get('hru_segment_nhm').values[:, np.newaxis],
+                                                           weights=hru_weights)
+
+        dim_sizes = OrderedDict([(kk, vv.size) for kk, vv in iteritems(self.dimensions)])
+        for dd in HRU_DIMS:
+            if dd in dim_sizes:
+                dim_sizes[dd] = nhru
+
+        if 'hru_deplcrv' in new_data and self.parameters.exists('snarea_curve'):
+            # Keep only the depletion curves which are still used and renumber them
+            used, hru_deplcrv = np.unique(new_data['hru_deplcrv'], return_inverse=True)
+            new_data['hru_deplcrv'] = hru_deplcrv + 1
+            new_data['snarea_curve'] = self.parameters.get('snarea_curve').values.reshape((-1, 11))[used - 1, :].ravel()
+
+            dim_sizes['ndeplval'] = new_data['snarea_curve'].size
+            if 'ndepl' in dim_sizes:
+                dim_sizes['ndepl'] = used.size
+
+        pset = ParameterSet(verbose=self.verbose, verify=self.master_parameters is not None)
+
+        for kk, vv in iteritems(dim_sizes):
+            pset.dimensions.add(kk, vv)
+
+        for cparam in self.parameters.values():
+            pset.parameters.add(cparam.name, info=cparam.meta)
+            nparam = pset.parameters.get(cparam.name)
+
+            shape = []
+            for kk in cparam.dimensions.keys():
+                nparam.dimensions.add(kk, dim_sizes.get(kk, cparam.dimensions.get(kk).size))
+                shape.append(nparam.dimensions.get(kk).size)
+
+            if cparam.name in new_data:
+                data = np.asarray(new_data[cparam.name]).reshape(shape, order='F')
+                nparam.data = freeze(np.asfortranarray(data.astype(storage_dtype(cparam.datatype))))
+            elif cparam.storage is None:
+                continue
+            elif cparam.is_compact or is_read_only(cparam.storage):
+                # Compact storage and read-only arrays are never modified in place
+                nparam.data = cparam.storage
+            else:
+                nparam.data = freeze(np.array(cparam.storage, order='F'))
+        return pset
+
     def degenerate_parameters(self):
-        """List parameters that have fewer dimensions than specified in the master parameters."""
+        """List parameters that have fewer dimensions than specified in the master parameters.
 
-        if self.__master_params is not None:
+        :returns: names of the degenerate parameters
+        :rtype: list[str]
+        """
+
+        degenerate = []
+
+        if self.master_parameters is not None:
             for kk, vv in iteritems(self.parameters):
                 try:
-                    if set(vv.dimensions.keys()) != set(self.__master_params[kk].dimensions.keys()):
-                        if not (set(self.__master_params[kk].dimensions.keys()).issubset(set(HRU_DIMS)) and
+                    if set(vv.dimensions.keys()) != set(self.master_parameters[kk].dimensions.keys()):
+                        if not (set(self.master_parameters[kk].dimensions.keys()).issubset(set(HRU_DIMS)) and
                                 set(vv.dimensions.keys()).issubset(HRU_DIMS)):
+                            degenerate.append(kk)
                             print('Parameter, {}, is degenerate'.format(kk))
                             print('  parameter: ', list(vv.dimensions.keys()))
-                            print('     master: ', list(self.__master_params[kk].dimensions.keys()))
+                            print('     master: ', list(self.master_parameters[kk].dimensions.keys()))
                 except ValueError:
                     print('ERROR: Parameter, {}, is not a valid PRMS parameter'.format(kk))
+        return degenerate
+
+    def diff(self, other, rtol=1e-6, atol=0.0):
+        """Compare this ParameterSet with another.
+
+        Parameters are matched by name. HRUs and segments are matched by their
+        global ids (nhm_id, nhm_seg) when both sets have them, otherwise by
+        position. Values are compared with vectorized numpy operations; float
+        values are considered equal within the given tolerances (see
+        np.isclose()). Parameters with the same fingerprint and alignment are
+        not compared value by value.
+
+        The parameters DataFrame has the columns: dims_changed (the dimension
+        names or sizes differ, so values were not compared), datatype_changed,
+        compared (number of values compared), changed (number of changed
+        values), max_abs_diff, max_rel_diff (relative to the other set), and
+        changed_ids (the global ids, or 1-based positions, along the first
+        dimension with a changed value).
+
+        :param ParameterSet other: ParameterSet to compare against (e.g. the paramDb baseline)
+        :param float rtol: relative tolerance for float values
+        :param float atol: absolute tolerance for float values
+        :returns: differences between the sets
+        :rtype: ParameterSetDiff
+        """
+
+        import pandas as pd
+
+        names = list(self.parameters.keys())
+        other_names = set(other.parameters.keys())
+
+        dims = OrderedDict()
+        for kk in list(self.dimensions.keys()) + [dd for dd in other.dimensions.keys()
+                                                  if not self.dimensions.exists(dd)]:
+            size = self.dimensions.get(kk).size if self.dimensions.exists(kk) else None
+            other_size = other.dimensions.get(kk).size if other.dimensions.exists(kk) else None
+
+            if size != other_size:
+                dims[kk] = (size, other_size)
+
+        # Alignment of the HRUs and segments
+        align = {}
+        for id_param, dim_names in [('nhm_id', HRU_DIMS), ('nhm_seg', ['nsegment'])]:
+            ids = self.parameters.get(id_param).values if self.parameters.exists(id_param) else None
+            other_ids = other.parameters.get(id_param).values if other.parameters.exists(id_param) else None
+            result = _align_ids(ids, other_ids)
+
+            for dd in dim_names:
+                align[dd] = result
+
+        rows = []
+        for name in names:
+            if name not in other_names:
+                continue
+
+            cparam = self.parameters.get(name)
+            oparam = other.parameters.get(name)
+
+            row = {'name': name, 'dims_changed': False, 'datatype_changed': cparam.datatype != oparam.datatype,
+                   'compared': 0, 'changed': 0, 'max_abs_diff': np.nan, 'max_rel_diff': np.nan, 'changed_ids': []}
+            rows.append(row)
+
+            # HRU dimensions are equivalent to each other
+            dim_names = ['nhru' if dd in HRU_DIMS else dd for dd in cparam.dimensions.keys()]
+            other_dim_names = ['nhru' if dd in HRU_DIMS else dd for dd in oparam.dimensions.keys()]
+
+            if dim_names != other_dim_names or cparam.storage is None or oparam.storage is None:
+                row['dims_changed'] = True
+                continue
+
+            data = cparam.values
+            other_data = oparam.values
+            first_ids = None
+            reordered = False
+
+            for pos, dd in enumerate(cparam.dimensions.keys()):
+                idx, other_idx, common, _, _ = align.get(dd, (None, None, None, None, None))
+
+                if idx is not None:
+                    data = take(data, idx, axis=pos)
+                    other_data = take(other_data, other_idx, axis=pos)
+                    reordered = True
+
+                if pos == 0:
+                    first_ids = common
+
+            if data.shape != other_data.shape:
+                row['dims_changed'] = True
+                continue
+
+            row['compared'] = data.size
+
+            if first_ids is None:
+                # Local 1-based positions along the first dimension
+                first_ids = np.arange(1, data.shape[0] + 1)
+
+            if not reordered and cparam.fingerprint() == oparam.fingerprint():
+                # Same contents in the same order
+                row['max_abs_diff'] = row['max_rel_diff'] = 0.0
+                continue
+
+            changed, row['max_abs_diff'], row['max_rel_diff'] = _compare_values(data, other_data, rtol, atol)
+            row['changed'] = int(np.count_nonzero(changed))
+
+            if row['changed']:
+                row_changed = changed.reshape((changed.shape[0], -1), order='F').any(axis=1)
+                row['changed_ids'] = first_ids[row_changed].tolist()
+            else:
+                row['max_abs_diff'] = row['max_rel_diff'] = 0.0
+
+        columns = ['name', 'dims_changed', 'datatype_changed', 'compared', 'changed', 'max_abs_diff',
+                   'max_rel_diff', 'changed_ids']
+        report = pd.DataFrame.from_records(rows, columns=columns, index='name')
+
+        hru_align = align['nhru']
+        seg_align = align['nsegment']
+
+        return ParameterSetDiff(added=[kk for kk in other.parameters.keys() if not self.parameters.exists(kk)],
+                                removed=[kk for kk in names if kk not in other_names],
+                                dimensions=dims,
+                                hrus_added=hru_align[4], hrus_removed=hru_align[3],
+                                segs_added=seg_align[4], segs_removed=seg_align[3],
+                                parameters=report)
+
+    def encode(self, max_ratio=0.5):
+        """Store the data of every parameter with its most compact encoding.
+
+        Low-cardinality, constant, and mostly-constant parameters are stored as
+        dictionary-encoded, constant, or sparse data (see Parameter.encode()).
+
+        :param float max_ratio: maximum size of an encoding relative to the full array
+        :returns: number of bytes saved
+        :rtype: int
+        """
+
+        saved = 0
+        for cparam in self.parameters.values():
+            nbytes = cparam.nbytes
+            cparam.encode(max_ratio=max_ratio)
+            saved += nbytes - cparam.nbytes
+        return saved
 
     def expand_parameter(self, name):
         """Expand an existing parameter.
@@ -181,13 +745,12 @@ class ParameterSet(object):
             # 1) make sure parameter exists
             if self.__master_params.exists(name):
                 # 2) get dimensions from master parameters
-                new_dims = self.__master_params.parameters[name].dimensions.copy()
-
-                # The new_dims copy is no longer of type Dimensions, instead it
-                # is an OrderedDict
                 # 3) get dimension sizes from global dimensions object
-                for kk, vv in iteritems(new_dims):
-                    vv.size = self.__dimensions[kk].size
+                # NOTE: new Dimension objects are created so the dimensions of the
+                #       master parameters are not modified.
+                new_dims = OrderedDict()
+                for kk in self.__master_params.parameters[name].dimensions.keys():
+                    new_dims[kk] = Dimension(name=kk, size=self.__dimensions[kk].size)
 
                 if set(new_dims.keys()) == set(self.__parameters[name].dimensions.keys()):
                     print('Parameter, {}, already has the maximum number of dimensions'.format(name))
@@ -201,22 +764,293 @@ class ParameterSet(object):
                         # hru_deplcrv needs special handling
                         # 2) get current value of hru_deplcrv, this is the snow_index to use
                         # 3) replace broadcast original value with np.arange(1:nhru)
-                        orig_index = self.__parameters[name].data[0] - 1
+                        orig_index = self.__parameters[name].values[0] - 1
                         new_indices = np.arange(1, new_dims['nhru'].size + 1)
                         self.__parameters['hru_deplcrv'].data = new_indices
 
                         # 5) get snarea_curve associated with original hru_deplcrv value
-                        curr_snarea_curve = self.__parameters['snarea_curve'].data.reshape((-1, 11))[orig_index, :]
+                        curr_snarea_curve = self.__parameters['snarea_curve'].values.reshape((-1, 11))[orig_index, :]
 
-                        # 6) replace current snarea_curve values with broadcast of select snarea_curve*nhru
-                        new_snarea_curve = np.broadcast_to(curr_snarea_curve, (new_dims['nhru'].size, 11))
+                        # 6) replace current snarea_curve values with broadcast of select snarea_curve*nhru;
+                        #    only the selected curve is stored until the data is materialized
+                        new_snarea_curve = BroadcastStorage(curr_snarea_curve.reshape((1, 11)),
+                                                            (new_dims['nhru'].size, 11),
+                                                            out_shape=(new_dims['nhru'].size * 11,))
                         # 7) reset snarea_curve dimension size to nhru*11
                         self.__parameters['snarea_curve'].dimensions['ndeplval'].size = new_dims['nhru'].size * 11
-                        self.__parameters['snarea_curve'].data = new_snarea_curve.flatten(order='C')
+                        self.__parameters['snarea_curve'].data = new_snarea_curve
 
                         if self.verbose:
                             print('hru_deplcrv and snarea_curve have been expanded/updated')
 
+    def fingerprint(self, refresh=False):
+        """Get a stable content hash of the ParameterSet.
+
+        The hash combines the global dimensions and the name and fingerprint of
+        each parameter (see Parameter.fingerprint()), in sorted order, so two
+        ParameterSets with the same contents have the same fingerprint. The
+        fingerprints of the parameters are cached until their data is replaced.
+
+        :param bool refresh: recompute the fingerprint of every parameter
+        :returns: hex digest
+        :rtype: str
+        """
+
+        hasher = hashlib.blake2b(digest_size=16)
+
+        for kk in sorted(self.dimensions.keys()):
+            hasher.update('{}={}\n'.format(kk, self.dimensions[kk].size).encode('utf-8'))
+
+        for kk in sorted(self.parameters.keys()):
+            hasher.update('{}:{}\n'.format(kk, self.parameters[kk].fingerprint(refresh=refresh)).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def get_bounds(self, name):
+        """Get the valid range of values for a parameter.
+
+        Bounded parameters have a minimum of 'bounded' and a maximum which is
+        the name of a dimension (e.g. hru_segment is bounded by nsegment). The
+        maximum is resolved to the size of that dimension and the minimum to 0.
+
+        :param str name: name of the parameter
+        :returns: minimum and maximum; either can be None if it is not defined
+        :rtype: tuple
+        """
+
+        cparam = self.parameters.get(name)
+        return self._resolve_limit(cparam.minimum, 0), self._resolve_limit(cparam.maximum, None)
+
+    def _resolve_limit(self, value, bounded_value):
+        """Resolve a minimum or maximum value to a number.
+
+        :param value: minimum or maximum value of a parameter
+        :param bounded_value: value to use when the limit is 'bounded'
+        :returns: the numeric limit or None if it cannot be resolved
+        """
+
+        if value is None or not isinstance(value, str):
+            return value
+        if value == 'bounded':
+            return bounded_value
+        if self.dimensions.exists(value):
+            return self.dimensions.get(value).size
+
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    def group_statistics(self, grouping, stats=('mean', ), names=None, weights=None):
+        """Compute statistics of parameters for each group of HRUs or segments.
+
+        All numeric parameters with the grouped leading dimension (or the
+        given names) are reduced together: the rows are sorted by group once
+        and each statistic is computed for every column at the same time.
+        Parameters with a second dimension contribute one column per position
+        (e.g. tmax_adj_1 .. tmax_adj_12). NaN values are ignored.
+
+        :param grouping: grouping of the HRUs or segments; anything else is passed to grouping() (e.g. 'hru_segment')
+        :type grouping: Grouping or str or dict
+        :param stats: any of 'mean', 'sum', 'min', 'max', and 'count'
+        :type stats: list[str] or tuple[str]
+        :param names: names of the parameters to reduce; None reduces all numeric parameters of the dimension
+        :type names: list[str] or None
+        :param weights: name of a parameter (e.g. hru_area) or an array of weights for the mean
+        :type weights: str or np.ndarray or None
+        :returns: DataFrame indexed by group label with (statistic, column) columns
+        :rtype: pd.DataFrame
+        :raises ValueError: if a named parameter is not numeric or does not have the grouped dimension
+        """
+
+        import pandas as pd
+
+        if not isinstance(grouping, Grouping):
+            grouping = self.grouping(grouping)
+
+        id_param = 'nhm_id' if grouping.dimension in HRU_DIMS else 'nhm_seg'
+
+        if names is None:
+            params = [cparam for cparam in self.parameters.by_dimension(grouping.dimension)
+                      if cparam.datatype in [1, 2, 3] and cparam.name != id_param and
+                      grouping.applies_to(list(cparam.dimensions.keys())[0])]
+        else:
+            params = [self.parameters.get(nn) for nn in names]
+
+            for cparam in params:
+                if cparam.datatype not in [1, 2, 3] or not grouping.applies_to(list(cparam.dimensions.keys())[0]):
+                    raise ValueError('{} is not a numeric parameter with the dimension {}'.format(cparam.name,
+                                                                                              grouping.dimension))
+
+        columns = []
+        blocks = []
+        for cparam in params:
+            columns.extend(cparam._column_names())
+            blocks.append(cparam.values.reshape((grouping.size, -1), order='F'))
+
+        if isinstance(weights, str):
+            weights = self.parameters.get(weights).values
+
+        values = np.column_stack(blocks) if blocks else np.empty((grouping.size, 0))
+        results = grouped_statistics(grouping.codes, len(grouping), values, weights=weights, stats=stats)
+
+        index = pd.Index(grouping.labels, name='group')
+        return pd.concat([pd.DataFrame(results[ss], index=index, columns=columns) for ss in stats], axis=1,
+                         keys=list(stats))
+
+    def grouping(self, source, dimension='nhru'):
+        """Create a grouping of the HRUs or segments.
+
+        :param source: name of a one-dimensional parameter whose values are the groups (e.g. hru_type), a mapping of
+                       global id to group label, or the group label of each entry of the dimension
+        :type source: str or dict or list or np.ndarray
+        :param str dimension: name of the grouped dimension when source is a mapping or labels
+        :returns: the grouping
+        :rtype: Grouping
+        """
+
+        if isinstance(source, str):
+            return Grouping.from_parameter(self, source)
+        elif isinstance(source, dict):
+            return Grouping.from_mapping(self, source, dimension=dimension)
+        return Grouping.from_labels(source, dimension=dimension)
+
+    def describe(self, parallel=True, max_workers=None):
+        """Summarize the data of all parameters.
+
+        Statistics are computed in parallel threads, one parameter at a time,
+        and cached by each parameter (see Parameter.stats()), so repeated
+        calls only recompute parameters whose data has been replaced.
+
+        :param bool parallel: compute the statistics in parallel threads
+        :param max_workers: maximum number of threads to use
+        :type max_workers: int or None
+        :returns: one row per parameter with the datatype and the summary statistics
+        :rtype: pd.DataFrame
+        """
+
+        import pandas as pd
+
+        params = [pp for pp in self.parameters.values() if pp.storage is not None]
+
+        if parallel:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                all_stats = list(executor.map(lambda pp: pp.stats(), params))
+        else:
+            all_stats = [pp.stats() for pp in params]
+
+        report = pd.DataFrame.from_records(all_stats, columns=ParamStats._fields,
+                                           index=pd.Index([pp.name for pp in params], name='name'))
+        report.insert(0, 'datatype', [pp.datatype for pp in params])
+        return report
+
+    def validate(self, parallel=False, max_workers=None):
+        """Validate all parameters at once.
+
+        Checks each parameter for: total size against its declared dimensions,
+        agreement of its dimension sizes with the global dimensions, agreement
+        of its dimension names with the master parameters, the number of NaN
+        and fill values, the number of values outside the valid range
+        (bounded limits are resolved to dimension sizes), and the internal
+        layout of the data (storage dtype and Fortran order). The checks for each
+        parameter are vectorized with numpy; parameters can optionally be
+        checked in parallel threads.
+
+        :param bool parallel: check the parameters in parallel threads
+        :param max_workers: maximum number of threads to use
+        :type max_workers: int or None
+        :returns: one row per parameter; the 'ok' column is True if all checks passed
+        :rtype: pd.DataFrame
+        """
+
+        import pandas as pd
+
+        params = list(self.parameters.values())
+
+        if parallel:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                rows = list(executor.map(self._validate_parameter, params))
+        else:
+            rows = [self._validate_parameter(pp) for pp in params]
+
+        columns = ['name', 'datatype', 'size', 'size_ok', 'dims_ok', 'master_dims_ok', 'minimum', 'maximum',
+                   'nan_count', 'fill_count', 'below_min', 'above_max', 'layout_ok']
+        report = pd.DataFrame.from_records(rows, columns=columns, index='name')
+
+        # master_dims_ok is None for parameters which are not in the master parameters
+        report['ok'] = (report['size_ok'] & report['dims_ok'] & report['master_dims_ok'].fillna(True).astype(bool) &
+                        report['layout_ok'] &
+                        (report[['nan_count', 'fill_count', 'below_min', 'above_max']].sum(axis=1) == 0))
+        return report
+
+    def _validate_parameter(self, cparam):
+        """Compute the validation checks for a single parameter.
+
+        :param Parameter cparam: parameter to check
+        :returns: validation results
+        :rtype: dict
+        """
+
+        row = {'name': cparam.name, 'datatype': cparam.datatype, 'nan_count': 0, 'fill_count': 0,
+               'below_min': 0, 'above_max': 0, 'master_dims_ok': None, 'layout_ok': True}
+
+        counts = None
+        try:
+            if cparam.is_compact:
+                # Check the stored values and weight the results by how often each occurs
+                data, counts = cparam.value_counts()
+            else:
+                data = cparam.values
+        except ValueError:
+            # Parameter has no data
+            data = np.array([])
+
+        if counts is None and data.size and cparam.datatype in DATA_TYPES:
+            # Full arrays must have the storage dtype and be Fortran-ordered
+            row['layout_ok'] = (is_fortran_layout(data) and
+                                data.dtype.kind == storage_dtype(cparam.datatype).kind and
+                                data.dtype.itemsize >= storage_dtype(cparam.datatype).itemsize)
+
+        def _count(mask):
+            if counts is None:
+                return int(np.count_nonzero(mask))
+            return int(counts[mask].sum())
+
+        total_size = 1
+        dims_ok = True
+        for kk, vv in iteritems(cparam.dimensions):
+            total_size *= vv.size
+            dims_ok &= self.dimensions.exists(kk) and self.dimensions.get(kk).size == vv.size
+
+        row['size'] = data.size if counts is None else int(counts.sum())
+        row['size_ok'] = row['size'] == total_size
+        row['dims_ok'] = dims_ok
+
+        if self.master_parameters is not None and self.master_parameters.exists(cparam.name):
+            master_dims = set(self.master_parameters.get(cparam.name).dimensions.keys())
+            param_dims = set(cparam.dimensions.keys())
+            row['master_dims_ok'] = (param_dims == master_dims or
+                                     (param_dims.issubset(HRU_DIMS) and master_dims.issubset(HRU_DIMS)))
+
+        row['minimum'] = self._resolve_limit(cparam.minimum, 0)
+        row['maximum'] = self._resolve_limit(cparam.maximum, None)
+
+        if row['size'] == 0 or data.dtype.kind not in 'iuf':
+            # String parameters only have their size checked
+            return row
+
+        if data.dtype.kind == 'f':
+            row['nan_count'] = _count(np.isnan(data))
+
+        # Limits are compared at the precision of the stored data
+        if cparam.datatype in NETCDF_FILLVALUES:
+            row['fill_count'] = _count(data == as_storage_scalar(NETCDF_FILLVALUES[cparam.datatype], data.dtype))
+
+        if row['minimum'] is not None:
+            row['below_min'] = _count(data < as_storage_scalar(row['minimum'], data.dtype))
+        if row['maximum'] is not None:
+            row['above_max'] = _count(data > as_storage_scalar(row['maximum'], data.dtype))
+        return row
+
     def reduce_by_modules(self, control=None):
         """Reduce the ParameterSet to the parameters required by the modules
         defined in a control file.
@@ -252,17 +1086,142 @@ class ParameterSet(object):
         """Removes data-by-id (nhm_seg, nhm_id) from all parameters"""
         self.__parameters.remove_by_global_id(hrus=hrus, segs=segs)
 
-        # Adjust the global dimensions
-        if segs is not None:
-            self.__dimensions['nsegment'].size -= len(segs)
+        # The global dimensions take the sizes of the resized parameters
+        dim_sizes = self.__parameters.dimension_sizes()
+
+        for dd in HRU_DIMS + ['ndeplval', 'nsegment']:
+            if dd in dim_sizes and self.__dimensions.exists(dd):
+                self.__dimensions[dd].size = dim_sizes[dd]
+
+    def resize_dimension(self, dim_name, indices):
+        """Select entries along a dimension for the global dimension and every parameter which has it.
+
+        The same index array is applied to every parameter (see
+        Parameters.resize_dimension()). The HRU dimensions (nhru, nssr, ngw)
+        are treated as equivalent and are resized together.
+
+        :param str dim_name: name of the dimension
+        :param indices: 0-based indices of the entries to keep, in output order
+        :raises IndexError: if an index is out of range
+        """
+
+        indices = np.asarray(indices, dtype=np.intp).ravel()
+        dim_names = HRU_DIMS if dim_name in HRU_DIMS else [dim_name]
+
+        for dd in dim_names:
+            if self.__dimensions.exists(dd):
+                size = self.__dimensions[dd].size
+
+                if indices.size and (indices.min() < 0 or indices.max() >= size):
+                    raise IndexError('Index out of range for dimension {} with size {}'.format(dd, size))
+
+        self.__parameters.resize_dimension(dim_name, indices)
+
+        for dd in dim_names:
+            if self.__dimensions.exists(dd):
+                self.__dimensions[dd].size = indices.size
+
+    def file_template(self, header=None):
+        """Create a template for quickly writing parameter files with the same structure.
+
+        :param list[str] header: list of header lines
+        :returns: pre-rendered parameter file
+        :rtype: ParameterFileTemplate
+        """
 
-        if hrus is not None:
-            self.__dimensions['nhru'].size -= len(hrus)
+        from pyPRMS.ParameterFileTemplate import ParameterFileTemplate
 
-            if self.__dimensions.exists('nssr'):
-                self.__dimensions['nssr'].size -= len(hrus)
-            if self.__dimensions.exists('ngw'):
-                self.__dimensions['ngw'].size -= len(hrus)
+        return ParameterFileTemplate(self, header=header)
+
+    def overlay(self):
+        """Create a copy-on-write overlay of the ParameterSet.
+
+        The overlay shares the data of this ParameterSet and only stores the
+        parameters (or HRUs and segments of parameters) that are changed in it.
+
+        :returns: overlay of this ParameterSet
+        :rtype: OverlayParameterSet
+        """
+
+        from pyPRMS.OverlayParameterSet import OverlayParameterSet
+
+        return OverlayParameterSet(self)
+
+    def partition(self, nparts, cost=None, granularity=4):
+        """Split the ParameterSet into independent sub-models along the stream network.
+
+        :param int nparts: number of partitions
+        :param cost: name of an HRU parameter or an array with the cost of each HRU; None balances the HRU count
+        :type cost: str or np.ndarray or None
+        :param int granularity: number of units an equal share is divided into (see NetworkPartition)
+        :returns: the partitioning
+        :rtype: NetworkPartition
+        """
+
+        return NetworkPartition(self, nparts, cost=cost, granularity=granularity)
+
+    def view(self, hrus=None, segs=None, pois=None):
+        """Create a read-only view of a subset of the ParameterSet.
+
+        The view shares the arrays of this ParameterSet. Parameters, dimension
+        sizes, and renumbered segment index parameters (e.g. hru_segment,
+        tosegment) are computed when accessed; data is only materialized when
+        the view is written out.
+
+        :param hrus: global HRU ids (nhm_id) to include; None includes all HRUs
+        :param segs: global segment ids (nhm_seg) to include; None includes all segments
+        :param pois: POI gage ids (poi_gage_id) to include; None includes all POIs
+        :returns: read-only view of the subset
+        :rtype: ParameterSetView
+        """
+
+        from pyPRMS.ParameterSetView import ParameterSetView
+
+        return ParameterSetView(self, hrus=hrus, segs=segs, pois=pois)
+
+    def to_xarray(self):
+        """Get the parameters as an xarray Dataset.
+
+        The variables share the read-only values of the parameters (see
+        Parameter.values): numpy arrays and broadcast storage are not copied,
+        while other compact storage is expanded to a new array. When they
+        exist, nhm_id and nhm_seg are added as coordinates along the nhru and
+        nsegment dimensions; use swap_dims() (e.g. ds.swap_dims(nhru='nhm_id'))
+        to select by them.
+
+        :returns: Dataset of the parameters
+        :rtype: xr.Dataset
+        """
+
+        import xarray as xr
+
+        data_vars = OrderedDict()
+
+        for vv in self.parameters.values():
+            if vv.storage is None:
+                continue
+
+            attrs = OrderedDict()
+
+            if vv.units:
+                attrs['units'] = vv.units
+            if vv.help:
+                attrs['description'] = vv.help
+            elif vv.description:
+                attrs['description'] = vv.description
+            if vv.minimum is not None and not isinstance(vv.minimum, str):
+                attrs['valid_min'] = vv.minimum
+            if vv.maximum is not None and not isinstance(vv.maximum, str):
+                attrs['valid_max'] = vv.maximum
+
+            data_vars[vv.name] = xr.Variable(tuple(vv.dimensions.keys()), vv.values, attrs=attrs)
+
+        ds = xr.Dataset(data_vars)
+
+        for id_param, dim_name in [('nhm_id', 'nhru'), ('nhm_seg', 'nsegment')]:
+            if id_param in ds.data_vars and ds[id_param].dims == (dim_name, ):
+                ds = ds.set_coords(id_param)
+        return ds
 
     def write_parameters_xml(self, output_dir):
         """Write global parameters.xml file.
@@ -292,6 +1251,8 @@ class ParameterSet(object):
         :param str filename: full path for output file
         """
 
+        import netCDF4 as nc
+
         # Create the netcdf file
         nc_hdl = nc.Dataset(filename, 'w', clobber=True)
 
@@ -361,14 +1322,15 @@ class ParameterSet(object):
 
                 # Write the data
                 if len(vv.dimensions.keys()) == 1:
-                    curr_param[:] = vv.data
+                    curr_param[:] = vv.values
                 elif len(vv.dimensions.keys()) == 2:
-                    curr_param[:, :] = vv.data.transpose()
+                    # The transpose of the Fortran-ordered data is a C-ordered view (no copy)
+                    curr_param[:, :] = vv.values.transpose()
             else:
                 # String parameter
                 # Get the maximum string length in the array of data
                 # print('String parameter: {}'.format(vv.name))
-                str_size = len(max(vv.data, key=len))
+                str_size = max(len(max(vv.values, key=len)), 1)
                 # print('size: {}'.format(str_size))
 
                 # Create a dimension for the string length
@@ -397,14 +1359,17 @@ class ParameterSet(object):
                 # print(nc.stringtochar(vv.data, encoding='none'))
                 # print('data shape: ', nc.stringtochar(vv.data, encoding='none').shape)
                 # Write the data
+                # String data is stored as fixed-width bytes (dtype='S'); split each
+                # value into characters. This replaces netCDF4.stringtochar(), whose
+                # handling of bytes arrays differs between netCDF4 versions.
+                str_data = np.ascontiguousarray(vv.values.astype('S{}'.format(str_size)))
+                str_data = str_data.view('S1').reshape(str_data.shape + (str_size, ))
+
                 if len(tmp_dims) == 1:
-                    curr_param[:] = nc.stringtochar(vv.data)
+                    curr_param[:] = str_data
                 elif len(tmp_dims) == 2:
                     # curr_param._Encoding = 'ascii'
-
-                    # The stringtochar() routine won't handle the unicode numpy
-                    # datatype properly so we force it to dtype='S'
-                    curr_param[:, :] = nc.stringtochar(vv.data.astype('S'))
+                    curr_param[:, :] = str_data
             sys.stdout.flush()
         # Close the netcdf file
         nc_hdl.close()
@@ -445,72 +1410,48 @@ class ParameterSet(object):
             #     # ff.write(xmlstr.encode('utf-8'))
             #     ff.write(xmlstr)
 
-    def write_parameter_file(self, filename, header=None):
+    def write_parameter_file(self, filename, header=None, skip_unchanged=False):
         """Write a parameter file.
 
+        With skip_unchanged=True the file is not rewritten if this
+        ParameterSet already wrote it with the same contents (see fingerprint())
+        and header, and the file has not been modified since.
+
         :param str filename: name of parameter file
         :param list[str] header: list of header lines
+        :param bool skip_unchanged: skip writing if the file is unchanged
+        :returns: True if the file was written
+        :rtype: bool
         """
 
+        key = None
+        if skip_unchanged:
+            key = (self.fingerprint(), tuple(self.parameters.keys()), tuple(header or ()))
+            prev = self.__written.get(os.path.abspath(filename))
+
+            if prev is not None and prev[0] == key and os.path.isfile(filename):
+                fstat = os.stat(filename)
+
+                if (fstat.st_size, fstat.st_mtime_ns) == prev[1:]:
+                    return False
+
         # Write the parameters out to a file
         outfile = open(filename, 'w')
 
-        if header:
-            for hh in header:
-                # Write out any header stuff
-                outfile.write('{}\n'.format(hh))
+        outfile.write(_render_header(header))
 
         # Dimension section must be written first
-        outfile.write('{} Dimensions {}\n'.format(CATEGORY_DELIM, CATEGORY_DELIM))
-
-        for (kk, vv) in self.dimensions.items():
-            # Write each dimension name and size separated by VAR_DELIM
-            outfile.write('{}\n'.format(VAR_DELIM))
-            outfile.write('{}\n'.format(kk))
-            outfile.write('{:d}\n'.format(vv.size))
+        outfile.write(_render_dimensions(self.dimensions))
 
         # Now write out the Parameter category
-        order = ['name', 'dimensions', 'datatype', 'data']
-
         outfile.write('{} Parameters {}\n'.format(CATEGORY_DELIM, CATEGORY_DELIM))
 
         for vv in self.parameters.values():
-            datatype = vv.datatype
-
-            for item in order:
-                # Write each variable out separated by self.__rowdelim
-                if item == 'dimensions':
-                    # Write number of dimensions first
-                    outfile.write('{}\n'.format(vv.dimensions.ndims))
-
-                    for dd in vv.dimensions.values():
-                        # Write dimension names
-                        outfile.write('{}\n'.format(dd.name))
-                elif item == 'datatype':
-                    # dimsize (which is computed) must be written before datatype
-                    outfile.write('{}\n'.format(vv.data.size))
-                    outfile.write('{}\n'.format(datatype))
-                elif item == 'data':
-                    # Write one value per line
-                    # WARNING: 2019-10-10: had to change next line from order='A' to order='F'
-                    #          because flatten with 'A' was only honoring the Fortran memory layout
-                    #          if the array was contiguous which isn't always the
-                    #          case if the arrays have been altered in size.
-                    for xx in vv.data.flatten(order='F'):
-                        if datatype in [2, 3]:
-                            # Float and double types have to be formatted specially so
-                            # they aren't written in exponential notation or with
-                            # extraneous zeroes
-                            tmp = '{:<20f}'.format(xx).rstrip('0 ')
-                            if tmp[-1] == '.':
-                                tmp += '0'
-
-                            outfile.write('{}\n'.format(tmp))
-                        else:
-                            outfile.write('{}\n'.format(xx))
-                elif item == 'name':
-                    # Write the self.__rowdelim before the variable name
-                    outfile.write('{}\n'.format(VAR_DELIM))
-                    outfile.write('{}\n'.format(vv.name))
+            outfile.write(_render_parameter(vv))
 
         outfile.close()
+
+        if key is not None:
+            fstat = os.stat(filename)
+            self.__written[os.path.abspath(filename)] = (key, fstat.st_size, fstat.st_mtime_ns)
+        return True
@@ -0,0 +1,642 @@
+
+from __future__ import (absolute_import, division, print_function)
+from future.utils import iteritems
+
+import numpy as np
+from collections import OrderedDict
+
+from pyPRMS.Exceptions_custom import ParameterError
+from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.Dimensions import Dimensions, ParamDimensions
+from pyPRMS.Parameters import Parameters
+from pyPRMS.ParamStorage import as_storage_scalar, content_hash, select_index, storage_dtype, take, to_native
+from pyPRMS.param_stats import summarize
+from pyPRMS.constants import HRU_DIMS
+
+# Parameters whose values are 1-based local segment indices. When a view
+# subsets the segments these values are renumbered to the new local ordering;
+# references to segments that are not part of the view become 0.
+SEGMENT_INDEX_PARAMS = ['hru_segment', 'tosegment', 'poi_gage_segment', 'hru_strmseg_down_id',
+                        'gw_strmseg_down_id']
+
+# Parameters whose values are 1-based local HRU (or GWR) indices; they are
+# renumbered the same way when a view subsets the HRUs.
+HRU_INDEX_PARAMS = ['hru_up_id', 'hru_down_id', 'gw_up_id', 'gw_down_id', 'gvr_hru_id']
+
+# Parameters whose values are global segment ids (nhm_seg); references to
+# segments that are not part of the view become 0.
+SEGMENT_ID_PARAMS = ['hru_segment_nhm', 'tosegment_nhm']
+
+
+def _remap(data, remap):
+    """Renumber 1-based indices with a lookup table.
+
+    Values less than 1 (e.g. tosegment into a lake) are left as-is; indices
+    which are not in the table become 0.
+    """
+
+    valid = (data > 0) & (data < remap.size)
+    return np.where(data > 0, remap[np.where(valid, data, 0)], data)
+
+
+def _index_remap(size, idx):
+    """Get the lookup table from old 1-based indices to the 1-based positions of idx.
+
+    :param int size: number of entries in the original dimension
+    :param np.ndarray idx: 0-based indices which are kept, in their new order
+    :rtype: np.ndarray
+    """
+
+    remap = np.zeros(size + 1, dtype=storage_dtype(1))
+    remap[idx + 1] = np.arange(1, idx.size + 1)
+    return remap
+
+
+def _read_only(*args, **kwargs):
+    raise ParameterError('ParameterSetView is read-only')
+
+
+def _parent_property(name):
+    """Create a property which gets an attribute of the parent Parameter; setting it raises ParameterError."""
+
+    def fget(self):
+        return getattr(self.parent, name)
+
+    return property(fget, _read_only, doc='Get the {} of the parent parameter (read-only).'.format(name))
+
+
+class ParameterView(object):
+
+    """Read-only, lazily indexed view of a single Parameter.
+
+    The view holds a reference to the parent Parameter and the index arrays
+    for each subsetted dimension. Dimension sizes and data are computed on
+    access; nothing is copied until the data is requested. Only the members
+    which read the parameter are provided; the methods which modify a
+    Parameter raise ParameterError.
+    """
+
+    def __init__(self, parent, indices, seg_remap=None, seg_ids=None, hru_remap=None):
+        """Create a ParameterView.
+
+        :param Parameter parent: the parameter being viewed
+        :param dict indices: dimension name to 0-based index array
+        :param seg_remap: lookup array from old 1-based segment to new 1-based segment
+        :type seg_remap: np.ndarray or None
+        :param seg_ids: sorted global ids (nhm_seg) of the segments in the view
+        :type seg_ids: np.ndarray or None
+        :param hru_remap: lookup array from old 1-based HRU to new 1-based HRU
+        :type hru_remap: np.ndarray or None
+        """
+
+        self.__parent = parent
+        self.__indices = indices
+        self.__seg_remap = seg_remap
+        self.__seg_ids = seg_ids
+        self.__hru_remap = hru_remap
+
+    def __str__(self):
+        return self.__parent.__str__()
+
+    name = _parent_property('name')
+    meta = _parent_property('meta')
+    datatype = _parent_property('datatype')
+    units = _parent_property('units')
+    model = _parent_property('model')
+    description = _parent_property('description')
+    help = _parent_property('help')
+    minimum = _parent_property('minimum')
+    maximum = _parent_property('maximum')
+    default = _parent_property('default')
+    modules = _parent_property('modules')
+
+    @property
+    def parent(self):
+        """Get the parameter being viewed.
+
+        :rtype: Parameter
+        """
+
+        return self.__parent
+
+    @property
+    def dimensions(self):
+        """Get the dimensions of the view.
+
+        :returns: dimensions sized to the view
+        :rtype: ParamDimensions
+        """
+
+        dims = ParamDimensions()
+
+        for kk, vv in iteritems(self.__parent.dimensions):
+            if kk in self.__indices:
+                dims.add(kk, int(self.__indices[kk].size))
+            else:
+                dims.add(kk, vv.size)
+        return dims
+
+    @property
+    def is_compact(self):
+        """Views always produce full arrays.
+
+        :rtype: bool
+        """
+
+        return False
+
+    @property
+    def ndims(self):
+        """Get the number of dimensions.
+
+        :rtype: int
+        """
+
+        return self.__parent.ndims
+
+    @property
+    def data(self):
+        """Get the data for the view.
+
+        The data is indexed from the parent on every access and is read-only.
+
+        :rtype: np.ndarray
+        """
+
+        data = self.__parent.values
+
+        for pos, dd in enumerate(self.__parent.dimensions.keys()):
+            if dd in self.__indices:
+                data = take(data, self.__indices[dd], axis=pos)
+
+        name = self.__parent.name
+
+        if self.__seg_remap is not None and name in SEGMENT_INDEX_PARAMS:
+            data = _remap(data, self.__seg_remap)
+        elif self.__seg_ids is not None and name in SEGMENT_ID_PARAMS:
+            data = np.where((data <= 0) | np.isin(data, self.__seg_ids), data, 0)
+        elif self.__hru_remap is not None and name in HRU_INDEX_PARAMS:
+            data = _remap(data, self.__hru_remap)
+
+        if data.flags.writeable:
+            # Only arrays created here are writeable; the data of the parent is read through values
+            data.flags.writeable = False
+        return data
+
+    @data.setter
+    def data(self, data_in):
+        _read_only()
+
+    @property
+    def values(self):
+        """Get the data for the view; the same as data.
+
+        :rtype: np.ndarray
+        """
+
+        return self.data
+
+    @property
+    def storage(self):
+        """Get the data for the view; views have no stored data of their own.
+
+        :rtype: np.ndarray
+        """
+
+        return self.data
+
+    @property
+    def nbytes(self):
+        """Get the number of bytes of the view data.
+
+        :rtype: int
+        """
+
+        return self.data.nbytes
+
+    @property
+    def as_dataframe(self):
+        """Returns the view data as a pandas DataFrame."""
+
+        import pandas as pd
+
+        return pd.DataFrame(self.data, columns=self._column_names())
+
+    @property
+    def index_map(self):
+        """Returns an ordered dictionary which maps data values to index position"""
+
+        return OrderedDict((val, idx) for idx, val in enumerate(self.data.tolist()))
+
+    def _changes_data(self):
+        """Returns True if the data of the view differs from the data of the parent (it is subset or renumbered).
+
+        :rtype: bool
+        """
+
+        name = self.__parent.name
+        return (any([dd in self.__indices for dd in self.__parent.dimensions.keys()]) or
+                (self.__seg_remap is not None and name in SEGMENT_INDEX_PARAMS) or
+                (self.__seg_ids is not None and name in SEGMENT_ID_PARAMS) or
+                (self.__hru_remap is not None and name in HRU_INDEX_PARAMS))
+
+    def _column_names(self):
+        """Returns the column names used for 2D parameter data in DataFrames (e.g. tmax_adj_1, tmax_adj_2).
+
+        :rtype: list[str]
+        """
+
+        if self.ndims == 2:
+            return ['{}_{}'.format(self.name, ii + 1) for ii in range(self.dimensions.get_dimsize_by_index(1))]
+        return [self.name]
+
+    def check(self):
+        """Verifies the size of the data matches the declared dimension sizes.
+
+        :rtype: str
+        """
+
+        if self.has_correct_size():
+            return '{}: OK'.format(self.name)
+        return '{}: BAD'.format(self.name)
+
+    def check_values(self):
+        """Returns true if all data values are within the min/max values for the parameter."""
+
+        if self.minimum is not None and self.maximum is not None:
+            if not(isinstance(self.minimum, str) or isinstance(self.maximum, str)):
+                data = self.data
+                return ((data >= as_storage_scalar(self.minimum, data.dtype)).all() and
+                        (data <= as_storage_scalar(self.maximum, data.dtype)).all())
+        return True
+
+    def factorize(self):
+        """Returns a table of distinct values and the index into the table for each element of the view data.
+
+        :rtype: (np.ndarray, np.ndarray)
+        """
+
+        data = self.data
+        table, codes = np.unique(data, return_inverse=True)
+        return table, codes.reshape(data.shape)
+
+    def has_correct_size(self):
+        """Verifies the total size of the data matches the declared dimension sizes.
+
+        :rtype: bool
+        """
+
+        total_size = 1
+        for vv in self.dimensions.values():
+            total_size *= vv.size
+        return self.data.size == total_size
+
+    def fingerprint(self, refresh=False):
+        """Returns a stable content hash of the view data.
+
+        The hash is the same as Parameter.fingerprint() for a parameter with the
+        same data; it is computed on every call.
+
+        :param bool refresh: ignored; present for compatibility with Parameter.fingerprint()
+        :rtype: str
+        """
+
+        return content_hash(self.data, self.datatype, [(kk, vv.size) for kk, vv in iteritems(self.dimensions)])
+
+    def stats(self, refresh=False):
+        """Returns summary statistics for the view data.
+
+        The statistics are computed on every call; views do not cache them.
+
+        :param bool refresh: ignored; present for compatibility with Parameter.stats()
+        :rtype: ParamStats
+        """
+
+        return summarize(self.data)
+
+    def tolist(self):
+        """Returns the view data as a list.
+
+        :rtype: list
+        """
+
+        return to_native(self.data.ravel(order='F')).tolist()
+
+    def toparamdb(self):
+        """Outputs the view data in the paramDb csv format.
+
+        :rtype: str
+        """
+
+        outstr = '$id,{}\n'.format(self.name)
+        for ii, dd in enumerate(self.tolist()):
+            outstr += '{},{}\n'.format(ii+1, dd)
+        return outstr
+
+    def tostructure(self):
+        """Returns a dictionary structure of the view.
+
+        :rtype: dict
+        """
+
+        return {'name': self.name,
+                'datatype': self.datatype,
+                'dimensions': self.dimensions.tostructure(),
+                'data': self.tolist()}
+
+    def unique(self):
+        """Create array of unique values from the view data.
+
+        :rtype: np.ndarray
+        """
+
+        return np.unique(self.data)
+
+    def value_counts(self):
+        """Returns the distinct values of the view data and the number of times each occurs.
+
+        :rtype: (np.ndarray, np.ndarray)
+        """
+
+        return np.unique(self.data, return_counts=True)
+
+    # Methods of Parameter which modify the data
+    concat = _read_only
+    encode = _read_only
+    materialize = _read_only
+    remove_by_index = _read_only
+    reshape = _read_only
+    subset_by_index = _read_only
+
+
+class ParametersView(Parameters):
+
+    """Read-only container of ParameterView objects.
+
+    The readers of Parameters (get, by_dimension, get_dataframe, etc.) work
+    on the views; the methods which add, remove, or resize parameters raise
+    ParameterError.
+    """
+
+    def __init__(self, parent, indices, seg_remap=None, seg_ids=None, hru_remap=None):
+        """Create a ParametersView.
+
+        :param Parameters parent: the parameters being viewed
+        :param dict indices: dimension name to 0-based index array
+        :param seg_remap: lookup array from old 1-based segment to new 1-based segment
+        :type seg_remap: np.ndarray or None
+        :param seg_ids: sorted global ids (nhm_seg) of the segments in the view
+        :type seg_ids: np.ndarray or None
+        :param hru_remap: lookup array from old 1-based HRU to new 1-based HRU
+        :type hru_remap: np.ndarray or None
+        """
+
+        super(ParametersView, self).__init__()
+
+        self.__parent = parent
+        self.__indices = indices
+        self.__seg_remap = seg_remap
+        self.__seg_ids = seg_ids
+        self.__hru_remap = hru_remap
+
+    def __getattr__(self, name):
+        # Unlike Parameters, nothing is delegated to a (mutable) dictionary
+        raise AttributeError(name)
+
+    def __contains__(self, item):
+        return self.exists(item)
+
+    def __iter__(self):
+        return iter(self.__parent.keys())
+
+    def __len__(self):
+        return len(self.__parent.keys())
+
+    @property
+    def parameters(self):
+        """Returns an ordered dictionary of parameter views.
+
+        :rtype: collections.OrderedDict[str, ParameterView]
+        """
+
+        return OrderedDict((kk, self.get(kk)) for kk in self.__parent.keys())
+
+    def _dimension_index(self):
+        # Views only change the sizes of the dimensions, not their names
+        return self.__parent._dimension_index()
+
+    def exists(self, name):
+        """Checks if a given parameter name exists.
+
+        :param str name: Name of the parameter
+        :rtype: bool
+        """
+
+        return self.__parent.exists(name)
+
+    def get(self, name):
+        """Returns a view of the given parameter.
+
+        :param str name: The name of the parameter
+        :rtype: ParameterView
+        :raises ValueError: if the parameter does not exist
+        """
+
+        return ParameterView(self.__parent.get(name), self.__indices, seg_remap=self.__seg_remap,
+                             seg_ids=self.__seg_ids, hru_remap=self.__hru_remap)
+
+    def items(self):
+        return self.parameters.items()
+
+    def keys(self):
+        return self.__parent.keys()
+
+    def values(self):
+        return self.parameters.values()
+
+    # Methods of Parameters which add, remove, or resize parameters
+    add = _read_only
+    remove = _read_only
+    remove_by_global_id = _read_only
+    resize_dimension = _read_only
+
+
+class ParameterSetView(ParameterSet):
+
+    """Read-only view of a subset of the HRUs and/or segments of a ParameterSet.
+
+    The view shares the arrays of the parent ParameterSet. Parameter data,
+    dimension sizes, and renumbered segment and HRU index parameters are
+    computed when they are accessed. Writing the view (e.g. write_parameter_file,
+    write_netcdf) materializes one parameter at a time.
+
+    Only the HRU (nhru, nssr, ngw), nsegment, and npoigages dimensions are
+    subset. Indices into other dimensions stay valid and are not changed
+    (e.g. hru_deplcrv keeps every snarea_curve, and the lake and
+    measurement-station indices keep every lake and station). The cascade
+    (ncascade, ncascdgw) and GVR (nhrucell) dimensions are not subset either;
+    their HRU and segment indices are renumbered and the entries which refer
+    to HRUs or segments outside the view become 0.
+    """
+
+    def __init__(self, parent, hrus=None, segs=None, pois=None):
+        """Create a ParameterSetView.
+
+        :param ParameterSet parent: the ParameterSet to view
+        :param hrus: global HRU ids (nhm_id) to include, in output order; None includes all HRUs
+        :param segs: global segment ids (nhm_seg) to include, in output order; None includes all segments
+        :param pois: POI gage ids (poi_gage_id) to include, in output order; None includes all POIs
+        """
+
+        super(ParameterSetView, self).__init__(verbose=parent.verbose, verify=False)
+
+        self.__parent = parent
+        self.__indices = {}
+        seg_remap = None
+        seg_ids = None
+        hru_remap = None
+
+        if hrus is not None:
+            hru_idx = self._global_index('nhm_id', 'nhru', hrus)
+
+            for dd in HRU_DIMS:
+                if parent.dimensions.exists(dd):
+                    self.__indices[dd] = hru_idx
+
+            hru_remap = _index_remap(parent.dimensions.get('nhru').size, hru_idx)
+
+        if segs is not None:
+            seg_idx = self._global_index('nhm_seg', 'nsegment', segs)
+            self.__indices['nsegment'] = seg_idx
+
+            seg_remap = _index_remap(parent.dimensions.get('nsegment').size, seg_idx)
+
+            if parent.parameters.exists('nhm_seg'):
+                seg_ids = np.sort(parent.parameters.get('nhm_seg').values[seg_idx])
+            else:
+                seg_ids = np.sort(seg_idx + 1)
+
+        if pois is not None:
+            self.__indices['npoigages'] = self._global_index('poi_gage_id', 'npoigages', pois)
+
+        self.__view_params = ParametersView(parent.parameters, self.__indices, seg_remap=seg_remap, seg_ids=seg_ids,
+                                            hru_remap=hru_remap)
+
+    @property
+    def dimensions(self):
+        """Get the dimensions of the view.
+
+        :rtype: Dimensions
+        """
+
+        dims = Dimensions()
+
+        for kk, vv in iteritems(self.__parent.dimensions):
+            if kk in self.__indices:
+                dims.add(kk, int(self.__indices[kk].size))
+            else:
+                dims.add(kk, vv.size)
+        return dims
+
+    @property
+    def indices(self):
+        """Get the 0-based index arrays into the parent, by dimension name.
+
+        :rtype: dict[str, np.ndarray]
+        """
+
+        return self.__indices
+
+    @property
+    def master_parameters(self):
+        """Get master parameters of the parent.
+
+        :rtype: ValidParams
+        """
+
+        return self.__parent.master_parameters
+
+    @property
+    def parameters(self):
+        """Get the read-only parameters of the view.
+
+        :rtype: ParametersView
+        """
+
+        return self.__view_params
+
+    @property
+    def parent(self):
+        """Get the ParameterSet being viewed.
+
+        :rtype: ParameterSet
+        """
+
+        return self.__parent
+
+    def detach(self, names=None):
+        """Get a ParameterSet with the data of the view.
+
+        Subset and renumbered data is copied out of the parent; parameters
+        which the view does not change share the read-only stored data of the
+        parent, as in an overlay. Pickling the result (e.g. to send it to a
+        worker process) includes only the data of the view.
+
+        :param names: names of the parameters to include; None includes all parameters
+        :type names: list[str] or None
+        :returns: ParameterSet without master parameters
+        :rtype: ParameterSet
+        """
+
+        pset = ParameterSet(verbose=self.verbose, verify=False)
+
+        for kk, vv in iteritems(self.dimensions):
+            pset.dimensions.add(kk, vv.size)
+
+        for vparam in self.__view_params.values():
+            if names is not None and vparam.name not in names:
+                continue
+
+            pset.parameters.add(vparam.name, info=vparam.meta)
+            cparam = pset.parameters.get(vparam.name)
+
+            for kk, vv in iteritems(vparam.dimensions):
+                cparam.dimensions.add(kk, vv.size)
+
+            parent = vparam.parent
+            if parent.storage is None:
+                continue
+            elif vparam._changes_data():
+                cparam.data = vparam.values
+            elif parent.is_compact:
+                # Compact storage objects are never modified in place
+                cparam.data = parent.storage
+            else:
+                cparam.data = parent.values
+        return pset
+
+    def _global_index(self, id_param, dim_name, selected):
+        """Get 0-based indices into the parent for a list of global ids.
+
+        If the parent has no global id parameter the selected values are
+        treated as 1-based local ids.
+        """
+
+        if self.__parent.parameters.exists(id_param):
+            return select_index(self.__parent.parameters.get(id_param).values, selected)
+
+        idx = np.asarray(list(selected) if not isinstance(selected, np.ndarray) else selected) - 1
+        if idx.size and (idx.min() < 0 or idx.max() >= self.__parent.dimensions.get(dim_name).size):
+            raise ValueError('Local {} ids are out of range'.format(dim_name))
+        return idx
+
+    # Methods of ParameterSet which modify the parameters, or which share
+    # the stored data of the parameters (which views do not have)
+    adjust = _read_only
+    encode = _read_only
+    expand_parameter = _read_only
+    file_template = _read_only
+    overlay = _read_only
+    reduce_parameters = _read_only
+    remove_by_global_id = _read_only
+    resize_dimension = _read_only
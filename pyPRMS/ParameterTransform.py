@@ -0,0 +1,193 @@
+
+from __future__ import (absolute_import, division, print_function)
+
+from collections import namedtuple
+import numpy as np
+
+from pyPRMS.ParamStorage import freeze, is_read_only, storage_dtype
+
+# Ways an adjustment value is applied to the values of a parameter
+ADJUST_METHODS = ('scale', 'offset', 'value')
+
+Adjustment = namedtuple('Adjustment', ['name', 'method', 'values', 'grouping', 'clip'])
+Adjustment.__doc__ = """An adjustment of the values of a parameter.
+
+method is one of 'scale' (multiply), 'offset' (add), or 'value' (replace).
+values holds one value per group of grouping (a Grouping), or a single value
+when grouping is None; a value can also be an array which is broadcast over
+the trailing dimensions of the parameter (e.g. one value per month). When
+clip is True the adjusted values are clipped to the valid range of the
+parameter.
+"""
+
+
+def adjusted_data(pset, adjustment, data=None):
+    """Compute the adjusted data of a parameter.
+
+    The ParameterSet is not modified. Entries of the parameter which are not
+    in any group are unchanged. Integer parameters are rounded.
+
+    :param ParameterSet pset: the ParameterSet
+    :param Adjustment adjustment: the adjustment
+    :param data: data to adjust instead of the current data of the parameter
+    :type data: np.ndarray or None
+    :returns: new Fortran-ordered data with the storage dtype of the parameter
+    :rtype: np.ndarray
+    :raises ValueError: if the method is not valid, the parameter is not numeric, or the grouping does not match the parameter
+    """
+
+    name, method, values, grouping, clip = adjustment
+
+    if method not in ADJUST_METHODS:
+        raise ValueError('Adjustment method must be one of {}'.format(', '.join(ADJUST_METHODS)))
+
+    cparam = pset.parameters.get(name)
+
+    if cparam.datatype not in [1, 2, 3]:
+        raise ValueError('{} is not a numeric parameter'.format(name))
+
+    data = np.array(cparam.values if data is None else data, dtype=np.float64, order='F')
+    values = np.asarray(values, dtype=np.float64)
+
+    if grouping is None:
+        rows = slice(None)
+        new_values = values
+    else:
+        dim_name = list(cparam.dimensions.keys())[0]
+
+        if not grouping.applies_to(dim_name) or grouping.size != data.shape[0]:
+            raise ValueError('{}: grouping of {} {} does not match dimension {}'.format(name, grouping.size,
+                                                                                       grouping.dimension, dim_name))
+        if values.ndim == 0 or values.shape[0] != len(grouping):
+            raise ValueError('{}: one value is required for each of the {} groups'.format(name, len(grouping)))
+
+        # Value of the group of each selected row, aligned with the leading dimension
+        rows = np.flatnonzero(grouping.codes >= 0)
+        new_values = values[grouping.codes[rows]]
+        new_values = new_values.reshape(new_values.shape + (1, ) * (data.ndim - new_values.ndim))
+
+    if method == 'scale':
+        data[rows] *= new_values
+    elif method == 'offset':
+        data[rows] += new_values
+    else:
+        data[rows] = new_values
+
+    if clip:
+        minimum, maximum = pset.get_bounds(name)
+        if minimum is not None or maximum is not None:
+            np.clip(data, minimum, maximum, out=data)
+
+    if cparam.datatype == 1:
+        np.rint(data, out=data)
+    return data.astype(storage_dtype(cparam.datatype), order='F')
+
+
+class ParameterTransform(object):
+
+    """Record of adjustments applied to the parameters of a ParameterSet.
+
+    A transform is created by ParameterSet.adjust(). It can be replayed on
+    another ParameterSet with the same structure (apply()), or undone, which
+    restores the data the adjusted parameters had before (restore()). The
+    adjustments are not computed backwards (clipping, rounding, and replaced
+    values cannot be inverted); the data which is replaced is kept instead.
+    Read-only data is kept as-is and writeable data is copied.
+    """
+
+    def __init__(self, adjustments):
+        """Create a ParameterTransform.
+
+        :param list[Adjustment] adjustments: the adjustments, in the order they are applied
+        """
+
+        self.__adjustments = list(adjustments)
+
+        # ParameterSet the adjustments were applied to, and the data each
+        # adjustment replaced and stored
+        self.__pset = None
+        self.__applied = []
+
+    def __len__(self):
+        return len(self.__adjustments)
+
+    @property
+    def adjustments(self):
+        """Get the adjustments.
+
+        :rtype: list[Adjustment]
+        """
+
+        return list(self.__adjustments)
+
+    @property
+    def applied(self):
+        """Check if the adjustments have been applied and not restored.
+
+        :rtype: bool
+        """
+
+        return self.__pset is not None
+
+    def apply(self, pset):
+        """Apply the adjustments to a ParameterSet.
+
+        All adjusted data is computed before any parameter is changed, so an
+        invalid adjustment leaves the ParameterSet unchanged. A parameter
+        adjusted more than once is adjusted in order.
+
+        :param ParameterSet pset: the ParameterSet
+        :returns: record of the adjustments applied to pset
+        :rtype: ParameterTransform
+        """
+
+        computed = []
+        pending = {}
+
+        for adj in self.__adjustments:
+            # Adjustments of the same parameter apply to the result of the previous one
+            data = adjusted_data(pset, adj, data=pending.get(adj.name))
+            pending[adj.name] = data
+            computed.append(data)
+
+        transform = ParameterTransform(self.__adjustments)
+        transform.__pset = pset
+
+        for adj, data in zip(self.__adjustments, computed):
+            cparam = pset.parameters.get(adj.name)
+            previous = cparam.storage
+
+            if isinstance(previous, np.ndarray) and not is_read_only(previous):
+                # Writeable data can still be changed by whoever holds it
+                previous = freeze(np.array(previous, order='F'))
+
+            transform.__applied.append((adj.name, previous, data))
+            cparam.data = freeze(data)
+        return transform
+
+    def restore(self):
+        """Restore the data the adjusted parameters had before the adjustments were applied.
+
+        :raises ValueError: if the transform was not applied (or was already restored), the data from before
+                            the adjustments was not kept, or an adjusted parameter's data was replaced since
+        """
+
+        if self.__pset is None:
+            raise ValueError('The adjustments have not been applied')
+
+        for name, previous, data in self.__applied:
+            if previous is None:
+                raise ValueError('The data of {} from before the adjustments was not kept'.format(name))
+
+        # The data stored by the last adjustment of each parameter
+        last = dict([(name, data) for name, previous, data in self.__applied])
+
+        for name, data in last.items():
+            if self.__pset.parameters.get(name).storage is not data:
+                raise ValueError('The data of {} was replaced after the adjustments were applied'.format(name))
+
+        for name, previous, data in reversed(self.__applied):
+            self.__pset.parameters.get(name).data = previous
+
+        self.__pset = None
+        self.__applied = []
@@ -3,13 +3,110 @@ from __future__ import (absolute_import, division, print_function)
 from future.utils import iteritems
 
 import numpy as np
-import pandas as pd
-from collections import OrderedDict
+import sys
+from collections import namedtuple, OrderedDict
 import xml.etree.ElementTree as xmlET
 
 from pyPRMS.Exceptions_custom import ParameterError, ConcatError
-from pyPRMS.constants import DATA_TYPES
+from pyPRMS.constants import DATA_TYPES, HRU_DIMS
 from pyPRMS.Dimensions import ParamDimensions
+from pyPRMS.param_stats import distinct_counts, summarize_distinct
+from pyPRMS.ParamStorage import BroadcastStorage, CompactStorage, as_storage_scalar, can_store, \
+                                compact_encoding_enabled, content_hash, encode, freeze, is_read_only, take, \
+                                to_native, to_storage
+
+
+# Metadata for a parameter. Records are immutable and shared between
+# Parameter objects (e.g. every ParameterSet created from the master
+# parameters.xml uses the same records); changing the metadata of a single
+# parameter replaces its record instead of modifying the shared one.
+ParamMeta = namedtuple('ParamMeta', ['datatype', 'units', 'model', 'description', 'help',
+                                     'modules', 'minimum', 'maximum', 'default'])
+
+_META_REGISTRY = {}
+
+
+def _intern_str(value):
+    """Intern a string value; other values are returned unchanged."""
+
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def _convert_value(datatype, value, allow_str=False):
+    """Convert a minimum, maximum, or default value to the parameter datatype.
+
+    :param datatype: the datatype for the parameter
+    :type datatype: int or None
+    :param value: the value to convert
+    :param bool allow_str: keep strings which cannot be converted to integers (e.g. 'bounded')
+    :returns: the converted value
+    """
+
+    if datatype is None or value is None:
+        return _intern_str(value)
+    elif DATA_TYPES[datatype] == 'float':
+        return float(value)
+    elif DATA_TYPES[datatype] == 'integer':
+        try:
+            return int(value)
+        except ValueError:
+            if allow_str:
+                # This happens with 'bounded' parameters
+                return _intern_str(value)
+            raise
+    return _intern_str(value)
+
+
+def _convert_modules(modulestr):
+    """Convert one or more module names to a tuple of interned names.
+
+    :param modulestr: Single module name or list of module names
+    :type modulestr: list[str] or str or None
+    :rtype: tuple[str] or None
+    """
+
+    if modulestr is None:
+        return None
+    if isinstance(modulestr, (list, tuple)):
+        return tuple([_intern_str(mm) for mm in modulestr])
+    return (_intern_str(modulestr), )
+
+
+def make_meta(datatype=None, units=None, model=None, description=None, help=None,
+              modules=None, minimum=None, maximum=None, default=None):
+    """Get the shared metadata record for a parameter.
+
+    Identical metadata always returns the same ParamMeta object.
+
+    :param int datatype: The datatype for the parameter (1-Integer, 2-Float, 3-Double, 4-String)
+    :param str units: Option units string for the parameter
+    :param str model: <<FILL IN LATER>>
+    :param str description: Description of the parameter
+    :param str help: Help text for the parameter
+    :param modules: List of modules that require the parameter
+    :type modules: list[str] or None
+    :param minimum: Minimum value allowed in the parameter data
+    :param maximum: Maximum value allowed in the parameter data
+    :param default: Default value used for parameter data
+    :rtype: ParamMeta
+    """
+
+    if datatype is not None and datatype not in DATA_TYPES:
+        print('WARNING: Datatype, {}, is not valid.'.format(datatype))
+        datatype = None
+
+    meta = ParamMeta(datatype=datatype,
+                     units=_intern_str(units),
+                     model=_intern_str(model),
+                     description=_intern_str(description),
+                     help=_intern_str(help),
+                     modules=_convert_modules(modules),
+                     minimum=_convert_value(datatype, minimum, allow_str=True),
+                     maximum=_convert_value(datatype, maximum, allow_str=True),
+                     default=_convert_value(datatype, default))
+    return _META_REGISTRY.setdefault(meta, meta)
 
 
 class Parameter(object):
@@ -17,12 +114,15 @@ class Parameter(object):
     """Container for a single Parameter object.
 
     A parameter has a name, datatype, optional units, one or more dimensions, and
-    associated data.
+    associated data. The metadata (datatype, units, description, etc) is held
+    in a shared, immutable ParamMeta record.
     """
 
+    __slots__ = ('__name', '__meta', '__dimensions', '__data', '__cache')
+
     # Container for a single parameter
     def __init__(self, name=None, datatype=None, units=None, model=None, description=None,
-                 help=None, modules=None, minimum=None, maximum=None, default=None):
+                 help=None, modules=None, minimum=None, maximum=None, default=None, meta=None):
         """Initialize the Parameter object.
 
         :param str name: A valid PRMS parameter name
@@ -39,35 +139,54 @@ class Parameter(object):
         :type maximum: int or float or None
         :param default: Default value used for parameter data
         :type default: int or float or None
+        :param meta: Shared metadata record; when given the other metadata arguments are ignored
+        :type meta: ParamMeta or None
         """
 
         # Set the parameter name
-        self.__name = name
-
-        # Initialize internal variables
-        self.__datatype = None
-        self.__units = None
-        self.__model = None
-        self.__description = None
-        self.__help = None
-        self.__modules = None
-        self.__minimum = None
-        self.__maximum = None
-        self.__default = None
+        self.__name = _intern_str(name)
+
+        if meta is None:
+            meta = make_meta(datatype=datatype, units=units, model=model, description=description,
+                             help=help, modules=modules, minimum=minimum, maximum=maximum,
+                             default=default)
+        self.__meta = meta
 
         self.__dimensions = ParamDimensions()
         self.__data = None  # array
 
-        # Use setters for most internal variables
-        self.datatype = datatype
-        self.units = units
-        self.model = model
-        self.description = description
-        self.help = help
-        self.modules = modules
-        self.minimum = minimum
-        self.maximum = maximum
-        self.default = default
+        # Values derived from the data (statistics, fingerprint); computed on
+        # first use and discarded whenever the data is replaced
+        self.__cache = {}
+
+    def __replace_data(self, data, owned=True):
+        """Replace the stored data and discard the cached statistics.
+
+        Arrays allocated for this parameter (owned) are made read-only, so the
+        cached values stay valid until the data is replaced. Other arrays (e.g.
+        those of the caller) are stored as given.
+        """
+
+        self.__data = freeze(data) if owned else data
+        self.__cache = {}
+
+    def __is_writeable(self):
+        """Check if the stored data can be modified in place (see data).
+
+        Values derived from writeable data are not cached.
+        """
+
+        return self.__data is not None and not is_read_only(self.__data)
+
+    def __update_meta(self, **kwargs):
+        """Replace metadata fields; the shared record is only replaced if a value changes.
+
+        The new record is shared through the registry like those from make_meta().
+        """
+
+        meta = self.__meta._replace(**kwargs)
+        if meta != self.__meta:
+            self.__meta = _META_REGISTRY.setdefault(meta, meta)
 
     def __str__(self):
         """Pretty-print string representation of the parameter information.
@@ -79,25 +198,25 @@ class Parameter(object):
         outstr = out_text.format(self.name, self.datatype, self.units, self.ndims, self.description,
                                  self.help)
 
-        if self.__minimum is not None:
-            outstr += 'Minimum value: {}\n'.format(self.__minimum)
+        if self.minimum is not None:
+            outstr += 'Minimum value: {}\n'.format(self.minimum)
 
-        if self.__maximum is not None:
-            outstr += 'Maximum value: {}\n'.format(self.__maximum)
+        if self.maximum is not None:
+            outstr += 'Maximum value: {}\n'.format(self.maximum)
 
-        if self.__default is not None:
-            outstr += 'Default value: {}\n'.format(self.__default)
+        if self.default is not None:
+            outstr += 'Default value: {}\n'.format(self.default)
 
         outstr += 'Size of data: '
         if self.__data is not None:
-            outstr += '{}\n'.format(self.data.size)
+            outstr += '{}\n'.format(self.__data.size)
         else:
             outstr += '<empty>\n'
 
-        if self.__modules is not None:
+        if self.modules is not None:
             outstr += 'Modules: '
 
-            for xx in self.__modules:
+            for xx in self.modules:
                 outstr += '{} '.format(xx)
             outstr += '\n'
 
@@ -109,27 +228,46 @@ class Parameter(object):
     def as_dataframe(self):
         """Returns the parameter data as a pandas DataFrame."""
 
-        if len(self.data.shape) == 2:
-            df = pd.DataFrame(self.data)
-            df.rename(columns=lambda xx: '{}_{}'.format(self.name, df.columns.get_loc(xx) + 1), inplace=True)
+        import pandas as pd
+
+        if len(self.values.shape) == 2:
+            df = pd.DataFrame(self.values, columns=self._column_names())
         else:
             # Assuming 1D array
-            df = pd.DataFrame(self.data, columns=[self.name])
+            df = pd.DataFrame(self.values, columns=[self.name])
             # df.rename(columns={0: name}, inplace=True)
 
         return df
 
+    def _column_names(self):
+        """Returns the column names used for 2D parameter data in DataFrames (e.g. tmax_adj_1, tmax_adj_2).
+
+        :rtype: list[str]
+        """
+
+        if self.ndims == 2:
+            return ['{}_{}'.format(self.name, ii + 1) for ii in range(self.__data.shape[1])]
+        return [self.name]
+
     @property
     def name(self):
         """Returns the parameter name."""
         return self.__name
 
+    @property
+    def meta(self):
+        """Returns the shared metadata record for the parameter.
+
+        :rtype: ParamMeta
+        """
+        return self.__meta
+
     @property
     def datatype(self):
         """Returns the datatype of the parameter.
 
         :rtype: int"""
-        return self.__datatype
+        return self.__meta.datatype
 
     @datatype.setter
     def datatype(self, dtype):
@@ -140,10 +278,8 @@ class Parameter(object):
 
         # TODO: Should this be able to handle both string (e.g. 'I') and integer datatypes?
         # TODO: If datatype is changed should verify existing data can be cast to it
-        if dtype in DATA_TYPES:
-            self.__datatype = dtype
-        elif dtype is None:
-            self.__datatype = None
+        if dtype in DATA_TYPES or dtype is None:
+            self.__update_meta(datatype=dtype)
         else:
             # TODO: This should raise and error (what kind?)
             print('WARNING: Datatype, {}, is not valid.'.format(dtype))
@@ -154,7 +290,7 @@ class Parameter(object):
 
         :rtype: str
         """
-        return self.__units
+        return self.__meta.units
 
     @units.setter
     def units(self, unitstr):
@@ -162,7 +298,7 @@ class Parameter(object):
 
         :param str unitstr: String denoting the units for the parameter (e.g. mm)
         """
-        self.__units = unitstr
+        self.__update_meta(units=_intern_str(unitstr))
 
     @property
     def model(self):
@@ -170,7 +306,7 @@ class Parameter(object):
 
         :rtype: str
         """
-        return self.__model
+        return self.__meta.model
 
     @model.setter
     def model(self, modelstr):
@@ -178,7 +314,7 @@ class Parameter(object):
 
         :param str modelstr: String denoting the model (e.g. PRMS)
         """
-        self.__model = modelstr
+        self.__update_meta(model=_intern_str(modelstr))
 
     @property
     def description(self):
@@ -186,7 +322,7 @@ class Parameter(object):
 
         :rtype: str
         """
-        return self.__description
+        return self.__meta.description
 
     @description.setter
     def description(self, descstr):
@@ -194,7 +330,7 @@ class Parameter(object):
 
         :param str descstr: Description string
         """
-        self.__description = descstr
+        self.__update_meta(description=_intern_str(descstr))
 
     @property
     def help(self):
@@ -202,7 +338,7 @@ class Parameter(object):
 
         :rtype: str
         """
-        return self.__help
+        return self.__meta.help
 
     @help.setter
     def help(self, helpstr):
@@ -210,7 +346,7 @@ class Parameter(object):
 
         :param str helpstr: Help string
         """
-        self.__help = helpstr
+        self.__update_meta(help=_intern_str(helpstr))
 
     @property
     def minimum(self):
@@ -218,7 +354,7 @@ class Parameter(object):
 
         :rtype: int or float or None
         """
-        return self.__minimum
+        return self.__meta.minimum
 
     @minimum.setter
     def minimum(self, value):
@@ -227,18 +363,7 @@ class Parameter(object):
         :param value: The minimum value
         :type value: int or float or None
         """
-        if self.__datatype is None or value is None:
-            self.__minimum = value
-        elif DATA_TYPES[self.__datatype] == 'float':
-            self.__minimum = float(value)
-        elif DATA_TYPES[self.__datatype] == 'integer':
-            try:
-                self.__minimum = int(value)
-            except ValueError:
-                # This happens with 'bounded' parameters
-                self.__minimum = value
-        else:
-            self.__minimum = value
+        self.__update_meta(minimum=_convert_value(self.datatype, value, allow_str=True))
 
     @property
     def maximum(self):
@@ -246,7 +371,7 @@ class Parameter(object):
 
         :rtype: int or float or None
         """
-        return self.__maximum
+        return self.__meta.maximum
 
     @maximum.setter
     def maximum(self, value):
@@ -255,18 +380,7 @@ class Parameter(object):
         :param value: The maximum value
         :type value: int or float or None
         """
-        if self.__datatype is None or value is None:
-            self.__maximum = value
-        elif DATA_TYPES[self.__datatype] == 'float':
-            self.__maximum = float(value)
-        elif DATA_TYPES[self.__datatype] == 'integer':
-            try:
-                self.__maximum = int(value)
-            except ValueError:
-                # This happens with bounded parameters
-                self.__maximum = value
-        else:
-            self.__maximum = value
+        self.__update_meta(maximum=_convert_value(self.datatype, value, allow_str=True))
 
     @property
     def default(self):
@@ -274,7 +388,7 @@ class Parameter(object):
 
         :rtype: int or float or None
         """
-        return self.__default
+        return self.__meta.default
 
     @default.setter
     def default(self, value):
@@ -283,14 +397,7 @@ class Parameter(object):
         :param value: The default value
         :type value: int or float or None
         """
-        if self.__datatype is None or value is None:
-            self.__default = value
-        elif DATA_TYPES[self.__datatype] == 'float':
-            self.__default = float(value)
-        elif DATA_TYPES[self.__datatype] == 'integer':
-            self.__default = int(value)
-        else:
-            self.__default = value
+        self.__update_meta(default=_convert_value(self.datatype, value))
 
     @property
     def modules(self):
@@ -298,7 +405,9 @@ class Parameter(object):
 
         :rtype: list[str] or None
         """
-        return self.__modules
+        if self.__meta.modules is None:
+            return None
+        return list(self.__meta.modules)
 
     @modules.setter
     def modules(self, modulestr):
@@ -307,13 +416,7 @@ class Parameter(object):
         :param modulestr: Single module name or list of module names to add
         :type modulestr: list[str] or str or None
         """
-        if modulestr is not None:
-            if isinstance(modulestr, list):
-                self.__modules = modulestr
-            else:
-                self.__modules = [modulestr]
-        else:
-            self.__modules = None
+        self.__update_meta(modules=_convert_modules(modulestr))
 
     @property
     def dimensions(self):
@@ -331,19 +434,30 @@ class Parameter(object):
     def data(self):
         """Returns the data associated with the parameter.
 
+        The array can be modified in place. Data which is stored read-only
+        (e.g. data read from a file, or compact storage) is first copied to a
+        writeable array (see materialize()); use values to read the data
+        without the copy.
+
         :rtype: np.ndarray
         """
-        if self.__data is not None:
-            return self.__data
-        raise ValueError('Parameter, {}, has no data'.format(self.__name))
+        return self.materialize()
 
     @data.setter
     def data(self, data_in):
         """Sets the data for the parameter.
 
-        :param list data_in: A list containing the parameter data
-        :raises TypeError: if the datatype for the parameter is invalid
-        :raises ValueError: if the number of dimensions for the parameter is greater than 2
+        An array which already has the storage dtype and layout is stored
+        without a copy and is not made read-only; changes made to it later are
+        seen by the parameter. Arrays converted from lists or other dtypes are
+        stored read-only, so their statistics and fingerprint can be cached.
+
+        :param data_in: A list containing the parameter data or an array with the shape of the declared dimensions
+        :type data_in: list or np.ndarray or CompactStorage
+        :raises TypeError: if the datatype for the parameter is invalid or the array cannot be cast to it
+        :raises ValueError: if the number of dimensions for the parameter is greater than 2 or the array shape
+                            doesn't match the declared dimensions
+        :raises IndexError: if the array has a different number of dimensions than the parameter
         """
         # Raise an error if no dimensions are defined for parameter
         if not self.ndims:
@@ -354,18 +468,19 @@ class Parameter(object):
             datatype_conv = {1: self.__str_to_int, 2: self.__str_to_float,
                              3: self.__str_to_float, 4: self.__str_to_str}
 
-            if self.__datatype in DATA_TYPES.keys():
-                data_in = datatype_conv[self.__datatype](data_in)
+            if self.datatype in DATA_TYPES.keys():
+                data_in = datatype_conv[self.datatype](data_in)
             else:
-                raise TypeError('Defined datatype {} for parameter {} is not valid'.format(self.__datatype,
+                raise TypeError('Defined datatype {} for parameter {} is not valid'.format(self.datatype,
                                                                                            self.__name))
 
-            # Convert list to np.array
+            # Convert list to np.array with the storage dtype for the datatype
             if self.ndims == 2:
-                data_np = np.array(data_in).reshape((-1, self.dimensions.get_dimsize_by_index(1),), order='F')
+                data_np = freeze(to_storage(data_in, self.datatype)).reshape(
+                    (-1, self.dimensions.get_dimsize_by_index(1),), order='F')
                 # data_np = np.array(data_in).reshape((-1, self.__dimensions.get_dimsize_by_index(1),), order='F')
             elif self.ndims == 1:
-                data_np = np.array(data_in)
+                data_np = to_storage(data_in, self.datatype)
             else:
                 raise ValueError('Number of dimensions, {}, is not supported'.format(self.ndims))
 
@@ -378,22 +493,87 @@ class Parameter(object):
                 # from a pre-existing value
                 if data_np.size > 1:
                     print('WARNING: {} with dimension "one" has {} values. Using first value only.'.format(self.__name, data_np.size))
-                self.__data = np.array(data_np[0], ndmin=1)
+                self.__replace_data(np.array(data_np[0], ndmin=1))
                 # self.__data = data_np[0]
+            elif compact_encoding_enabled():
+                self.__replace_data(encode(data_np))
             else:
-                self.__data = data_np
+                self.__replace_data(data_np)
 
-        elif isinstance(data_in, np.ndarray):
+        elif isinstance(data_in, (np.ndarray, CompactStorage)):
             if data_in.ndim == self.ndims:
-                self.__data = data_in
+                dim_shape = tuple([vv.size for vv in self.__dimensions.values()])
+
+                if data_in.shape != dim_shape:
+                    err_txt = 'Shape of new data {} for {} doesn\'t match the declared dimensions {}'
+                    raise ValueError(err_txt.format(data_in.shape, self.__name, dim_shape))
+
+                if isinstance(data_in, np.ndarray) and self.datatype in DATA_TYPES:
+                    if not can_store(data_in.dtype, self.datatype):
+                        raise TypeError('Cannot store {} data in parameter {} with datatype {}'.format(data_in.dtype,
+                                                                                                     self.__name,
+                                                                                                     self.datatype))
+                    # No copy is made if the array already has the storage dtype
+                    storage = to_storage(data_in, self.datatype)
+
+                    # The arrays of the caller are never made read-only
+                    self.__replace_data(storage, owned=not np.may_share_memory(storage, data_in))
+                else:
+                    self.__replace_data(data_in, owned=False)
             else:
                 err_txt = 'Number of dimensions for new data ({}) doesn\'t match old ({})'
                 raise IndexError(err_txt.format(data_in.ndim, self.ndims))
 
+    @property
+    def is_compact(self):
+        """Returns True if the data is held in a compact storage form (e.g. broadcast from a smaller array).
+
+        :rtype: bool
+        """
+        return isinstance(self.__data, CompactStorage)
+
+    @property
+    def nbytes(self):
+        """Returns the number of bytes used to store the data.
+
+        :rtype: int
+        """
+        if self.__data is None:
+            return 0
+        return self.__data.nbytes
+
+    @property
+    def values(self):
+        """Returns the data associated with the parameter as a read-only array.
+
+        Unlike data this never copies or expands the stored data into a new
+        writeable array, so the cached statistics and fingerprint stay valid.
+        Compact storage is expanded to a temporary array.
+
+        :rtype: np.ndarray
+        """
+        if self.__data is None:
+            raise ValueError('Parameter, {}, has no data'.format(self.__name))
+        elif isinstance(self.__data, CompactStorage):
+            return self.__data.view()
+        elif self.__data.flags.writeable:
+            data = self.__data.view()
+            data.flags.writeable = False
+            return data
+        return self.__data
+
+    @property
+    def storage(self):
+        """Returns the stored data object; either a numpy array or a CompactStorage object.
+
+        :rtype: np.ndarray or CompactStorage
+        """
+        return self.__data
+
     @property
     def index_map(self):
         """Returns an ordered dictionary which maps data values to index position"""
-        return OrderedDict((val, idx) for idx, val in enumerate(self.__data.tolist()))
+        return OrderedDict((val, idx) for idx, val in enumerate(self.values.tolist()))
 
     @property
     def xml(self):
@@ -432,17 +612,18 @@ class Parameter(object):
         datatype_conv = {1: self.__str_to_int, 2: self.__str_to_float,
                          3: self.__str_to_float, 4: self.__str_to_str}
 
-        if self.__datatype in DATA_TYPES.keys():
-            data_in = datatype_conv[self.__datatype](data_in)
+        if self.datatype in DATA_TYPES.keys():
+            data_in = datatype_conv[self.datatype](data_in)
         else:
-            raise TypeError('Defined datatype {} for parameter {} is not valid'.format(self.__datatype,
+            raise TypeError('Defined datatype {} for parameter {} is not valid'.format(self.datatype,
                                                                                        self.__name))
 
-        # Convert list to np.array
+        # Convert list to np.array with the storage dtype for the datatype
         if self.ndims == 2:
-            data_np = np.array(data_in).reshape((-1, self.dimensions.get_dimsize_by_index(1),), order='F')
+            data_np = to_storage(data_in, self.datatype).reshape((-1, self.dimensions.get_dimsize_by_index(1),),
+                                                                 order='F')
         elif self.ndims == 1:
-            data_np = np.array(data_in)
+            data_np = to_storage(data_in, self.datatype)
         else:
             raise ValueError('Number of dimensions, {}, is not supported'.format(self.ndims))
 
@@ -450,14 +631,14 @@ class Parameter(object):
             # A parameter with the dimension 'one' should never have more
             # than 1 value. Output warning if the incoming value is different
             # from a pre-existing value
-            if data_np[0] != self.__data[0]:
+            if data_np[0] != self.values[0]:
                 raise ConcatError('Parameter, {}, with dimension "one" already '.format(self.__name) +
-                                  'has assigned value = {}; '.format(self.__data[0]) +
+                                  'has assigned value = {}; '.format(self.values[0]) +
                                   'Cannot concatenate additional value(s), {}'.format(data_np[0]))
                 # print('WARNING: {} with dimension "one" has different '.format(self.__name) +
                 #       'value ({}) from current ({}). Keeping current value.'.format(data_np[0], self.__data[0]))
         else:
-            self.__data = np.concatenate((self.__data, data_np))
+            self.__replace_data(np.asarray(np.concatenate((self.values, data_np)), order='F'))
             # self.__data = data_np
 
     def check(self):
@@ -478,12 +659,35 @@ class Parameter(object):
 
     def check_values(self):
         """Returns true if all data values are within the min/max values for the parameter."""
-        if self.__minimum is not None and self.__maximum is not None:
+        if self.minimum is not None and self.maximum is not None:
             # Check both ends of the range
-            if not(isinstance(self.__minimum, str) or isinstance(self.__maximum, str)):
-                return (self.__data >= self.__minimum).all() and (self.__data <= self.__maximum).all()
+            if not(isinstance(self.minimum, str) or isinstance(self.maximum, str)):
+                # Compare at the precision of the stored data
+                minimum = as_storage_scalar(self.minimum, self.__data.dtype)
+                maximum = as_storage_scalar(self.maximum, self.__data.dtype)
+
+                if self.is_compact:
+                    return self.__data.min() >= minimum and self.__data.max() <= maximum
+                return (self.__data >= minimum).all() and (self.__data <= maximum).all()
         return True
 
+    def factorize(self):
+        """Returns a table of distinct values and the index into the table for each element of the data.
+
+        For parameters with compact storage this is computed without expanding the data;
+        otherwise the table is the cached distinct values (see unique()).
+
+        :returns: table of values and array of codes with the same shape as the data
+        :rtype: (np.ndarray, np.ndarray)
+        """
+
+        if self.is_compact:
+            return self.__data.factorize()
+
+        # NaN sorts last in the table and searchsorted() places it there too
+        table = self.unique()
+        return table, np.searchsorted(table, self.__data)
+
     def has_correct_size(self):
         """Verifies the total size of the data for the parameter matches the total declared dimension(s) sizes.
 
@@ -498,7 +702,7 @@ class Parameter(object):
             total_size *= self.dimensions.get(dd).size
 
         # This assumes a numpy array
-        return self.data.size == total_size
+        return self.__data.size == total_size
 
     def remove_by_index(self, dim_name, indices):
         """Remove columns (nhru or nsegment) from data array given a list of indices"""
@@ -506,16 +710,58 @@ class Parameter(object):
         if isinstance(indices, type(OrderedDict().values())):
             indices = list(indices)
 
-        if self.__data.size == 1:
+        if self.values.size == 1:
             print('{}: Cannot reduce array of size one'.format(self.name))
             return
 
-        self.__data = np.delete(self.__data, indices, axis=self.dimensions.get_position(dim_name))
+        self.__replace_data(np.asarray(np.delete(self.values, indices, axis=self.dimensions.get_position(dim_name)),
+                                       order='F'))
         self.dimensions[dim_name].size = self.__data.shape[self.dimensions.get_position(dim_name)]
 
+    def encode(self, max_ratio=0.5):
+        """Store the data with the most compact encoding.
+
+        The data is stored as a constant, dictionary-encoded, or sparse array
+        (see ParamStorage.encode()) if that uses at most max_ratio of the
+        memory of the full array. Getting data expands it to a full array
+        again (see materialize()).
+
+        :param float max_ratio: maximum size of the encoding relative to the full array
+        :returns: True if the data is stored compactly
+        :rtype: bool
+        """
+
+        if self.__data is not None and not self.is_compact:
+            self.__replace_data(encode(self.__data, max_ratio=max_ratio))
+        return self.is_compact
+
+    def materialize(self):
+        """Convert the stored data to a full, writeable numpy array.
+
+        Compact storage is expanded and read-only data is copied, which also
+        protects data shared with another parameter (e.g. OverlayParameterSet).
+        While the data is writeable its fingerprint and statistics are
+        recomputed on every call.
+
+        :returns: the parameter data
+        :rtype: np.ndarray
+        :raises ValueError: if the parameter has no data
+        """
+
+        if self.__data is None:
+            raise ValueError('Parameter, {}, has no data'.format(self.__name))
+        elif self.is_compact:
+            self.__replace_data(self.__data.materialize(), owned=False)
+        elif not self.__data.flags.writeable:
+            self.__replace_data(np.array(self.__data, order='F'), owned=False)
+        return self.__data
+
     def reshape(self, new_dims):
         """Reshape a parameter, broadcasting existing values as necessary.
 
+        The reshaped data is stored compactly (see is_compact); only the
+        original values and the new shape are kept until the data is materialized.
+
         :param collections.OrderedDict new_dims: Dimension names and sizes that will be used to reshape the parameter data
         """
 
@@ -524,7 +770,7 @@ class Parameter(object):
                 # Reshaping from a scalar to a 1D or 2D array
                 # print('Scalar to 1D or 2D')
                 new_sizes = [vv.size for vv in new_dims.values()]
-                tmp_data = np.broadcast_to(self.__data, new_sizes)
+                tmp_data = BroadcastStorage(self.values.reshape([1] * len(new_sizes)), new_sizes)
 
                 # Remove the original dimension
                 self.dimensions.remove('one')
@@ -533,7 +779,7 @@ class Parameter(object):
                 for kk, vv in iteritems(new_dims):
                     self.dimensions.add(kk, vv.size)
 
-                self.__data = tmp_data
+                self.__replace_data(tmp_data)
             elif set(self.dimensions.keys()).issubset(set(new_dims.keys())):
                 # Reschaping a 1D to a 2D
                 if len(new_dims) == 1:
@@ -541,19 +787,18 @@ class Parameter(object):
                 else:
                     # print('1D array to 2D array')
                     new_sizes = [vv.size for vv in new_dims.values()]
-                    try:
-                        tmp_data = np.broadcast_to(self.__data, new_sizes)
-                    except ValueError:
-                        # operands could not be broadcast together with remapped shapes
-                        tmp_data = np.broadcast_to(self.__data, new_sizes[::-1]).T
-
                     old_dim = list(self.dimensions.keys())[0]
+
+                    # Align the existing values with the position of their dimension in new_dims
+                    src_shape = [1] * len(new_sizes)
+                    src_shape[list(new_dims.keys()).index(old_dim)] = -1
+                    tmp_data = BroadcastStorage(self.values.reshape(src_shape), new_sizes)
                     self.dimensions.remove(old_dim)
 
                     for kk, vv in iteritems(new_dims):
                         self.dimensions.add(kk, vv.size)
 
-                    self.__data = tmp_data
+                    self.__replace_data(tmp_data)
 
     def subset_by_index(self, dim_name, indices):
         """Reduce columns (nhru or nsegment) from data array given a list of indices"""
@@ -561,11 +806,12 @@ class Parameter(object):
         if isinstance(indices, type(OrderedDict().values())):
             indices = list(indices)
 
-        if self.__data.size == 1:
+        if self.values.size == 1:
             print('{}: Cannot reduce array of size one'.format(self.name))
             return
 
-        self.__data = self.__data[indices]
+        # The result keeps the Fortran-ordered layout
+        self.__replace_data(take(self.values, indices, axis=self.dimensions.get_position(dim_name)))
         self.dimensions[dim_name].size = self.__data.shape[self.dimensions.get_position(dim_name)]
         # self.__data = np.take(self.__data, indices, axis=0)
         # self.__data = np.delete(self.__data, indices, axis=self.dimensions.get_position(dim_name))
@@ -579,7 +825,7 @@ class Parameter(object):
 
         # TODO: is this correct for snarea_curve?
         # Return a list of the data
-        return self.__data.ravel(order='F').tolist()
+        return to_native(self.values.ravel(order='F')).tolist()
 
     def toparamdb(self):
         """Outputs parameter data in the paramDb csv format.
@@ -608,13 +854,81 @@ class Parameter(object):
                  'data': self.tolist()}
         return param
 
+    def fingerprint(self, refresh=False):
+        """Returns a stable content hash of the parameter.
+
+        The hash covers the datatype, the dtype of the data, the dimension
+        names and sizes, and the data values (see ParamStorage.content_hash());
+        it does not include the name or other metadata. It is cached until the
+        data is replaced, except while the data is writeable (see data).
+
+        :param bool refresh: recompute the hash
+        :returns: hex digest
+        :rtype: str
+        """
+
+        key = (self.datatype, tuple([(kk, vv.size) for kk, vv in iteritems(self.__dimensions)]))
+        cached = self.__cache.get('fingerprint')
+
+        if cached is None or cached[0] != key or refresh or self.__is_writeable():
+            cached = (key, content_hash(self.__data, key[0], key[1]))
+            self.__cache['fingerprint'] = cached
+        return cached[1]
+
+    def stats(self, refresh=False):
+        """Returns summary statistics (min, max, mean, percentiles, unique and NaN counts) for the data.
+
+        The statistics are computed in one pass over the distinct values of the
+        data and cached until the data is replaced, except while the data is
+        writeable (see data).
+
+        :param bool refresh: recompute the statistics
+        :returns: summary statistics
+        :rtype: ParamStats
+        """
+
+        return self.__cached_stats(refresh)[2]
+
+    def __cached_stats(self, refresh=False):
+        """Returns the cached (distinct values, counts, statistics) of the data."""
+
+        if 'stats' not in self.__cache or refresh or self.__is_writeable():
+            if self.is_compact:
+                # Computed from the stored values without expanding the data
+                uniq, counts, nan_count = distinct_counts(*self.__data.value_counts())
+            else:
+                uniq, counts, nan_count = distinct_counts(self.__data)
+
+            self.__cache['stats'] = (uniq, counts, summarize_distinct(uniq, counts, nan_count))
+        return self.__cache['stats']
+
     def unique(self):
         """Create array of unique values from the parameter data.
 
+        The unique values are cached with the statistics (see stats()).
+
         :returns: Array of unique values
         :rtype: np.ndarray
         """
-        return np.unique(self.__data)
+        uniq, _, stats = self.__cached_stats()
+
+        if stats.nan_count:
+            # NaN sorts last, as with np.unique()
+            return np.append(uniq, np.array([np.nan], dtype=uniq.dtype))
+        return uniq.copy()
+
+    def value_counts(self):
+        """Returns the distinct values of the data and the number of times each occurs.
+
+        For parameters with compact storage this is computed without expanding the data.
+
+        :returns: values and counts
+        :rtype: (np.ndarray, np.ndarray)
+        """
+
+        if self.is_compact:
+            return self.__data.value_counts()
+        return np.unique(self.__data, return_counts=True)
 
     @staticmethod
     def __str_to_float(data):
@@ -688,12 +1002,23 @@ class Parameters(object):
         """
         self.__parameters = OrderedDict()
 
+        # Incremented whenever parameters are added, removed, or resized
+        self.__version = 0
+
+        # Dimension name to parameter names; built on first use
+        self.__dim_index = None
+        self.__dim_index_version = None
+
     def __getattr__(self, name):
         """Not sure what to write yet.
         """
 
         # Undefined attributes will look up the given parameter
         # return self.get(item)
+        if name.startswith('_'):
+            # Private attributes are not delegated; they are looked up before
+            # they exist when the object is copied or unpickled
+            raise AttributeError(name)
         return getattr(self.__parameters, name)
 
     def __getitem__(self, item):
@@ -730,8 +1055,8 @@ class Parameters(object):
         :type maximum: int or float or None
         :param default: Default value used for parameter data
         :type default: int or float or None
-        :param info: Parameter object containing the metadata information for the parameter
-        :type info: Parameter
+        :param info: Parameter object or metadata record containing the metadata information for the parameter
+        :type info: Parameter or ParamMeta
 
         :raises ParameterError: if parameter already exists or name is None
         """
@@ -742,17 +1067,13 @@ class Parameters(object):
         elif name is None:
             raise ParameterError("None is not a valid parameter name")
 
+        self.__version += 1
+
         if isinstance(info, Parameter):
-            self.__parameters[name] = Parameter(name=name,
-                                                datatype=info.datatype,
-                                                units=info.units,
-                                                model=info.model,
-                                                description=info.description,
-                                                help=info.help,
-                                                modules=info.modules,
-                                                minimum=info.minimum,
-                                                maximum=info.maximum,
-                                                default=info.default)
+            # Share the metadata record of the given parameter
+            self.__parameters[name] = Parameter(name=name, meta=info.meta)
+        elif isinstance(info, ParamMeta):
+            self.__parameters[name] = Parameter(name=name, meta=info)
         else:
             self.__parameters[name] = Parameter(name=name, datatype=datatype, units=units,
                                                 model=model, description=description,
@@ -760,21 +1081,114 @@ class Parameters(object):
                                                 minimum=minimum, maximum=maximum,
                                                 default=default)
 
+    def by_dimension(self, dim_name, equivalent=True):
+        """Returns the parameters which have a given dimension.
+
+        The dimension to parameter index is built on first use and rebuilt
+        after parameters or dimensions are added or removed.
+
+        :param str dim_name: name of the dimension
+        :param bool equivalent: treat the HRU dimensions (nhru, nssr, ngw) as equivalent
+        :returns: Parameter objects in the order they were added
+        :rtype: list[Parameter]
+        """
+
+        index = self._dimension_index()
+        dim_names = HRU_DIMS if equivalent and dim_name in HRU_DIMS else [dim_name]
+
+        if len(dim_names) == 1:
+            return [self.get(kk) for kk in index.get(dim_name, [])]
+
+        selected = set().union(*[index.get(dd, ()) for dd in dim_names])
+        return [self.get(kk) for kk in self.keys() if kk in selected]
+
+    def dimension_sizes(self):
+        """Returns the size of each dimension used by the parameters.
+
+        The size is taken from the first parameter with the dimension.
+
+        :returns: dimension names and sizes
+        :rtype: collections.OrderedDict[str, int]
+        """
+
+        return OrderedDict((dd, self.get(names[0]).dimensions[dd].size)
+                           for dd, names in iteritems(self._dimension_index()))
+
+    def _dimension_index(self):
+        """Returns the dimension name to parameter names index.
+
+        :rtype: collections.OrderedDict[str, list[str]]
+        """
+
+        # Parameters can gain or lose dimensions (e.g. when expanded), which
+        # changes the names version of their dimensions
+        version = (self.__version,
+                   tuple([cparam.dimensions.names_version for cparam in self.__parameters.values()]))
+
+        if self.__dim_index is None or self.__dim_index_version != version:
+            index = OrderedDict()
+
+            for cparam in self.__parameters.values():
+                for dd in cparam.dimensions.keys():
+                    index.setdefault(dd, []).append(cparam.name)
+
+            self.__dim_index = index
+            self.__dim_index_version = version
+        return self.__dim_index
+
+    def resize_dimension(self, dim_name, indices):
+        """Select entries along a dimension for every parameter which has it.
+
+        The same index array is applied to every parameter, and the dimension
+        sizes of the parameters are updated. The HRU dimensions (nhru, nssr,
+        ngw) are treated as equivalent.
+
+        :param str dim_name: name of the dimension
+        :param indices: 0-based indices of the entries to keep, in output order
+        :returns: names of the dimensions that were resized
+        :rtype: list[str]
+
+        :raises IndexError: if an index is out of range for a parameter
+        """
+
+        indices = np.asarray(indices, dtype=np.intp).ravel()
+        dim_names = HRU_DIMS if dim_name in HRU_DIMS else [dim_name]
+
+        resize = []
+        for cparam in self.by_dimension(dim_name):
+            for dd in dim_names:
+                if dd in cparam.dimensions.keys():
+                    resize.append((cparam, dd))
+
+        # Check every parameter before any of them are changed
+        for cparam, dd in resize:
+            size = cparam.dimensions[dd].size
+
+            if indices.size and (indices.min() < 0 or indices.max() >= size):
+                raise IndexError('Index out of range for dimension {} of {} with size {}'.format(dd, cparam.name,
+                                                                                                 size))
+
+        for cparam, dd in resize:
+            cparam.subset_by_index(dd, indices)
+        self.__version += 1
+
+        return [dd for dd in dim_names if dd in self._dimension_index()]
+
     def check(self):
         """Check all parameter variables for proper array size.
         """
 
         # for pp in self.__parameters.values():
-        for pk in sorted(list(self.__parameters.keys())):
-            pp = self.__parameters[pk]
+        for pk in sorted(list(self.keys())):
+            pp = self.get(pk)
 
             print(pp.check())
 
             if not pp.check_values():
-                print('    WARNING: Value(s) (range: {}, {}) outside the valid range of ({}, {})'.format(pp.data.min(), pp.data.max(), pp.minimum, pp.maximum))
+                print('    WARNING: Value(s) (range: {}, {}) outside the valid range of ({}, {})'.format(pp.values.min(), pp.values.max(), pp.minimum, pp.maximum))
 
             if pp.name == 'snarea_curve':
-                if pp.as_dataframe.values.reshape((-1, 11)).shape[0] != self.__parameters['hru_deplcrv'].unique().size:
+                if pp.as_dataframe.values.reshape((-1, 11)).shape[0] != self.get('hru_deplcrv').unique().size:
                     print('  WARNING: snarea_curve has more entries than needed by hru_deplcrv')
 
     def remove(self, name):
@@ -784,6 +1198,8 @@ class Parameters(object):
         :type name: str or list[str]
         """
 
+        self.__version += 1
+
         if isinstance(name, list):
             # Remove multiple parameters
             for cparam in name:
@@ -829,32 +1245,20 @@ class Parameters(object):
         :rtype: pd.DataFrame
         """
 
+        import pandas as pd
+
         if self.exists(name):
-            cparam = self.__parameters[name]
+            cparam = self.get(name)
             param_data = cparam.as_dataframe
 
             if set(cparam.dimensions.keys()).intersection({'nhru', 'ngw', 'nssr'}):
                 if name != 'nhm_id':
-                    try:
-                        param_id = self.__parameters['nhm_id'].as_dataframe
-
-                        # Create a DataFrame of the parameter
-                        param_data = param_data.merge(param_id, left_index=True, right_index=True)
-                        param_data.set_index('nhm_id', inplace=True)
-                    except KeyError:
-                        # If there is no nhm_id parameter then just return the
-                        # requested parameter by itself
-                        param_data.rename(index={k: k + 1 for k in param_data.index},
-                                          inplace=True)
-                        param_data.index.name = 'hru'
+                    # Index by nhm_id if it exists; otherwise use 1-based local HRU ids
+                    param_data.index = self._global_index('nhru')
                 else:
-                    param_data = self.__parameters['nhm_id'].as_dataframe
+                    param_data = self.get('nhm_id').as_dataframe
             elif set(cparam.dimensions.keys()).intersection({'nsegment'}):
-                param_id = self.__parameters['nhm_seg'].as_dataframe
-
-                # Create a DataFrame of the parameter
-                param_data = param_data.merge(param_id, left_index=True, right_index=True)
-                param_data.set_index(['nhm_seg'], inplace=True)
+                param_data.index = self._global_index('nsegment')
             elif name == 'snarea_curve':
                 # Special handling for snarea_curve parameter
                 param_data = pd.DataFrame(cparam.as_dataframe.values.reshape((-1, 11)))
@@ -865,19 +1269,89 @@ class Parameters(object):
             return param_data
         raise ValueError('Parameter, {}, has no associated data'.format(name))
 
+    def get_dataframe_by_dimension(self, dim_name, names=None):
+        """Returns a single wide pandas DataFrame of all parameters that share a leading dimension.
+
+        The index (nhm_id for HRU dimensions, nhm_seg for nsegment) is built
+        once for all parameters. Parameters with a second dimension are
+        expanded into one column per position (e.g. tmax_adj_1 .. tmax_adj_12).
+        The HRU dimensions (nhru, nssr, ngw) are treated as equivalent.
+
+        :param str dim_name: name of the leading dimension (e.g. nhru, nsegment)
+        :param names: restrict the DataFrame to these parameters
+        :type names: list[str] or None
+        :returns: Pandas DataFrame of the parameter data
+        :rtype: pd.DataFrame
+        """
+
+        import pandas as pd
+
+        dim_set = set(HRU_DIMS) if dim_name in HRU_DIMS else {dim_name}
+        id_param = {'nsegment': 'nhm_seg'}.get(dim_name, 'nhm_id' if dim_name in HRU_DIMS else None)
+
+        columns = OrderedDict()
+
+        for cparam in self.by_dimension(dim_name):
+            if names is not None and cparam.name not in names:
+                continue
+            if cparam.name == id_param:
+                continue
+            if list(cparam.dimensions.keys())[0] not in dim_set:
+                continue
+
+            data = cparam.values
+            if data.ndim == 2:
+                for ii, cname in enumerate(cparam._column_names()):
+                    columns[cname] = data[:, ii]
+            else:
+                columns[cparam.name] = data
+
+        return pd.DataFrame(columns, index=self._global_index(dim_name))
+
+    def _global_index(self, dim_name):
+        """Returns a pandas Index of the global ids (nhm_id or nhm_seg) for a dimension.
+
+        If the global id parameter does not exist a 1-based index is returned.
+
+        :param str dim_name: name of the dimension
+        :rtype: pd.Index
+        """
+
+        import pandas as pd
+
+        if dim_name in HRU_DIMS:
+            id_param, local_name = 'nhm_id', 'hru'
+        elif dim_name == 'nsegment':
+            id_param, local_name = 'nhm_seg', 'seg'
+        else:
+            id_param, local_name = None, dim_name
+
+        if id_param is not None and self.exists(id_param):
+            return pd.Index(self.get(id_param).values, name=id_param)
+
+        size = None
+        for cparam in self.by_dimension(dim_name, equivalent=False):
+            if list(cparam.dimensions.keys())[0] == dim_name:
+                size = cparam.dimensions[dim_name].size
+                break
+
+        if size is None:
+            raise ValueError('No parameters have the dimension, {}'.format(dim_name))
+        return pd.RangeIndex(1, size + 1, name=local_name)
+
     def get_subset(self, name, global_ids):
         """Returns a subset for a parameter based on the global_ids (e.g. nhm)"""
-        param = self.__parameters[name]
+        param = self.get(name)
         dim_set = set(param.dimensions.keys()).intersection({'nhru', 'nssr', 'ngw', 'nsegment'})
         id_index_map = {}
         cdim = dim_set.pop()
 
         if cdim in ['nhru', 'nssr', 'ngw']:
             # Global IDs should be in the range of nhm_id
-            id_index_map = self.__parameters['nhm_id'].index_map
+            id_index_map = self.get('nhm_id').index_map
         elif cdim in ['nsegment']:
             # Global IDs should be in the range of nhm_seg
-            id_index_map = self.__parameters['nhm_seg'].index_map
+            id_index_map = self.get('nhm_seg').index_map
 
         # Zero-based indices in order of global_ids
         nhm_idx0 = []
@@ -885,9 +1359,9 @@ class Parameters(object):
             nhm_idx0.append(id_index_map[kk])
 
         if param.dimensions.ndims == 2:
-            return param.data[tuple(nhm_idx0), :]
+            return param.values[tuple(nhm_idx0), :]
         else:
-            return param.data[tuple(nhm_idx0), ]
+            return param.values[tuple(nhm_idx0), ]
 
     def remove_by_global_id(self, hrus=None, segs=None):
         """Removes data-by-id (nhm_seg, nhm_id) from all parameters"""
@@ -897,85 +1371,48 @@ class Parameters(object):
 
         if hrus is not None:
             # Map original nhm_id to their index
-            nhm_idx = OrderedDict((hid, ii) for ii, hid in enumerate(self.get('nhm_id').data.tolist()))
+            nhm_idx = OrderedDict((hid, ii) for ii, hid in enumerate(self.get('nhm_id').values.tolist()))
             nhm_seg = self.get('nhm_seg').tolist()
 
-            print(list(nhm_idx.keys())[0:10])
-
-            for xx in list(nhm_idx.keys()):
-                if xx in hrus:
-                    del nhm_idx[xx]
+            for xx in hrus:
+                nhm_idx.pop(xx, None)
 
-            print('-'*40)
-            print(list(nhm_idx.keys())[0:10])
-            print(list(nhm_idx.values())[0:10])
+            # Subset every parameter with an HRU dimension (nhru, nssr, ngw) using the same index
+            self.resize_dimension('nhru', list(nhm_idx.values()))
 
-            # [hru_segment_nhm[yy] for yy in nhm_idx.values()]
-            self.get('nhm_id').subset_by_index('nhru', nhm_idx.values())
-
-            # Update hru_segment_nhm then go back and make sure the referenced nhm_segs are valid
-            self.get('hru_segment_nhm').subset_by_index('nhru', nhm_idx.values())
+            # Make sure the referenced nhm_segs are valid
             self.get('hru_segment_nhm').data = [kk if kk in nhm_seg else 0 if kk == 0 else -1
-                                                for kk in self.get('hru_segment_nhm').data.tolist()]
+                                                for kk in self.get('hru_segment_nhm').values.tolist()]
 
             # Now do the local hru_segment
-            self.get('hru_segment').subset_by_index('nhru', nhm_idx.values())
             self.get('hru_segment').data = [nhm_seg.index(kk)+1 if kk in nhm_seg else 0 if kk == 0 else -1
-                                            for kk in self.get('hru_segment_nhm').data.tolist()]
-
-            # # First remove the HRUs from nhm_id and hru_segment_nhm
-            # id_to_seg = np.column_stack((self.get('nhm_id').data, self.get('hru_segment_nhm').data))
-            #
-            # # Create ordered dictionary to reindex hru_segment
-            # nhm_id_to_hru_segment_nhm = OrderedDict((nhm, hseg) for nhm, hseg in id_to_seg)
-            #
-            # nhm_seg = self.get('nhm_seg').data.tolist()
-            #
-            # self.get('nhm_id').data = [xx for xx in nhm_id_to_hru_segment_nhm.keys()]
-            # # self.get('nhm_id').remove_by_index('nhru', hrus)
-            #
-            # self.get('hru_segment_nhm').data = [kk if kk in nhm_seg else 0 if kk == 0 else -1
-            #                                     for kk in nhm_id_to_hru_segment_nhm.values()]
-            #
-            # self.get('hru_segment').data = [nhm_seg.index(kk)+1 if kk in nhm_seg else 0 if kk == 0 else -1
-            #                                 for kk in nhm_id_to_hru_segment_nhm.values()]
-
-            for pp in self.__parameters.values():
-                if pp.name not in ['nhm_id', 'hru_segment_nhm', 'hru_segment']:
-                    dim_set = set(pp.dimensions.keys()).intersection({'nhru', 'nssr', 'ngw'})
-
-                    if bool(dim_set):
-                        if len(dim_set) > 1:
-                            raise ValueError('dim_set > 1 for {}'.format(pp.name))
-                        else:
-                            cdim = dim_set.pop()
-                            pp.subset_by_index(cdim, nhm_idx.values())
-
-                            if pp.name == 'hru_deplcrv':
-                                # Save the list of snow indices for reducing the snarea_curve later
-                                uniq_deplcrv_idx = list(set(pp.data.tolist()))
-                                uniq_dict = {}
-                                for ii, xx in enumerate(uniq_deplcrv_idx):
-                                    uniq_dict[xx] = ii + 1
-
-                                uniq_deplcrv_idx0 = [xx - 1 for xx in uniq_deplcrv_idx]
-
-                                # Renumber the hru_deplcrv indices
-                                data_copy = pp.data.copy()
-                                with np.nditer(data_copy, op_flags=['readwrite']) as it:
-                                    for xx in it:
-                                        xx[...] = uniq_dict[int(xx)]
-
-                                pp.data = data_copy
-
-                                tmp = self.__parameters['snarea_curve'].data.reshape((-1, 11))[tuple(uniq_deplcrv_idx0), :]
-
-                                self.__parameters['snarea_curve'].data = tmp.ravel()
-
-                                self.__parameters['snarea_curve'].dimensions['ndeplval'].size = tmp.size
-
-            # Need to reduce the snarea_curve array to match the number of indices in hru_deplcrv
-            # new_deplcrv = pp['hru_deplcrv'].data.tolist()
+                                            for kk in self.get('hru_segment_nhm').values.tolist()]
+
+            if self.exists('hru_deplcrv'):
+                pp = self.__parameters['hru_deplcrv']
+
+                # Save the list of snow indices for reducing the snarea_curve
+                uniq_deplcrv_idx = list(set(pp.values.tolist()))
+                uniq_dict = {}
+                for ii, xx in enumerate(uniq_deplcrv_idx):
+                    uniq_dict[xx] = ii + 1
+
+                uniq_deplcrv_idx0 = [xx - 1 for xx in uniq_deplcrv_idx]
+
+                # Renumber the hru_deplcrv indices
+                data_copy = pp.values.copy()
+                with np.nditer(data_copy, op_flags=['readwrite']) as it:
+                    for xx in it:
+                        xx[...] = uniq_dict[int(xx)]
+
+                pp.data = data_copy
+
+                # Reduce the snarea_curve array to match the number of indices in hru_deplcrv
+                tmp = self.__parameters['snarea_curve'].values.reshape((-1, 11))[tuple(uniq_deplcrv_idx0), :]
+
+                self.__parameters['snarea_curve'].dimensions['ndeplval'].size = tmp.size
+
+                self.__parameters['snarea_curve'].data = tmp.ravel()
 
     # def replace_values(self, varname, newvals, newdims=None):
     #     """Replaces all values for a given variable/parameter. Size of old and new arrays/values must match."""
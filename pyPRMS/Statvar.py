@@ -5,7 +5,7 @@ from __future__ import (absolute_import, division, print_function)
 import numpy as np
 import pandas as pd
 
-from pyPRMS.prms_helpers import dparse
+from pyPRMS.prms_helpers import set_time_index
 
 
 class Statvar(object):
@@ -90,10 +90,9 @@ class Statvar(object):
         # Now load the data
 
         # Use pandas to read the data in from the remainder of the file
-        # We use a custom date parser to convert the date information to a datetime
-        self.__rawdata = pd.read_csv(infile, sep=r"\s+", header=None, names=self.__header,
-                                     parse_dates={'thedate': ['year', 'month', 'day', 'hour', 'min', 'sec']},
-                                     date_parser=dparse, index_col='thedate')
+        # The date columns are converted to a datetime index in one step
+        self.__rawdata = pd.read_csv(infile, sep=r"\s+", header=None, names=self.__header)
+        set_time_index(self.__rawdata, ['year', 'month', 'day', 'hour', 'min', 'sec'], name='thedate')
 
         # Drop the 'rec' field and convert the missing data to NaNs
         self.__rawdata.drop(['rec'], axis=1, inplace=True)
@@ -7,7 +7,7 @@ import re
 import numpy as np
 import pandas as pd
 
-from pyPRMS.prms_helpers import dparse
+from pyPRMS.prms_helpers import set_time_index
 
 
 class Streamflow(object):
@@ -239,11 +239,10 @@ class Streamflow(object):
         # print 'thecols:', thecols
 
         # Use pandas to read the data in from the remainder of the file
-        # We use a custom date parser to convert the date information to a datetime
+        # The date columns are converted to a datetime index in one step
         self.__rawdata = pd.read_csv(self.filename, skiprows=self.__headercount, sep=r"\s+",
-                                     header=None, names=thecols,
-                                     parse_dates={'thedate': ['year', 'month', 'day', 'hour', 'min', 'sec']},
-                                     date_parser=dparse, index_col='thedate')
+                                     header=None, names=thecols)
+        set_time_index(self.__rawdata, ['year', 'month', 'day', 'hour', 'min', 'sec'], name='thedate')
 
         # Convert the missing data (-999.0) to NaNs
         self.__rawdata.replace(to_replace=self.__missing, value=np.nan, inplace=True)
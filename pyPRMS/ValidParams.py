@@ -1,12 +1,10 @@
 
 from __future__ import (absolute_import, division, print_function)
 
-import io
-import pkgutil
 import xml.etree.ElementTree as xmlET
 from pyPRMS.Parameters import Parameters
 from pyPRMS.Exceptions_custom import ParameterError
-from pyPRMS.constants import NHM_DATATYPES
+from pyPRMS.metadata import compile_parameters, get_registry, index_params_by_module
 
 
 class ValidParams(Parameters):
@@ -20,8 +18,8 @@ class ValidParams(Parameters):
         """Create ValidParams object.
 
         Read an XML file of parameters to use as a master of valid PRMS
-        parameters. If no filename is specified an internal library XML file
-        is read.
+        parameters. If no filename is specified the metadata compiled from the
+        internal library XML file is used.
 
         :param filename: name of XML parameter file
         :type filename: str or None
@@ -30,19 +28,18 @@ class ValidParams(Parameters):
         super(ValidParams, self).__init__()
 
         self.__filename = filename
-
-        if filename:
-            self.__xml_tree = xmlET.parse(self.__filename)
-        else:
-            # Use the package file, parameters.xml, by default
-            xml_fh = io.StringIO(pkgutil.get_data('pyPRMS', 'xml/parameters.xml').decode('utf-8'))
-            self.__xml_tree = xmlET.parse(xml_fh)
+        self.__params_by_module = None
 
         # TODO: need more robust logic here; currently no way to handle failures
         self.__isloaded = False
         self._read()
         self.__isloaded = True
 
+    def __reduce__(self):
+        # The metadata is re-read when unpickled; the internal metadata comes
+        # from the process-wide registry, which cannot be pickled
+        return self.__class__, (self.__filename, )
+
     @property
     def filename(self):
         """Get XML filename.
@@ -67,13 +64,6 @@ class ValidParams(Parameters):
 
         self.__filename = filename
 
-        if filename is not None:
-            self.__xml_tree = xmlET.parse(self.__filename)
-        else:
-            # Use the package parameters.xml by default
-            xml_fh = io.StringIO(pkgutil.get_data('pyPRMS', 'xml/parameters.xml').decode('utf-8'))
-            self.__xml_tree = xmlET.parse(xml_fh)
-
         self.__isloaded = False
         self._read()
         self.__isloaded = True
@@ -87,13 +77,8 @@ class ValidParams(Parameters):
         :rtype: set[str]
         """
 
-        params_by_module = []
-
-        for xx in self.parameters.values():
-            for mm in xx.modules:
-                if mm in modules:
-                    params_by_module.append(xx.name)
-        return set(params_by_module)
+        # Uses the module index built when the parameters were read
+        return set().union(*[self.__params_by_module.get(mm, ()) for mm in modules])
 
     def _read(self):
         """Read an XML parameter file.
@@ -101,50 +86,27 @@ class ValidParams(Parameters):
         The resulting Parameters object will have parameters that have no data.
         """
 
-        xml_root = self.__xml_tree.getroot()
+        if self.__filename:
+            params = compile_parameters(xmlET.parse(self.__filename).getroot())
+            self.__params_by_module = index_params_by_module(params)
+        else:
+            # Use the package file, parameters.xml, by default
+            registry = get_registry()
+            params = registry.parameters
+            self.__params_by_module = registry.params_by_module
 
-        # Iterate over child nodes of root
-        for elem in xml_root.findall('parameter'):
-            # print(elem.attrib.get('name'))
-            name = elem.attrib.get('name')
-            dtype = elem.find('type').text
-            # print(name)
+        for name, info in params.items():
             try:
-                self.add(name)
-
-                self.get(name).datatype = NHM_DATATYPES[dtype]
-                self.get(name).description = elem.find('desc').text
-                self.get(name).units = elem.find('units').text
-
-                try:
-                    self.get(name).minimum = elem.find('minimum').text
-                except AttributeError:
-                    pass
-
-                try:
-                    self.get(name).maximum = elem.find('maximum').text
-                except AttributeError:
-                    pass
-
-                try:
-                    self.get(name).default = elem.find('default').text
-                except AttributeError:
-                    # Parameter has no default value
-                    pass
+                # The metadata record is shared by every parameter created from this one
+                self.add(name, info=info.meta)
 
                 # Add dimensions for current parameter
-                for cdim in elem.findall('./dimensions/dimension'):
-                    try:
-                        self.get(name).dimensions.add(cdim.attrib.get('name'), size=int(cdim.find('default').text))
-                    except AttributeError:
+                for dim_name, dim_size in info.dimensions:
+                    if dim_size is None:
                         # Dimension has no default value
-                        self.get(name).dimensions.add(cdim.attrib.get('name'))
-
-                mods = []
-                for cmod in elem.findall('./modules/module'):
-                    mods.append(cmod.text)
-
-                self.get(name).modules = mods
+                        self.get(name).dimensions.add(dim_name)
+                    else:
+                        self.get(name).dimensions.add(dim_name, size=dim_size)
             except ParameterError:
                 # Parameter exists add any new attribute information
                 pass
@@ -68,5 +68,7 @@ REGIONS = ['r01', 'r02', 'r03', 'r04', 'r05', 'r06', 'r07', 'r08', 'r09',
 PARAMETERS_XML = 'parameters.xml'
 DIMENSIONS_XML = 'dimensions.xml'
 NETCDF_DATATYPES = {1: 'i4', 2: 'f4', 3: 'f4', 4: 'S1'}
+# Default netCDF fill values (same as netCDF4.default_fillvals) for the NETCDF_DATATYPES
+NETCDF_FILLVALUES = {1: -2147483647, 2: 9.969209968386869e+36, 3: 9.969209968386869e+36}
 NHM_DATATYPES = {'I': 1, 'F': 2, 'D': 3, 'S': 4}
 PARNAME_DATATYPES = {'long': 1, 'float': 2, 'double': 3, 'string': 4}
@@ -0,0 +1,331 @@
+
+from __future__ import (absolute_import, division, print_function)
+
+import io
+import os
+import pickle
+import pkgutil
+import tempfile
+import threading
+import xml.etree.ElementTree as xmlET
+from collections import namedtuple, OrderedDict
+from types import MappingProxyType
+
+from pyPRMS import __version__
+from pyPRMS.Parameters import make_meta
+from pyPRMS.constants import NHM_DATATYPES
+
+# Compiled metadata for the XML files bundled with pyPRMS (xml/parameters.xml,
+# xml/control.xml, xml/variables.xml, and xml/dimensions.xml). The XML files
+# are parsed once per process and shared through a read-only registry. If the
+# environment variable PYPRMS_METADATA_CACHE is set to a directory the
+# compiled metadata is also pickled there, keyed by the pyPRMS version, so
+# new processes (e.g. calibration workers) can skip parsing the XML.
+
+CACHE_ENV = 'PYPRMS_METADATA_CACHE'
+
+# Increment when the structure of the compiled metadata changes
+_CACHE_FORMAT = 1
+
+ParamInfo = namedtuple('ParamInfo', ['meta', 'dimensions'])
+ParamInfo.__doc__ = """Compiled metadata for a parameter.
+
+meta is the shared ParamMeta record; dimensions is a tuple of
+(dimension name, default size or None) in position order.
+"""
+
+ControlInfo = namedtuple('ControlInfo', ['datatype', 'default', 'description', 'force_default',
+                                         'value_repr', 'valid_values'])
+ControlInfo.__doc__ = """Compiled metadata for a control variable.
+
+valid_values is a tuple of (value, tuple of descriptions) pairs.
+"""
+
+VariableInfo = namedtuple('VariableInfo', ['datatype', 'units', 'description', 'modules', 'dimensions'])
+VariableInfo.__doc__ = """Compiled metadata for a model output variable."""
+
+DimensionInfo = namedtuple('DimensionInfo', ['description', 'size', 'default'])
+DimensionInfo.__doc__ = """Compiled metadata for a dimension."""
+
+MetadataRegistry = namedtuple('MetadataRegistry', ['parameters', 'control', 'variables', 'dimensions',
+                                                   'params_by_module', 'dims_by_param'])
+MetadataRegistry.__doc__ = """Read-only registry of the compiled metadata.
+
+Every member is a read-only mapping keyed by name. params_by_module maps a
+module name to the frozenset of parameter names it requires; dims_by_param
+maps a parameter name to the tuple of its dimension names.
+"""
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def _read_package_xml(name):
+    """Parse an XML file bundled with pyPRMS.
+
+    :param str name: name of the file in the xml directory
+    :returns: root element
+    :rtype: xmlET.Element
+    """
+
+    xml_fh = io.StringIO(pkgutil.get_data('pyPRMS', 'xml/{}'.format(name)).decode('utf-8'))
+    return xmlET.parse(xml_fh).getroot()
+
+
+def _text(elem, tag):
+    """Get the text of a child element or None if it does not exist."""
+
+    return getattr(elem.find(tag), 'text', None)
+
+
+def compile_parameters(xml_root):
+    """Compile the parameter entries of a parameters.xml root element.
+
+    When a parameter occurs more than once the first entry is used.
+
+    :param xmlET.Element xml_root: root element of the parameters XML
+    :returns: parameter name to compiled metadata
+    :rtype: collections.OrderedDict[str, ParamInfo]
+    """
+
+    params = OrderedDict()
+
+    for elem in xml_root.findall('parameter'):
+        name = elem.attrib.get('name')
+
+        if name in params:
+            continue
+
+        meta = make_meta(datatype=NHM_DATATYPES[_text(elem, 'type')],
+                         description=_text(elem, 'desc'),
+                         units=_text(elem, 'units'),
+                         minimum=_text(elem, 'minimum'),
+                         maximum=_text(elem, 'maximum'),
+                         default=_text(elem, 'default'),
+                         modules=[cmod.text for cmod in elem.findall('./modules/module')])
+
+        dims = []
+        for cdim in elem.findall('./dimensions/dimension'):
+            dim_default = _text(cdim, 'default')
+            dims.append((cdim.attrib.get('name'), int(dim_default) if dim_default is not None else None))
+
+        params[name] = ParamInfo(meta=meta, dimensions=tuple(dims))
+    return params
+
+
+def compile_control(xml_root):
+    """Compile the control variable entries of a control.xml root element.
+
+    :param xmlET.Element xml_root: root element of the control XML
+    :returns: control variable name to compiled metadata
+    :rtype: collections.OrderedDict[str, ControlInfo]
+    """
+
+    control = OrderedDict()
+
+    for elem in xml_root.findall('control_param'):
+        name = elem.attrib.get('name')
+
+        if name in ['start_time', 'end_time']:
+            # Hack to handle PRMS weird approach to dates
+            default = elem.find('default').text.split('-')
+            if len(default) < 6:
+                # pad short date with zeros for hms
+                default.extend([0 for _ in range(6 - len(default))])
+            default = tuple(default)
+        else:
+            default = elem.find('default').text
+
+        value_repr = None
+        valid_values = OrderedDict()
+        for cvals in elem.findall('./values'):
+            value_repr = cvals.attrib.get('type')
+
+            for cv in cvals.findall('./value'):
+                valid_values[cv.attrib.get('name')] = tuple(cv.text.split(','))
+
+        control[name] = ControlInfo(datatype=int(elem.find('type').text),
+                                    default=default,
+                                    description=_text(elem, 'desc'),
+                                    force_default=_text(elem, 'force_default'),
+                                    value_repr=value_repr,
+                                    valid_values=tuple(valid_values.items()))
+    return control
+
+
+def compile_variables(xml_root):
+    """Compile the variable entries of a variables.xml root element.
+
+    :param xmlET.Element xml_root: root element of the variables XML
+    :returns: variable name to compiled metadata
+    :rtype: collections.OrderedDict[str, VariableInfo]
+    """
+
+    variables = OrderedDict()
+
+    for elem in xml_root.findall('variable'):
+        name = elem.attrib.get('name')
+
+        if name in variables:
+            continue
+
+        variables[name] = VariableInfo(datatype=_text(elem, 'type'),
+                                       units=_text(elem, 'units'),
+                                       description=_text(elem, 'desc'),
+                                       modules=tuple([cmod.text for cmod in elem.findall('./modules/module')]),
+                                       dimensions=tuple([cdim.attrib.get('name')
+                                                         for cdim in elem.findall('./dimensions/dimension')]))
+    return variables
+
+
+def compile_dimensions(xml_root):
+    """Compile the dimension entries of a dimensions.xml root element.
+
+    :param xmlET.Element xml_root: root element of the dimensions XML
+    :returns: dimension name to compiled metadata
+    :rtype: collections.OrderedDict[str, DimensionInfo]
+    """
+
+    dimensions = OrderedDict()
+
+    for elem in xml_root.findall('dimension'):
+        size = _text(elem, 'size')
+        default = _text(elem, 'default')
+
+        dimensions[elem.attrib.get('name')] = DimensionInfo(description=_text(elem, 'desc'),
+                                                            size=int(size) if size is not None else None,
+                                                            default=int(default) if default is not None else None)
+    return dimensions
+
+
+def index_params_by_module(params):
+    """Build the module to parameter names index.
+
+    :param params: parameter name to compiled metadata
+    :type params: dict[str, ParamInfo]
+    :returns: module name to parameter names
+    :rtype: dict[str, frozenset[str]]
+    """
+
+    by_module = {}
+
+    for name, info in params.items():
+        for mm in info.meta.modules or ():
+            by_module.setdefault(mm, set()).add(name)
+    return {kk: frozenset(vv) for kk, vv in by_module.items()}
+
+
+def _compile():
+    """Compile all of the bundled XML files.
+
+    :returns: compiled metadata as plain (picklable) dictionaries
+    :rtype: dict
+    """
+
+    params = compile_parameters(_read_package_xml('parameters.xml'))
+
+    return {'parameters': params,
+            'control': compile_control(_read_package_xml('control.xml')),
+            'variables': compile_variables(_read_package_xml('variables.xml')),
+            'dimensions': compile_dimensions(_read_package_xml('dimensions.xml')),
+            'params_by_module': index_params_by_module(params),
+            'dims_by_param': OrderedDict((kk, tuple([dd[0] for dd in vv.dimensions]))
+                                         for kk, vv in params.items())}
+
+
+def _cache_filename(cache_dir):
+    """Get the name of the pickle cache file for this version of pyPRMS.
+
+    :param str cache_dir: cache directory
+    :rtype: str
+    """
+
+    return os.path.join(cache_dir, 'pyprms_metadata_{}_{}.pickle'.format(__version__, _CACHE_FORMAT))
+
+
+def _load_cache(filename):
+    """Load compiled metadata from a pickle cache.
+
+    :param str filename: name of the cache file
+    :returns: compiled metadata or None if the cache cannot be used
+    :rtype: dict or None
+    """
+
+    try:
+        with open(filename, 'rb') as fh:
+            compiled = pickle.load(fh)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+    if not isinstance(compiled, dict) or compiled.get('version') != (__version__, _CACHE_FORMAT):
+        return None
+
+    # Unpickled records are new objects; register them so they are shared with
+    # parameters created elsewhere in the process.
+    for name, info in compiled['parameters'].items():
+        compiled['parameters'][name] = info._replace(meta=make_meta(**info.meta._asdict()))
+    return compiled
+
+
+def _write_cache(filename, compiled):
+    """Write compiled metadata to a pickle cache.
+
+    The file is written to a temporary file first so concurrent processes
+    never see a partial cache. Failure to write the cache is not an error.
+
+    :param str filename: name of the cache file
+    :param dict compiled: compiled metadata
+    """
+
+    cache_dir = os.path.dirname(filename)
+
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        fd, tmp_name = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fh:
+            pickle.dump(dict(compiled, version=(__version__, _CACHE_FORMAT)), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_name, filename)
+    except (IOError, OSError):
+        pass
+
+
+def get_registry():
+    """Get the process-wide registry of bundled XML metadata.
+
+    The XML files are compiled on first use (or loaded from the pickle cache
+    in the directory named by the PYPRMS_METADATA_CACHE environment variable).
+
+    :rtype: MetadataRegistry
+    """
+
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                cache_dir = os.environ.get(CACHE_ENV)
+                compiled = None
+
+                if cache_dir:
+                    compiled = _load_cache(_cache_filename(cache_dir))
+
+                if compiled is None:
+                    compiled = _compile()
+
+                    if cache_dir:
+                        _write_cache(_cache_filename(cache_dir), compiled)
+
+                _registry = MetadataRegistry(**{kk: MappingProxyType(compiled[kk])
+                                                for kk in MetadataRegistry._fields})
+    return _registry
+
+
+def clear_registry():
+    """Discard the process-wide registry; the next get_registry() call recompiles it."""
+
+    global _registry
+
+    with _registry_lock:
+        _registry = None
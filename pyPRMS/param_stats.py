@@ -0,0 +1,235 @@
+
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+from collections import namedtuple
+
+from pyPRMS.ParamStorage import to_native
+
+# Percentiles included in the summary statistics
+PERCENTILES = (25, 50, 75)
+
+ParamStats = namedtuple('ParamStats', ['size', 'nan_count', 'unique_count', 'minimum', 'maximum',
+                                       'mean', 'std', 'p25', 'p50', 'p75'])
+ParamStats.__doc__ = """Summary statistics for the data of a parameter.
+
+The statistics are computed without NaN values; std is the population
+standard deviation (ddof=0). Statistics other than size, nan_count and
+unique_count are None for string parameters or when there are no values.
+"""
+
+
+def distinct_counts(values, counts=None):
+    """Get the sorted distinct values and the number of times each occurs.
+
+    NaN values are removed and counted separately.
+
+    :param np.ndarray values: array of values (e.g. a parameter's data)
+    :param counts: number of times each entry of values occurs; values need not be unique or sorted
+    :type counts: np.ndarray or None
+    :returns: sorted distinct values, their counts, and the number of NaN values
+    :rtype: (np.ndarray, np.ndarray, int)
+    """
+
+    if counts is None:
+        uniq, ucounts = np.unique(values, return_counts=True)
+    else:
+        uniq, inverse = np.unique(values, return_inverse=True)
+        ucounts = np.bincount(inverse.ravel(), weights=counts.ravel(), minlength=uniq.size).astype(np.int64)
+
+    nan_count = 0
+    if uniq.dtype.kind == 'f' and uniq.size and np.isnan(uniq[-1]):
+        # np.unique sorts NaN values to the end
+        nan_mask = np.isnan(uniq)
+        nan_count = int(ucounts[nan_mask].sum())
+        uniq, ucounts = uniq[~nan_mask], ucounts[~nan_mask]
+    return uniq, ucounts, nan_count
+
+
+def _percentile(uniq, cum_counts, qq):
+    """Compute a percentile (numpy 'linear' method) from sorted distinct values and cumulative counts."""
+
+    pos = qq / 100.0 * (cum_counts[-1] - 1)
+    lower = int(np.floor(pos))
+
+    idx = np.searchsorted(cum_counts, [lower, min(lower + 1, cum_counts[-1] - 1)], side='right')
+    lo_val, hi_val = uniq[idx[0]], uniq[idx[1]]
+    return float(lo_val + (pos - lower) * (hi_val - lo_val))
+
+
+def summarize(values, counts=None):
+    """Compute summary statistics in a single pass over the distinct values.
+
+    The data is sorted once (np.unique); min, max, mean, std, and percentiles
+    are computed from the distinct values weighted by their counts.
+
+    :param np.ndarray values: array of values
+    :param counts: number of times each entry of values occurs (see distinct_counts())
+    :type counts: np.ndarray or None
+    :returns: summary statistics
+    :rtype: ParamStats
+    """
+
+    return summarize_distinct(*distinct_counts(values, counts))
+
+
+def summarize_distinct(uniq, ucounts, nan_count=0):
+    """Compute summary statistics from the output of distinct_counts().
+
+    Float32 values are converted with to_native() so the statistics match the
+    values written to parameter files.
+
+    :param np.ndarray uniq: sorted distinct values without NaN
+    :param np.ndarray ucounts: number of times each distinct value occurs
+    :param int nan_count: number of NaN values
+    :returns: summary statistics
+    :rtype: ParamStats
+    """
+
+    size = int(ucounts.sum()) + nan_count
+    stats = dict(size=size, nan_count=nan_count, unique_count=int(uniq.size), minimum=None, maximum=None,
+                 mean=None, std=None, p25=None, p50=None, p75=None)
+
+    if uniq.size == 0 or uniq.dtype.kind not in 'iuf':
+        return ParamStats(**stats)
+
+    native = to_native(uniq).astype(np.float64)
+    weights = ucounts.astype(np.float64)
+    total = weights.sum()
+
+    mean = (native * weights).sum() / total
+    cum_counts = np.cumsum(ucounts)
+
+    stats.update(minimum=to_native(uniq[0:1]).tolist()[0],
+                 maximum=to_native(uniq[-1:]).tolist()[0],
+                 mean=float(mean),
+                 std=float(np.sqrt((weights * (native - mean) ** 2).sum() / total)))
+
+    for qq in PERCENTILES:
+        stats['p{}'.format(qq)] = _percentile(native, cum_counts, qq)
+    return ParamStats(**stats)
+
+
+# Statistics computed by grouped_statistics()
+GROUP_STATISTICS = ('mean', 'sum', 'min', 'max', 'count')
+
+
+def grouped_statistics(codes, ngroups, values, weights=None, stats=GROUP_STATISTICS):
+    """Compute statistics of each column of values for each group of rows.
+
+    The rows are sorted by group once and every statistic is computed for
+    all columns with a single ufunc.reduceat() call. NaN values are ignored.
+    The mean is weighted when weights are given; the sum is not.
+
+    :param np.ndarray codes: group index (0 to ngroups - 1) of each row; rows with a code of -1 are excluded
+    :param int ngroups: number of groups
+    :param np.ndarray values: array of shape (rows, columns)
+    :param weights: weight of each row for the mean
+    :type weights: np.ndarray or None
+    :param stats: names of the statistics; any of 'mean', 'sum', 'min', 'max', and 'count'
+    :type stats: list[str] or tuple[str]
+    :returns: statistic name to an array of shape (ngroups, columns); statistics of groups without values are NaN
+    :rtype: dict
+    :raises ValueError: if a statistic is not supported
+    """
+
+    unknown = set(stats).difference(GROUP_STATISTICS)
+    if unknown:
+        raise ValueError('Unsupported statistics: {}'.format(', '.join(sorted(unknown))))
+
+    # Rows ordered by group; excluded rows (-1) sort first and are dropped
+    order = np.argsort(codes, kind='stable')
+    order = order[np.searchsorted(codes[order], 0):]
+
+    group_sizes = np.bincount(codes[order], minlength=ngroups)
+    nonempty = np.flatnonzero(group_sizes)
+    starts = (np.cumsum(group_sizes) - group_sizes)[nonempty]
+
+    xx = values[order]
+    if xx.dtype.kind != 'f':
+        xx = xx.astype(np.float64)
+
+    valid = None
+    if np.isnan(xx).any():
+        valid = ~np.isnan(xx)
+
+    def _reduce(ufunc, arr):
+        out = np.full((ngroups, ) + arr.shape[1:], np.nan)
+        if nonempty.size:
+            out[nonempty] = ufunc.reduceat(arr, starts, axis=0)
+        return out
+
+    if valid is None:
+        count = np.broadcast_to(group_sizes[:, np.newaxis], (ngroups, xx.shape[1])).astype(np.float64)
+        filled = xx
+    else:
+        count = _reduce(np.add, valid.astype(np.float64))
+        count[np.isnan(count)] = 0
+        filled = np.where(valid, xx, 0.0)
+
+    results = {}
+
+    for stat in stats:
+        if stat == 'count':
+            results[stat] = count.astype(np.int64)
+        elif stat == 'sum':
+            results[stat] = np.where(count > 0, _reduce(np.add, filled), np.nan)
+        elif stat == 'mean':
+            if weights is None:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    results[stat] = _reduce(np.add, filled) / count
+            else:
+                ww = np.asarray(weights, dtype=np.float64)[order][:, np.newaxis]
+                wsum = _reduce(np.add, np.broadcast_to(ww, xx.shape) if valid is None else np.where(valid, ww, 0.0))
+
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    results[stat] = _reduce(np.add, filled * ww) / wsum
+        elif stat == 'min':
+            results[stat] = _reduce(np.fmin, xx)
+        else:
+            results[stat] = _reduce(np.fmax, xx)
+    return results
+
+
+def grouped_mode(codes, ngroups, values, weights=None):
+    """Get the dominant value of each column of values for each group of rows.
+
+    The dominant value is the one with the largest total weight (or the most
+    rows when there are no weights) in the group; ties go to the smallest
+    value. Each column is reduced with one np.unique() and one np.bincount()
+    over its (group, value) pairs.
+
+    :param np.ndarray codes: group index (0 to ngroups - 1) of each row; rows with a code of -1 are excluded
+    :param int ngroups: number of groups
+    :param np.ndarray values: array of shape (rows, columns)
+    :param weights: weight of each row
+    :type weights: np.ndarray or None
+    :returns: array of shape (ngroups, columns) with the dtype of values; groups without rows get the first value
+    :rtype: np.ndarray
+    """
+
+    selected = codes >= 0
+    codes = codes[selected]
+    weights = None if weights is None else np.asarray(weights, dtype=np.float64)[selected]
+
+    result = np.empty((ngroups, values.shape[1]), dtype=values.dtype)
+    result[:] = values[0:1]
+
+    for cc in range(values.shape[1]):
+        uniq, value_codes = np.unique(values[selected, cc], return_inverse=True)
+        nvalues = max(uniq.size, 1)
+
+        # Total weight of each (group, value) pair that occurs
+        pairs, pair_codes = np.unique(codes * nvalues + value_codes.ravel(), return_inverse=True)
+        totals = np.bincount(pair_codes.ravel(), weights=weights)
+
+        groups = pairs // nvalues
+        value_idx = pairs % nvalues
+
+        # The first pair of each group after sorting by group, decreasing weight, and value
+        order = np.lexsort((value_idx, -totals, groups))
+        first = np.ones(order.size, dtype=bool)
+        first[1:] = groups[order][1:] != groups[order][:-1]
+
+        result[groups[order[first]], cc] = uniq[value_idx[order[first]]]
+    return result
@@ -3,13 +3,15 @@
 import calendar
 from datetime import datetime
 import decimal
+import numpy as np
 import xml.etree.ElementTree as xmlET
 
 
 def dparse(*dstr):
     """Convert date string to datetime.
 
-    This function is used by Pandas to parse dates.
+    This function parses a single date; datetime_index() converts whole
+    columns of dates at once.
     If only a year is provided the returned datetime will be for the last day of the year (e.g. 12-31).
     If only a year and a month is provided the returned datetime will be for the last day of the given month.
 
@@ -31,6 +33,80 @@ def dparse(*dstr):
 
     return datetime(*dint)
 
+
+def datetime_index(year, month=None, day=None, hour=None, minute=None, second=None, name=None):
+    """Build a DatetimeIndex from arrays of integer date and time fields.
+
+    This is the vectorized equivalent of dparse(). If only years are provided
+    the dates are the last day of each year (e.g. 12-31); if only years and
+    months are provided the dates are the last day of each month.
+
+    :param year: years
+    :param month: months (1-12)
+    :param day: days of the month
+    :param hour: hours
+    :param minute: minutes
+    :param second: seconds
+    :param str name: name of the index
+    :returns: the dates
+    :rtype: pd.DatetimeIndex
+    :raises ValueError: if a month or day is out of range
+    """
+
+    import pandas as pd
+
+    year = np.asarray(year, dtype=np.int64)
+    month = np.full(year.shape, 12, dtype=np.int64) if month is None else np.asarray(month, dtype=np.int64)
+
+    if ((month < 1) | (month > 12)).any():
+        raise ValueError('Month is out of range')
+
+    # First day of the month and of the next month
+    month_start = ((year - 1970) * 12 + month - 1).astype('datetime64[M]').astype('datetime64[D]')
+    next_start = ((year - 1970) * 12 + month).astype('datetime64[M]').astype('datetime64[D]')
+
+    if day is None:
+        # For months (and years) we want the last day of the month
+        dates = next_start - np.timedelta64(1, 'D')
+    else:
+        day = np.asarray(day, dtype=np.int64)
+
+        if ((day < 1) | (day > (next_start - month_start).astype(np.int64))).any():
+            raise ValueError('Day is out of range for month')
+        dates = month_start + day.astype('timedelta64[D]') - np.timedelta64(1, 'D')
+
+    seconds = np.zeros(year.shape, dtype=np.int64)
+    for field, scale in [(hour, 3600), (minute, 60), (second, 1)]:
+        if field is not None:
+            seconds += np.asarray(field, dtype=np.int64) * scale
+
+    return pd.DatetimeIndex((dates.astype('datetime64[s]') + seconds.astype('timedelta64[s]')).astype('datetime64[ns]'),
+                            name=name)
+
+
+def set_time_index(df, columns, name='time'):
+    """Replace the date and time columns of a DataFrame with a DatetimeIndex.
+
+    This is used by the readers of PRMS time series files in place of
+    parsing dates with dparse() one row at a time. The columns are read as
+    numbers and converted in one step with datetime_index().
+
+    :param pd.DataFrame df: the DataFrame; it is modified in place
+    :param list columns: labels of the year[, month[, day[, hour, minute, second]]] columns
+    :param str name: name of the index
+    :returns: the DataFrame
+    :rtype: pd.DataFrame
+    """
+
+    fields = [df[cc].to_numpy() for cc in columns]
+
+    for cc in columns:
+        # Deleting the columns does not copy the remaining data
+        del df[cc]
+
+    df.index = datetime_index(*fields, name=name)
+    return df
+
 # def dparse(yr, mo, dy, hr, minute, sec):
 #     # Date parser for working with the date format from PRMS files
 #
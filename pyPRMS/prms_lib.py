@@ -24,6 +24,8 @@ import datetime
 # import os
 # import sys
 
+from pyPRMS.prms_helpers import set_time_index
+
 # Author: Parker Norton (pnorton@usgs.gov)
 # Create date: 2015-02-09
 # Description: Set of classes for processing PRMS data files. The datafiles
@@ -147,8 +149,8 @@ def read_cbh(filename, sep=' ', missing_val=[-99.0, -999.0]):
         else:
             fheader += line
 
-    df1 = pd.read_csv(infile, sep=sep, na_values=missing_val, skipinitialspace=True, header=None,
-                      date_parser=dparse, parse_dates={'thedate': [0, 1, 2, 3, 4, 5]}, index_col='thedate')
+    df1 = pd.read_csv(infile, sep=sep, na_values=missing_val, skipinitialspace=True, header=None)
+    set_time_index(df1, [0, 1, 2, 3, 4, 5], name='thedate')
     infile.close()
 
     # Renumber/rename columns to reflect HRU number
@@ -53,55 +53,97 @@ def main():
     cbh_hdl = CbhAscii(src_path=args.cbh_path, indices=hru_nhm_to_local,
                        nhm_hrus=list(hru_nhm_to_local.keys()),
                        mapping=hru_nhm_to_region, st_date=st_date, en_date=en_date)
-    data = cbh_hdl.read_cbh_multifile(var=args.var)
 
-    for cyear in range(st_date.year, en_date.year + 1):
-        print(cyear)
-        c_start = datetime.datetime(cyear, 1, 1)
-        c_end = datetime.datetime(cyear, 12, 31)
+    write_yearly_netcdf(cbh_hdl.iter_cbh_multifile(var=args.var), args.dst, args.prefix, args.var,
+                        cbh_hdl.hru_ids, st_date)
 
-        # NetCDF-related variables
-        var_desc = {'tmax': 'Maximum Temperature', 'tmin': 'Minimum temperature', 'prcp': 'Precipitation'}
-        var_units = {'tmax': 'C', 'tmin': 'C', 'prcp': 'inches'}
 
-        # Create a netCDF file for the CBH data
-        nco = netCDF4.Dataset('{}/{}_{}_{}-{}.nc'.format(args.dst, args.prefix, args.var,
-                                                         c_start.strftime('%Y%m%d'),
-                                                         c_end.strftime('%Y%m%d')), 'w', clobber=True)
-        nco.createDimension('hru', len(list(hru_nhm_to_local.keys())))
-        nco.createDimension('time', None)
+def write_yearly_netcdf(blocks, dst, prefix, var, hru_ids, st_date):
+    """Write blocks of CBH data to one netCDF file per year.
 
-        timeo = nco.createVariable('time', 'f4', ('time'))
-        timeo.calendar = 'standard'
-        # timeo.bounds = 'time_bnds'
-        # timeo.units = 'days since 1980-01-01 00:00:00'
-        timeo.units = 'days since {}-{:02d}-{:02d} 00:00:00'.format(st_date.year, st_date.month, 1)
+    The blocks are streamed; each block is appended to the file of its year
+    (or split between the files of two years) as it arrives.
 
-        hruo = nco.createVariable('hru', 'i4', ('hru'))
-        hruo.long_name = 'Hydrologic Response Unit ID (HRU)'
+    :param blocks: blocks of CBH data in time order
+    :type blocks: iterable[CbhBlock]
+    :param str dst: output directory
+    :param str prefix: filename prefix
+    :param str var: name of the variable
+    :param list[int] hru_ids: HRU ids of the columns of the blocks
+    :param datetime st_date: date used for the time units
+    :returns: names of the files written
+    :rtype: list[str]
+    """
 
-        varo = nco.createVariable(args.var, 'f4', ('time', 'hru'), fill_value=netCDF4.default_fillvals['f4'],
-                                  zlib=True, complevel=1, chunksizes=[31, 260])
-        varo.long_name = var_desc[args.var]
-        varo.units = var_units[args.var]
+    filenames = []
+    nco = None
+    cyear = None
 
-        nco.setncattr('Description', 'Climate by HRU')
-        # nco.setncattr('Bandit_version', __version__)
-        # nco.setncattr('NHM_version', nhmparamdb_revision)
+    for block in blocks:
+        years = block.time.year
 
-        # Write the HRU ids
-        hruo[:] = list(hru_nhm_to_local.keys())
+        for byear in years.unique():
+            if byear != cyear:
+                if nco is not None:
+                    nco.close()
 
-        curr_calendar = timeo.calendar
-        curr_units = timeo.units
+                cyear = byear
+                print(cyear)
+                nco = create_netcdf(dst, prefix, var, cyear, hru_ids, st_date)
+                filenames.append(nco.filepath())
 
-        timeo[:] = netCDF4.date2num(data[c_start:c_end].index.tolist(), units=curr_units,
-                                    calendar=curr_calendar)
+            rows = years == byear
+            timeo = nco.variables['time']
+            tidx = len(timeo)
 
-        # Write the CBH values
-        nco.variables[args.var][:, :] = data[c_start:c_end].values
+            timeo[tidx:] = netCDF4.date2num(block.time[rows].to_pydatetime().tolist(), units=timeo.units,
+                                            calendar=timeo.calendar)
 
-    nco.close()
+            # Write the CBH values
+            nco.variables[var][tidx:, :] = block.values[rows]
+
+    if nco is not None:
+        nco.close()
+    return filenames
+
+
+def create_netcdf(dst, prefix, var, year, hru_ids, st_date):
+    """Create the netCDF file for one year of CBH data."""
+
+    c_start = datetime.datetime(year, 1, 1)
+    c_end = datetime.datetime(year, 12, 31)
+
+    # NetCDF-related variables
+    var_desc = {'tmax': 'Maximum Temperature', 'tmin': 'Minimum temperature', 'prcp': 'Precipitation'}
+    var_units = {'tmax': 'C', 'tmin': 'C', 'prcp': 'inches'}
+
+    # Create a netCDF file for the CBH data
+    nco = netCDF4.Dataset('{}/{}_{}_{}-{}.nc'.format(dst, prefix, var, c_start.strftime('%Y%m%d'),
+                                                     c_end.strftime('%Y%m%d')), 'w', clobber=True)
+    nco.createDimension('hru', len(hru_ids))
+    nco.createDimension('time', None)
+
+    timeo = nco.createVariable('time', 'f4', ('time'))
+    timeo.calendar = 'standard'
+    # timeo.bounds = 'time_bnds'
+    # timeo.units = 'days since 1980-01-01 00:00:00'
+    timeo.units = 'days since {}-{:02d}-{:02d} 00:00:00'.format(st_date.year, st_date.month, 1)
+
+    hruo = nco.createVariable('hru', 'i4', ('hru'))
+    hruo.long_name = 'Hydrologic Response Unit ID (HRU)'
+
+    varo = nco.createVariable(var, 'f4', ('time', 'hru'), fill_value=netCDF4.default_fillvals['f4'],
+                              zlib=True, complevel=1, chunksizes=[31, min(260, len(hru_ids))])
+    varo.long_name = var_desc[var]
+    varo.units = var_units[var]
+
+    nco.setncattr('Description', 'Climate by HRU')
+    # nco.setncattr('Bandit_version', __version__)
+    # nco.setncattr('NHM_version', nhmparamdb_revision)
+
+    # Write the HRU ids
+    hruo[:] = hru_ids
+    return nco
 
 
 if __name__ == '__main__':
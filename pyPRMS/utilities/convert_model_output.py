@@ -8,10 +8,9 @@ import glob
 # import netCDF4
 import os
 
-import io
-import pkgutil
 # import xml.dom.minidom as minidom
-import xml.etree.ElementTree as xmlET
+
+from pyPRMS.metadata import get_registry
 
 # import write_output_var as wr
 
@@ -26,10 +25,6 @@ def main():
 
     args = parser.parse_args()
 
-    xml_fh = io.StringIO(pkgutil.get_data('pyPRMS', 'xml/variables.xml').decode('utf-8'))
-    xml_tree = xmlET.parse(xml_fh)
-    xml_root = xml_tree.getroot()
-
     datatype_map = {'I': 4, 'F': 5, 'D': 6, 'S': 2}
     # Datatypes: NC_FLOAT=5, NC_DOUBLE=6, NC_INT=4, NC_CHAR=2
 
@@ -38,25 +33,8 @@ def main():
 
     var_dict = {}
 
-    # Iterate over child nodes of root
-    for elem in xml_root.findall('variable'):
-        # print(elem.attrib.get('name'))
-        name = elem.attrib.get('name')
-        dtype = elem.find('type').text
-        desc = elem.find('desc').text
-        units = elem.find('units').text
-
-        # Add dimensions for current parameter
-        dims_list = []
-        for cdim in elem.findall('./dimensions/dimension'):
-            dims_list.append(cdim.attrib.get('name'))
-
-        dims = ','.join(dims_list)
-        # Print the elements of the node
-        # print(elem.find('desc').text)
-        # print(elem.find('size').text)
-        # dim_size = int(elem.find('size').text)
-        var_dict[name] = [dtype, desc, units, dims]
+    for name, info in get_registry().variables.items():
+        var_dict[name] = [info.datatype, info.description, info.units, ','.join(info.dimensions)]
 
     # variables = list(var_dict.keys())
 
@@ -6,7 +6,6 @@ import argparse
 import os
 # import shutil
 
-from pyPRMS.ParamDbRegion import ParamDbRegion
 from pyPRMS.ParameterFile import ParameterFile
 
 __author__ = 'Parker Norton (pnorton@usgs.gov)'
@@ -43,6 +42,8 @@ def main():
     if os.path.isdir(args.src):
         # If a directory is provided for the source we assume it is a
         # paramdb format.
+        from pyPRMS.ParamDbRegion import ParamDbRegion
+
         params = ParamDbRegion(args.src)
     elif os.path.isfile(args.src):
         # A parameter file in either classic format or netcdf format
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+from __future__ import (absolute_import, division, print_function)
+
+import argparse
+import subprocess
+import sys
+
+__author__ = 'Parker Norton (pnorton@usgs.gov)'
+
+# Modules that should only be imported by the code paths that need them
+HEAVY_MODULES = ['netCDF4', 'xarray', 'pandas']
+
+# Modules for the core parameter file path
+CORE_MODULES = ['pyPRMS.ParameterFile', 'pyPRMS.ControlFile']
+
+
+def loaded_modules(module, check=None):
+    """Import a module in a new python process and report which of the given modules were loaded.
+
+    :param str module: name of the module to import
+    :param check: names of modules to look for in sys.modules after the import
+    :type check: list[str] or None
+    :returns: names of the checked modules which were loaded
+    :rtype: list[str]
+    """
+
+    check = HEAVY_MODULES if check is None else check
+    code = 'import sys; import {}; print(",".join([mm for mm in {!r} if mm in sys.modules]))'.format(module, check)
+
+    output = subprocess.check_output([sys.executable, '-c', code]).decode('utf-8').strip()
+    return [mm for mm in output.split(',') if mm]
+
+
+def import_times(module, max_depth=1):
+    """Get the import times for a module using python -X importtime.
+
+    :param str module: name of the module to import
+    :param int max_depth: deepest level of nested imports to report (0 is top-level only)
+    :returns: cumulative import time in microseconds for each module imported
+    :rtype: dict[str, int]
+    """
+
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+
+    times = {}
+    for line in proc.stderr.decode('utf-8').splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+
+        fields = line[len('import time:'):].split('|')
+
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            # Header line
+            continue
+
+        # Nested imports are indented by two spaces per level
+        name = fields[2].rstrip()[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+
+        if depth <= max_depth:
+            times[name.strip()] = cumulative
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check import time and heavy dependencies of pyPRMS modules')
+    parser.add_argument('modules', nargs='*', default=CORE_MODULES, help='Modules to import')
+    parser.add_argument('-n', '--top', type=int, default=10, help='Number of slowest imports to report')
+
+    args = parser.parse_args()
+
+    failed = False
+
+    for module in args.modules:
+        heavy = loaded_modules(module)
+        times = import_times(module)
+
+        print('-' * 40)
+        print('{}: {:.1f} ms'.format(module, times.get(module, sum(times.values())) / 1000.0))
+
+        for name, cumulative in sorted(times.items(), key=lambda xx: xx[1], reverse=True)[0:args.top]:
+            print('    {:>10.1f} ms  {}'.format(cumulative / 1000.0, name))
+
+        if heavy:
+            failed = True
+            print('    ERROR: imports {}'.format(', '.join(heavy)))
+        else:
+            print('    OK: does not import {}'.format(', '.join(HEAVY_MODULES)))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+from __future__ import (absolute_import, division, print_function)
+
+from concurrent.futures import ProcessPoolExecutor
+
+# State of a worker process (see _init_worker())
+_worker = {}
+
+
+def _init_worker(initializer, initargs):
+    """Initialize a worker process of run_tasks()."""
+
+    _worker['state'] = None if initializer is None else initializer(*initargs)
+
+
+def _run_task(func, task):
+    """Run one task of run_tasks() in a worker process."""
+
+    return func(_worker['state'], *task)
+
+
+def run_tasks(func, tasks, initializer=None, initargs=(), max_workers=None):
+    """Run tasks in parallel worker processes.
+
+    Each worker process calls initializer(*initargs) once, and func(state, *task)
+    for each of its tasks with the state the initializer returned (None if
+    there is no initializer). Anything a worker needs for every task belongs in
+    initargs, which are sent to each worker once; anything that differs
+    between the tasks belongs in the tasks. func and initializer must be
+    module-level functions so they can be pickled.
+
+    :param func: function to run for each task
+    :param tasks: arguments for each call of func (after the state)
+    :type tasks: list[tuple]
+    :param initializer: function which returns the state of a worker process
+    :param tuple initargs: arguments for the initializer
+    :param max_workers: number of processes; 1 runs the tasks in this process
+    :type max_workers: int or None
+    :returns: result of each task, in task order
+    :rtype: list
+    """
+
+    if max_workers == 1:
+        state = None if initializer is None else initializer(*initargs)
+        return [func(state, *task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(initializer, initargs)) as executor:
+        # Wait for all tasks; list() re-raises the first exception from a worker
+        return list(executor.map(_run_task, [func] * len(tasks), tasks))
@@ -0,0 +1,87 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterSet import ParameterSet
+
+
+@pytest.fixture
+def pset():
+    """Four HRUs on two segments with two depletion curves."""
+
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', [10, 20, 30, 40]),
+                                     'nhm_seg': ('nsegment', [100, 200]),
+                                     'hru_area': ('nhru', [1.0, 3.0, 2.0, 2.0]),
+                                     'hru_type': ('nhru', [1, 2, 1, 3]),
+                                     'hru_segment': ('nhru', [1, 2, 2, 2]),
+                                     'hru_segment_nhm': ('nhru', [100, 200, 200, 200]),
+                                     'hru_deplcrv': ('nhru', [1, 1, 2, 2]),
+                                     'snarea_curve': ('ndeplval', np.linspace(0.0, 1.0, 22)),
+                                     'jh_coef': (('nhru', 'nmonths'),
+                                                 np.arange(48, dtype=np.float64).reshape((4, 12)) / 100.0),
+                                     'seg_length': ('nsegment', [5.0, 6.0])})
+
+
+def test_area_weighted(pset):
+    agg = pset.aggregate_hrus({10: 1, 20: 1, 30: 2, 40: 2})
+
+    assert agg.dimensions.get('nhru').size == 2
+    assert agg.parameters.get('nhm_id').values.tolist() == [1, 2]
+    assert agg.parameters.get('hru_area').values.tolist() == [4.0, 4.0]
+
+    # (1 * jh_coef[0] + 3 * jh_coef[1]) / 4 and (2 * jh_coef[2] + 2 * jh_coef[3]) / 4
+    jh_coef = pset.parameters.get('jh_coef').values.astype(np.float64)
+    expected = np.array([(1.0 * jh_coef[0] + 3.0 * jh_coef[1]) / 4.0, (jh_coef[2] + jh_coef[3]) / 2.0])
+    np.testing.assert_allclose(agg.parameters.get('jh_coef').values, expected, rtol=1e-6)
+    assert agg.parameters.get('jh_coef').values[0, 0] == pytest.approx(0.09)
+
+
+def test_dominant_values(pset):
+    agg = pset.aggregate_hrus({10: 1, 20: 1, 30: 2, 40: 2})
+
+    # HRU 20 has most of the area of group 1; group 2 is a tie, won by the lowest value
+    assert agg.parameters.get('hru_type').values.tolist() == [2, 1]
+    assert agg.parameters.get('hru_segment').values.tolist() == [2, 2]
+    assert agg.parameters.get('hru_segment_nhm').values.tolist() == [200, 200]
+    assert agg.parameters.get('hru_deplcrv').values.tolist() == [1, 2]
+    assert agg.validate()['size_ok'].all()
+
+
+def test_unused_depletion_curves(pset):
+    agg = pset.aggregate_hrus({10: 5, 20: 5, 30: 5, 40: 7}, weights=None)
+
+    # Curve 1 is dominant in group 5 (two HRUs to one); curve 2 is used by group 7
+    assert agg.parameters.get('nhm_id').values.tolist() == [5, 7]
+    assert agg.parameters.get('hru_deplcrv').values.tolist() == [1, 2]
+
+    agg = pset.aggregate_hrus({10: 5, 20: 5, 30: 7, 40: 7})
+    assert agg.parameters.get('hru_deplcrv').values.tolist() == [1, 2]
+    assert agg.dimensions.get('ndeplval').size == 22
+
+    agg = pset.aggregate_hrus({10: 5, 20: 5, 30: 5, 40: 5})
+    assert agg.parameters.get('hru_deplcrv').values.tolist() == [1]
+    assert agg.parameters.get('snarea_curve').values.tolist() == \
+        pset.parameters.get('snarea_curve').values[:11].tolist()
+    assert agg.dimensions.get('ndeplval').size == 11
+
+
+def test_other_parameters_are_shared(pset):
+    agg = pset.aggregate_hrus({10: 1, 20: 1, 30: 2, 40: 2})
+    assert agg.parameters.get('seg_length').storage is pset.parameters.get('seg_length').storage
+
+    # Writeable data is copied
+    pset.parameters.get('nhm_seg').data[0] = 150
+    agg = pset.aggregate_hrus({10: 1, 20: 1, 30: 2, 40: 2})
+    storage = agg.parameters.get('nhm_seg').storage
+    assert not np.shares_memory(storage, pset.parameters.get('nhm_seg').storage)
+    assert not storage.flags.writeable
+    assert storage.tolist() == [150, 200]
+
+
+def test_invalid_grouping(pset):
+    with pytest.raises(ValueError):
+        pset.aggregate_hrus({10: 1, 20: 1, 30: 2})
+
+    with pytest.raises(ValueError):
+        pset.aggregate_hrus(pset.grouping({100: 1, 200: 2}, dimension='nsegment'))
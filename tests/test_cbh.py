@@ -0,0 +1,186 @@
+from __future__ import (absolute_import, division, print_function)
+
+import gzip
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyPRMS.CbhAscii import CbhAscii, iter_cbh_blocks
+from pyPRMS.constants import REGIONS
+
+NDAYS = 10
+
+# Range of NHM ids in each region; only r01 (NHM ids 1-3) and r02 (4-5) have HRUs in the tests
+MAPPING = dict([(rr, (ii * 10, ii * 10 + 5)) for ii, rr in enumerate(REGIONS)])
+MAPPING.update({'r01': (1, 3), 'r02': (4, 5)})
+
+
+def _write_cbh(filename, var, values, dates):
+    with gzip.open(filename, 'wt') as fh:
+        fh.write('Written by test\n{} {}\n####\n'.format(var, values.shape[1]))
+
+        for dd, row in zip(dates, values):
+            fh.write('{} {} {} 0 0 0 {}\n'.format(dd.year, dd.month, dd.day, ' '.join(['{:.2f}'.format(xx)
+                                                                                        for xx in row])))
+
+
+def _region_values(rr, var):
+    """Values of the region file: HRU (local id) j on day i is region + var + i + j / 100."""
+
+    offset = {'r01': 1000.0, 'r02': 2000.0}[rr] + {'prcp': 0.0, 'tmin': 100.0, 'tmax': 200.0}[var]
+    nhru = MAPPING[rr][1] - MAPPING[rr][0] + 1
+    return offset + np.arange(NDAYS)[:, None] + np.arange(1, nhru + 1)[None, :] / 100.0
+
+
+@pytest.fixture
+def cbh_dir(tmpdir):
+    dates = pd.date_range('1999-12-28', periods=NDAYS)
+
+    for rr in ['r01', 'r02']:
+        for var in ['prcp', 'tmin', 'tmax']:
+            _write_cbh(str(tmpdir.join('{}_{}.cbh.gz'.format(rr, var))), var, _region_values(rr, var), dates)
+    return str(tmpdir)
+
+
+def _indices(nhm_ids):
+    # NHM id to local id within its region file
+    return OrderedDict([(hh, hh if hh <= 3 else hh - 3) for hh in nhm_ids])
+
+
+def test_read_multifile_layout(cbh_dir):
+    cbh = CbhAscii(src_path=cbh_dir, indices=_indices([5, 2, 4, 1]), nhm_hrus=[1, 2, 4, 5], mapping=MAPPING)
+    df = cbh.read_cbh_multifile(var='tmin')
+
+    # HRUs are ordered by region, then by the indices
+    assert df.columns.tolist() == [2, 1, 5, 4]
+    assert df.index.name == 'time'
+    assert df.index[0] == pd.Timestamp('1999-12-28')
+    assert df.dtypes.unique().tolist() == [np.float32]
+    np.testing.assert_allclose(df.iloc[1].values, [1101.02, 1101.01, 2101.02, 2101.01], rtol=1e-6)
+
+
+def test_read_multivar(cbh_dir):
+    cbh = CbhAscii(src_path=cbh_dir, indices=_indices([1, 4]), nhm_hrus=[1, 4], mapping=MAPPING,
+                   st_date=pd.Timestamp('1999-12-30'), en_date=pd.Timestamp('2000-01-02'))
+    var_data, time_index = cbh.read_cbh_multivar(vars=['prcp', 'tmax'], max_workers=2)
+
+    assert list(var_data.keys()) == ['prcp', 'tmax']
+    assert time_index.tolist() == pd.date_range('1999-12-30', '2000-01-02').tolist()
+    np.testing.assert_allclose(var_data['tmax'][:, 1], 2200.01 + np.arange(2, 6), rtol=1e-6)
+
+    # Variables are read once and shared with get_var()
+    assert np.shares_memory(cbh.get_var('prcp').values, var_data['prcp'])
+
+
+def test_verbose(cbh_dir, capsys):
+    CbhAscii(src_path=cbh_dir, indices=_indices([1, 4]), mapping=MAPPING).read_cbh_multifile(var='prcp')
+    assert capsys.readouterr().out == ''
+
+    CbhAscii(src_path=cbh_dir, indices=_indices([1, 4]), mapping=MAPPING,
+             verbose=True).read_cbh_multifile(var='prcp')
+    assert sorted(capsys.readouterr().out.splitlines()) == ['\tLoaded 1 HRUs of prcp from r01',
+                                                           '\tLoaded 1 HRUs of prcp from r02']
+
+
+def test_mismatched_time_steps(cbh_dir):
+    _write_cbh('{}/r02_prcp.cbh.gz'.format(cbh_dir), 'prcp', _region_values('r02', 'prcp'),
+               pd.date_range('1999-12-29', periods=NDAYS))
+
+    with pytest.raises(ValueError, match='r02_prcp'):
+        CbhAscii(src_path=cbh_dir, indices=_indices([1, 4]), mapping=MAPPING).read_cbh_multifile(var='prcp')
+
+
+def test_missing_file(cbh_dir):
+    with pytest.raises(IOError):
+        CbhAscii(src_path=cbh_dir, indices=_indices([1, 4]), mapping=MAPPING).read_cbh_multifile(var='rhavg')
+
+
+def test_write_netcdf(cbh_dir):
+    netCDF4 = pytest.importorskip('netCDF4')
+    filename = '{}/cbh.nc'.format(cbh_dir)
+
+    cbh = CbhAscii(src_path=cbh_dir, indices=_indices([5, 2, 4, 1]), nhm_hrus=[1, 2, 4, 5], mapping=MAPPING)
+    cbh.write_netcdf(filename, vars=['tmin'])
+
+    with netCDF4.Dataset(filename) as nco:
+        assert nco.variables['hru'][:].tolist() == [1, 2, 4, 5]
+        np.testing.assert_allclose(nco.variables['tmin'][0, :], [1100.01, 1100.02, 2100.01, 2100.02], rtol=1e-6)
+
+
+def _block_dates(blocks):
+    return [(bb.time[0].strftime('%m-%d'), len(bb.time)) for bb in blocks]
+
+
+@pytest.mark.parametrize('block_size,expected', [(4, [('12-28', 4), ('01-01', 4), ('01-05', 2)]),
+                                                 (5, [('12-28', 5), ('01-02', 5)]),
+                                                 (20, [('12-28', 10)])])
+def test_block_boundaries(cbh_dir, block_size, expected):
+    blocks = list(iter_cbh_blocks('{}/r01_tmax.cbh.gz'.format(cbh_dir), block_size=block_size))
+
+    assert _block_dates(blocks) == expected
+    np.testing.assert_allclose(np.concatenate([bb.values for bb in blocks]), _region_values('r01', 'tmax'),
+                               rtol=1e-6)
+    assert blocks[0].values.dtype == np.float32
+
+
+def test_block_columns(cbh_dir):
+    block = next(iter_cbh_blocks('{}/r01_tmax.cbh.gz'.format(cbh_dir), columns=[8, 6], block_size=3))
+
+    np.testing.assert_allclose(block.values, _region_values('r01', 'tmax')[:3, [2, 0]], rtol=1e-6)
+
+
+@pytest.mark.parametrize('st_date,en_date,expected', [('1999-12-30', '2000-01-04', [('12-30', 2), ('01-01', 4)]),
+                                                      ('2000-01-02', '2000-01-02', [('01-02', 1)]),
+                                                      ('2000-01-01', '2000-01-04', [('01-01', 4)]),
+                                                      ('2000-01-05', None, [('01-05', 2)]),
+                                                      (None, '1999-12-29', [('12-28', 2)]),
+                                                      ('2001-01-01', None, [])])
+def test_block_date_range(cbh_dir, st_date, en_date, expected):
+    st_date = None if st_date is None else pd.Timestamp(st_date)
+    en_date = None if en_date is None else pd.Timestamp(en_date)
+    blocks = list(iter_cbh_blocks('{}/r01_prcp.cbh.gz'.format(cbh_dir), block_size=4, st_date=st_date,
+                                  en_date=en_date))
+
+    assert _block_dates(blocks) == expected
+
+
+def test_iter_multifile(cbh_dir):
+    cbh = CbhAscii(src_path=cbh_dir, indices=_indices([5, 2, 4, 1]), mapping=MAPPING,
+                   st_date=pd.Timestamp('1999-12-30'), en_date=pd.Timestamp('2000-01-05'))
+    blocks = list(cbh.iter_cbh_multifile(var='tmin', block_size=3, max_workers=2))
+
+    assert _block_dates(blocks) == [('12-30', 1), ('12-31', 3), ('01-03', 3)]
+    np.testing.assert_array_equal(np.concatenate([bb.values for bb in blocks]), cbh.get_var('tmin').values)
+
+
+def test_iter_multifile_different_lengths(cbh_dir):
+    _write_cbh('{}/r02_prcp.cbh.gz'.format(cbh_dir), 'prcp', _region_values('r02', 'prcp')[:8],
+               pd.date_range('1999-12-28', periods=8))
+    cbh = CbhAscii(src_path=cbh_dir, indices=_indices([1, 4]), mapping=MAPPING)
+
+    with pytest.raises(ValueError, match='different numbers'):
+        list(cbh.iter_cbh_multifile(var='prcp', block_size=4))
+
+
+def test_yearly_netcdf(cbh_dir):
+    netCDF4 = pytest.importorskip('netCDF4')
+    from pyPRMS.utilities.convert_cbh import write_yearly_netcdf
+
+    cbh = CbhAscii(src_path=cbh_dir, indices=_indices([5, 2, 4, 1]), mapping=MAPPING)
+    filenames = write_yearly_netcdf(cbh.iter_cbh_multifile(var='prcp', block_size=3), cbh_dir, 'test', 'prcp',
+                                    cbh.hru_ids, pd.Timestamp('1999-12-01'))
+
+    assert [ff.split('/')[-1] for ff in filenames] == ['test_prcp_19990101-19991231.nc',
+                                                       'test_prcp_20000101-20001231.nc']
+
+    data = cbh.get_var('prcp')
+    for filename, (st_date, en_date) in zip(filenames, [('1999-12-28', '1999-12-31'), ('2000-01-01', '2000-01-06')]):
+        with netCDF4.Dataset(filename) as nco:
+            assert nco.variables['hru'][:].tolist() == [2, 1, 5, 4]
+
+            times = netCDF4.num2date(nco.variables['time'][:], nco.variables['time'].units)
+            assert [tt.strftime('%Y-%m-%d') for tt in times] == \
+                pd.date_range(st_date, en_date).strftime('%Y-%m-%d').tolist()
+            np.testing.assert_array_equal(nco.variables['prcp'][:], data[st_date:en_date].values)
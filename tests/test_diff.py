@@ -0,0 +1,87 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterSet import ParameterSet
+
+NMONTHS = 12
+
+
+def _pset(nhm_id, hru_area, jh_coef, **arrays):
+    arrays.update({'nhm_id': ('nhru', nhm_id), 'hru_area': ('nhru', hru_area),
+                   'jh_coef': (('nhru', 'nmonths'), jh_coef),
+                   'nhm_seg': ('nsegment', [100, 200]), 'seg_length': ('nsegment', [5.0, 6.0])})
+    return ParameterSet.from_arrays(arrays)
+
+
+@pytest.fixture
+def base():
+    return _pset([10, 20, 30, 40], [1.0, 2.0, 3.0, 4.0], np.full((4, NMONTHS), 0.5),
+                 hru_type=('nhru', [1, 1, 1, 1]))
+
+
+def test_identical(base):
+    other = _pset([10, 20, 30, 40], [1.0, 2.0, 3.0, 4.0], np.full((4, NMONTHS), 0.5),
+                  hru_type=('nhru', [1, 1, 1, 1]))
+    diff = base.diff(other)
+
+    assert diff.added == [] and diff.removed == [] and diff.dimensions == {}
+    assert diff.parameters['changed'].sum() == 0
+    assert diff.parameters.loc['jh_coef', 'compared'] == 4 * NMONTHS
+    assert (diff.parameters['max_abs_diff'] == 0.0).all()
+
+
+def test_changed_values(base):
+    jh_coef = np.full((4, NMONTHS), 0.5)
+    jh_coef[2, 5] = 0.75
+    other = _pset([10, 20, 30, 40], [1.0, 2.0, 3.000001, 8.0], jh_coef, hru_type=('nhru', [1, 1, 1, 1]))
+    report = base.diff(other).parameters
+
+    # HRU 30 is within the default tolerance
+    assert report.loc['hru_area', 'changed'] == 1
+    assert report.loc['hru_area', 'changed_ids'] == [40]
+    assert report.loc['hru_area', 'max_abs_diff'] == 4.0
+    assert report.loc['hru_area', 'max_rel_diff'] == 0.5
+
+    assert report.loc['jh_coef', 'changed'] == 1
+    assert report.loc['jh_coef', 'changed_ids'] == [30]
+    assert report.loc['jh_coef', 'max_abs_diff'] == pytest.approx(0.25)
+
+    assert base.diff(other, rtol=0.0, atol=1e-12).parameters.loc['hru_area', 'changed_ids'] == [30, 40]
+
+
+def test_aligned_by_id(base):
+    other = _pset([40, 30, 20, 50], [4.0, 3.0, 2.5, 5.0], np.full((4, NMONTHS), 0.5),
+                  hru_type=('nhru', [1, 1, 1, 1]))
+    diff = base.diff(other)
+
+    assert diff.hrus_removed.tolist() == [10]
+    assert diff.hrus_added.tolist() == [50]
+    assert diff.segs_added.tolist() == [] and diff.segs_removed.tolist() == []
+
+    # Only the three common HRUs are compared, in the order of the first set
+    assert diff.parameters.loc['hru_area', 'compared'] == 3
+    assert diff.parameters.loc['hru_area', 'changed_ids'] == [20]
+    assert diff.parameters.loc['jh_coef', 'changed'] == 0
+
+
+def test_added_removed_and_dimensions(base):
+    other = _pset([10, 20, 30], [1.0, 2.0, 3.0], np.full((3, NMONTHS), 0.5), hru_percent_imperv=('nhru', [0.1] * 3))
+    other.parameters.get('jh_coef').dimensions.remove('nmonths')
+    diff = base.diff(other)
+
+    assert diff.added == ['hru_percent_imperv']
+    assert diff.removed == ['hru_type']
+    assert diff.dimensions == {'nhru': (4, 3)}
+    assert diff.parameters.loc['jh_coef', 'dims_changed']
+    assert not diff.parameters.loc['hru_area', 'dims_changed']
+
+
+def test_datatype_changed(base):
+    other = _pset([10, 20, 30, 40], [1.0, 2.0, 3.0, 4.0], np.full((4, NMONTHS), 0.5),
+                  hru_type=('nhru', [1.0, 1.0, 1.0, 2.0], 2))
+    report = base.diff(other).parameters
+
+    assert report.loc['hru_type', 'datatype_changed']
+    assert report.loc['hru_type', 'changed_ids'] == [40]
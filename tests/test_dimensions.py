@@ -0,0 +1,61 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterSet import ParameterSet
+
+
+@pytest.fixture
+def pset():
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', [10, 20, 30, 40]),
+                                     'hru_area': ('nhru', [1.0, 2.0, 3.0, 4.0]),
+                                     'gwflow_coef': ('ngw', [0.1, 0.2, 0.3, 0.4]),
+                                     'seg_length': ('nsegment', [5.0, 6.0]),
+                                     'jh_coef': (('nhru', 'nmonths'),
+                                                 np.arange(48, dtype=np.float64).reshape((4, 12)) / 100.0)})
+
+
+def _names(params):
+    return [cparam.name for cparam in params]
+
+
+def test_by_dimension(pset):
+    assert _names(pset.parameters.by_dimension('nhru')) == ['nhm_id', 'hru_area', 'gwflow_coef', 'jh_coef']
+    assert _names(pset.parameters.by_dimension('nhru', equivalent=False)) == ['nhm_id', 'hru_area', 'jh_coef']
+    assert _names(pset.parameters.by_dimension('nmonths')) == ['jh_coef']
+    assert pset.parameters.by_dimension('ncascade') == []
+
+
+def test_index_follows_changes(pset):
+    pset.parameters.remove('hru_area')
+    assert _names(pset.parameters.by_dimension('nhru', equivalent=False)) == ['nhm_id', 'jh_coef']
+
+    pset.parameters.add('jh_coef_hru', datatype=2)
+    pset.parameters.get('jh_coef_hru').dimensions.add('nhru', 4)
+    assert _names(pset.parameters.by_dimension('nhru', equivalent=False)) == ['nhm_id', 'jh_coef', 'jh_coef_hru']
+
+    pset.parameters.get('jh_coef_hru').dimensions.remove('nhru')
+    assert _names(pset.parameters.by_dimension('nhru', equivalent=False)) == ['nhm_id', 'jh_coef']
+
+
+def test_resize_dimension(pset):
+    pset.resize_dimension('nhru', [3, 1])
+
+    for dd in ['nhru', 'ngw']:
+        assert pset.dimensions.get(dd).size == 2
+    assert pset.dimensions.get('nsegment').size == 2
+
+    assert pset.parameters.get('nhm_id').values.tolist() == [40, 20]
+    assert pset.parameters.get('gwflow_coef').values.tolist() == pytest.approx([0.4, 0.2])
+    assert pset.parameters.get('jh_coef').values[:, 0].tolist() == pytest.approx([0.36, 0.12])
+    assert pset.parameters.get('jh_coef').dimensions.get('nhru').size == 2
+    assert pset.validate()['ok'].all()
+
+
+def test_resize_dimension_out_of_range(pset):
+    with pytest.raises(IndexError):
+        pset.resize_dimension('nhru', [0, 4])
+
+    assert pset.dimensions.get('nhru').size == 4
+    assert pset.parameters.get('nhm_id').values.tolist() == [10, 20, 30, 40]
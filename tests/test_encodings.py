@@ -0,0 +1,154 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterFile import ParameterFile
+from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.ParamStorage import BroadcastStorage, ConstantStorage, DictionaryStorage, PatchStorage, \
+    SparseStorage, encode, use_compact_encoding
+
+NHRU = 6
+NMONTHS = 12
+
+
+@pytest.fixture
+def pset():
+    """ParameterSet with parameters which can be expanded to nhru x nmonths."""
+
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', np.arange(1, NHRU + 1) * 10),
+                                     'tmax_allsnow': ('one', [32.0]),
+                                     'jh_coef': ('nmonths', np.linspace(0.01, 0.02, NMONTHS)),
+                                     'hru_deplcrv': ('one', [2]),
+                                     'snarea_curve': ('ndeplval', np.linspace(0.0, 1.0, 22))},
+                                    dimensions={'nhru': NHRU, 'nmonths': NMONTHS, 'one': 1, 'ndeplval': 22})
+
+
+def test_expand_scalar(pset):
+    pset.expand_parameter('tmax_allsnow')
+    cparam = pset.parameters.get('tmax_allsnow')
+
+    assert list(cparam.dimensions.keys()) == ['nhru', 'nmonths']
+    assert isinstance(cparam.storage, BroadcastStorage)
+    assert cparam.nbytes == cparam.storage.source.nbytes
+    assert cparam.values.shape == (NHRU, NMONTHS)
+    assert (cparam.values == 32.0).all()
+
+
+def test_expand_monthly(pset):
+    pset.expand_parameter('jh_coef')
+    cparam = pset.parameters.get('jh_coef')
+
+    assert cparam.is_compact
+    assert cparam.values.shape == (NHRU, NMONTHS)
+    np.testing.assert_array_equal(cparam.values[4], np.linspace(0.01, 0.02, NMONTHS).astype(np.float32))
+    assert cparam.stats().maximum == pytest.approx(0.02)
+
+    # Getting data expands it to a writeable array
+    data = cparam.data
+    assert not cparam.is_compact
+    assert data.flags.f_contiguous and data.flags.writeable
+
+
+def test_expand_depletion_curves(pset):
+    pset.expand_parameter('hru_deplcrv')
+
+    assert pset.parameters.get('hru_deplcrv').values.tolist() == list(range(1, NHRU + 1))
+
+    # Every HRU gets a copy of the second curve
+    snarea_curve = pset.parameters.get('snarea_curve')
+    assert snarea_curve.is_compact
+    assert snarea_curve.dimensions.get('ndeplval').size == NHRU * 11
+    np.testing.assert_array_equal(snarea_curve.values.reshape((NHRU, 11)),
+                                  np.tile(np.linspace(0.0, 1.0, 22)[11:].astype(np.float32), (NHRU, 1)))
+
+
+def test_expanded_parameters_are_written_in_full(pset, tmpdir):
+    for name in ['tmax_allsnow', 'jh_coef']:
+        pset.expand_parameter(name)
+
+    filename = str(tmpdir.join('expanded.param'))
+    pset.write_parameter_file(filename)
+    pfile = ParameterFile(filename, verbose=False)
+
+    for name in ['tmax_allsnow', 'jh_coef']:
+        np.testing.assert_allclose(pfile.parameters.get(name).values, pset.parameters.get(name).values, rtol=1e-4)
+
+
+@pytest.mark.parametrize('data,storage_type', [(np.full((NHRU, NMONTHS), 3, dtype=np.int32), ConstantStorage),
+                                               (np.arange(NHRU * NMONTHS, dtype=np.int32).reshape((NHRU, NMONTHS)) % 3,
+                                                DictionaryStorage),
+                                               (np.eye(NHRU, NMONTHS, dtype=np.float32), SparseStorage)])
+def test_encode(data, storage_type):
+    storage = encode(data)
+
+    assert isinstance(storage, storage_type)
+    assert storage.nbytes <= data.nbytes // 2
+    assert storage.shape == data.shape
+    assert storage.dtype == data.dtype
+
+    materialized = storage.materialize()
+    np.testing.assert_array_equal(materialized, data)
+    assert materialized.flags.f_contiguous
+
+    table, codes = storage.factorize()
+    np.testing.assert_array_equal(table[codes], data)
+    assert (storage.min(), storage.max()) == (data.min(), data.max())
+    np.testing.assert_array_equal(storage.unique(), np.unique(data))
+
+    values, counts = storage.value_counts()
+    assert counts.sum() == data.size
+    assert counts[values == data[0, 0]].sum() == (data == data[0, 0]).sum()
+
+
+@pytest.mark.parametrize('data', [np.arange(10, dtype=np.float32),
+                                  np.arange(NHRU * NMONTHS, dtype=np.float32).reshape((NHRU, NMONTHS))])
+def test_encode_keeps_small_and_distinct_data(data):
+    assert encode(data) is data
+
+
+def test_patch():
+    base = np.arange(NHRU * NMONTHS, dtype=np.float32).reshape((NHRU, NMONTHS), order='F')
+    patch = PatchStorage(base, [0, 7], [-1.0, -2.0]).patch([7, 8], [-3.0, -4.0])
+
+    expected = base.copy(order='F')
+    expected.ravel(order='K')[[0, 7, 8]] = [-1.0, -3.0, -4.0]
+    np.testing.assert_array_equal(patch.materialize(), expected)
+
+    # The base is shared and not changed
+    assert base[0, 0] == 0.0
+    assert patch.base is base
+
+
+def test_encode_parameter_set(pset):
+    pset.parameters.add('tmax_adj', datatype=2)
+    cparam = pset.parameters.get('tmax_adj')
+    cparam.dimensions.add('nhru', NHRU)
+    cparam.dimensions.add('nmonths', NMONTHS)
+    cparam.data = np.zeros((NHRU, NMONTHS), dtype=np.float32, order='F')
+
+    saved = pset.encode()
+    assert saved == NHRU * NMONTHS * 4 - cparam.nbytes
+    assert isinstance(cparam.storage, ConstantStorage)
+
+    # Small parameters are not encoded
+    assert not pset.parameters.get('nhm_id').is_compact
+
+
+def test_read_with_compact_encoding(tmpdir):
+    data = np.zeros((NHRU, NMONTHS))
+    data[2, 3] = 5.0
+    pset = ParameterSet.from_arrays({'nhm_id': ('nhru', np.arange(1, NHRU + 1)),
+                                     'tmax_allsnow': (('nhru', 'nmonths'), data)})
+    filename = str(tmpdir.join('sparse.param'))
+    pset.write_parameter_file(filename)
+
+    use_compact_encoding()
+    try:
+        cparam = ParameterFile(filename, verbose=False).parameters.get('tmax_allsnow')
+    finally:
+        use_compact_encoding(False)
+
+    assert isinstance(cparam.storage, SparseStorage)
+    np.testing.assert_array_equal(cparam.values, data)
+    assert not ParameterFile(filename, verbose=False).parameters.get('tmax_allsnow').is_compact
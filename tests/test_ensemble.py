@@ -0,0 +1,124 @@
+from __future__ import (absolute_import, division, print_function)
+
+import sys
+
+import numpy as np
+import pytest
+
+from pyPRMS.EnsembleSampler import EnsembleSampler, sample_unit
+from pyPRMS.ParameterSet import ParameterSet
+
+
+@pytest.fixture
+def pset():
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', [10, 20, 30, 40]),
+                                     'hru_area': ('nhru', [1.0, 2.0, 3.0, 4.0]),
+                                     'jh_coef': (('nhru', 'nmonths'), np.full((4, 12), 0.014)),
+                                     'tmax_allsnow': (('nhru', 'nmonths'), np.full((4, 12), 32.0))})
+
+
+@pytest.mark.parametrize('design', ['lhs', 'uniform'])
+def test_sample_unit(design):
+    unit = sample_unit(50, 3, design=design, rng=1)
+
+    assert unit.shape == (50, 3)
+    assert (unit >= 0.0).all() and (unit < 1.0).all()
+
+
+def test_lhs_strata():
+    unit = sample_unit(20, 4, design='lhs', rng=1)
+
+    # Each column has exactly one sample in each of the 20 strata
+    for col in range(4):
+        assert sorted(np.floor(unit[:, col] * 20).astype(int).tolist()) == list(range(20))
+
+
+def test_sobol():
+    pytest.importorskip('scipy')
+    unit = sample_unit(16, 2, design='sobol', rng=1)
+
+    assert unit.shape == (16, 2)
+    assert (unit >= 0.0).all() and (unit < 1.0).all()
+
+
+def test_sobol_requires_scipy(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'scipy.stats', None)
+
+    with pytest.raises(ImportError):
+        sample_unit(16, 2, design='sobol')
+
+
+def test_invalid_design():
+    with pytest.raises(ValueError):
+        sample_unit(16, 2, design='grid')
+
+
+def test_sample_bounds(pset):
+    sampler = EnsembleSampler(pset, seed=1)
+    sampler.add('jh_coef', lower=0.01, upper=0.02)
+    sampler.add('tmax_allsnow', method='offset', lower=-2.0, upper=2.0, groups=['a', 'b', 'a', None])
+
+    samples = sampler.sample(25)
+    assert samples.shape == (25, 3)
+    assert sampler.factors == [('jh_coef', None), ('tmax_allsnow', 'a'), ('tmax_allsnow', 'b')]
+    assert ((samples[:, 0] >= 0.01) & (samples[:, 0] < 0.02)).all()
+    assert ((samples[:, 1:] >= -2.0) & (samples[:, 1:] < 2.0)).all()
+
+
+def test_seed(pset):
+    def draw(seed):
+        sampler = EnsembleSampler(pset, seed=seed)
+        sampler.add('jh_coef')
+        return sampler.sample(10)
+
+    np.testing.assert_array_equal(draw(5), draw(5))
+    assert not np.array_equal(draw(5), draw(6))
+
+
+def test_member_values(pset):
+    sampler = EnsembleSampler(pset, seed=1)
+    sampler.add('hru_area', method='scale', lower=0.5, upper=2.0, groups=['a', None, 'a', 'b'])
+    sampler.add('jh_coef', method='offset', lower=1.5, upper=2.0)
+    samples = sampler.sample(4)
+
+    values = sampler.member_values('hru_area', [2])[0]
+    assert values.dtype == np.float32
+    np.testing.assert_allclose(values, np.array([1.0, 2.0, 3.0, 4.0]) * samples[2, [0, 0, 0, 1]] ** [1, 0, 1, 1],
+                               rtol=1e-6)
+
+    # Offsets are clipped to the valid range of jh_coef (-0.5 to 1.5)
+    assert (sampler.member_values('jh_coef', slice(None)) == np.float32(1.5)).all()
+
+
+def test_add_errors(pset):
+    sampler = EnsembleSampler(pset)
+    pset.parameters.add('my_param', datatype=2)
+
+    for kwargs in [dict(name='hru_area', method='shift'), dict(name='hru_area', method='scale'),
+                   dict(name='hru_area', lower=2.0, upper=1.0), dict(name='my_param', lower=0.0, upper=1.0),
+                   dict(name='hru_area', groups=['a', 'b']), dict(name='hru_area', groups=[None] * 4)]:
+        with pytest.raises(ValueError):
+            sampler.add(**kwargs)
+
+    with pytest.raises(ValueError):
+        sampler.member_values('hru_area', [0])
+
+
+def test_write_serial_and_parallel(pset, tmpdir):
+    sampler = EnsembleSampler(pset, seed=1)
+    sampler.add('jh_coef', groups=['a', 'b', 'a', 'b'])
+    sampler.add('hru_area', method='scale', lower=0.5, upper=2.0)
+    sampler.sample(20)
+
+    serial = sampler.write_parameter_files(str(tmpdir.mkdir('serial')), max_workers=1)
+    parallel = sampler.write_parameter_files(str(tmpdir.mkdir('parallel')), max_workers=2)
+    assert len(serial) == 20
+
+    filename = str(tmpdir.join('member.param'))
+    for ii in [0, 17]:
+        sampler.member(ii).write_parameter_file(filename)
+
+        with open(filename) as f1, open(serial[ii]) as f2, open(parallel[ii]) as f3:
+            expected = f1.read()
+            assert f2.read() == expected
+            assert f3.read() == expected
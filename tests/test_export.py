@@ -0,0 +1,95 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.ParamStorage import BroadcastStorage, DictionaryStorage
+
+NHRU = 6
+NMONTHS = 12
+
+
+@pytest.fixture
+def pset():
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', np.arange(1, NHRU + 1) * 10),
+                                     'nhm_seg': ('nsegment', [100, 200]),
+                                     'hru_area': ('nhru', np.linspace(1.5, 9.0, NHRU)),
+                                     'seg_length': ('nsegment', [5.0, 6.0]),
+                                     'tmax_allsnow': (('nhru', 'nmonths'),
+                                                      np.arange(NHRU * NMONTHS, dtype=np.float64).
+                                                      reshape((NHRU, NMONTHS)) / 8.0)},
+                                    dimensions={'nhru': NHRU, 'nsegment': 2, 'nmonths': NMONTHS})
+
+
+def test_to_xarray(pset):
+    pytest.importorskip('xarray')
+    ds = pset.to_xarray()
+
+    assert sorted(ds.data_vars) == ['hru_area', 'seg_length', 'tmax_allsnow']
+    assert sorted(ds.coords) == ['nhm_id', 'nhm_seg']
+    assert ds['tmax_allsnow'].dims == ('nhru', 'nmonths')
+    assert ds['hru_area'].attrs['units'] == pset.parameters.get('hru_area').units
+
+    # Numpy arrays are shared, read-only
+    assert np.shares_memory(ds['hru_area'].values, pset.parameters.get('hru_area').storage)
+    assert not ds['hru_area'].values.flags.writeable
+
+    assert ds.swap_dims(nhru='nhm_id')['hru_area'].sel(nhm_id=30).item() == pytest.approx(4.5)
+    assert ds.swap_dims(nsegment='nhm_seg')['seg_length'].sel(nhm_seg=200).item() == 6.0
+
+
+def test_to_xarray_compact(pset):
+    pytest.importorskip('xarray')
+    storage = BroadcastStorage(np.arange(NMONTHS, dtype=np.float32).reshape((1, NMONTHS)), (NHRU, NMONTHS))
+    pset.parameters.get('tmax_allsnow').data = storage
+    pset.parameters.get('hru_area').data = DictionaryStorage(np.array([1.0, 2.0], dtype=np.float32),
+                                                             np.array([0, 1, 1, 0, 0, 1], dtype=np.uint8))
+    ds = pset.to_xarray()
+
+    # Broadcast storage is shared; other compact storage is expanded
+    assert np.shares_memory(ds['tmax_allsnow'].values, storage.source)
+    assert ds['tmax_allsnow'].values[3].tolist() == list(range(NMONTHS))
+    assert ds['hru_area'].values.tolist() == [1.0, 2.0, 2.0, 1.0, 1.0, 2.0]
+
+
+def test_to_xarray_without_ids(pset):
+    pytest.importorskip('xarray')
+    pset.parameters.remove(['nhm_id', 'nhm_seg'])
+    pset.parameters.add('my_param', datatype=2)
+    ds = pset.to_xarray()
+
+    # Parameters without data are left out
+    assert sorted(ds.data_vars) == ['hru_area', 'seg_length', 'tmax_allsnow']
+    assert len(ds.coords) == 0
+
+
+def test_dataframe_by_dimension(pset):
+    df = pset.parameters.get_dataframe_by_dimension('nhru')
+
+    assert df.index.name == 'nhm_id'
+    assert df.index.tolist() == [10, 20, 30, 40, 50, 60]
+    assert df.columns.tolist() == ['hru_area'] + ['tmax_allsnow_{}'.format(ii) for ii in range(1, 13)]
+    assert df.loc[20, 'tmax_allsnow_3'] == pset.parameters.get('tmax_allsnow').values[1, 2]
+
+    df = pset.parameters.get_dataframe_by_dimension('nsegment', names=['seg_length'])
+    assert df.to_dict() == {'seg_length': {100: 5.0, 200: 6.0}}
+
+
+def test_dataframe_by_dimension_without_ids(pset):
+    pset.parameters.remove('nhm_id')
+    df = pset.parameters.get_dataframe_by_dimension('nhru', names=['hru_area'])
+
+    assert df.index.name == 'hru'
+    assert df.index.tolist() == list(range(1, NHRU + 1))
+
+    with pytest.raises(ValueError):
+        pset.parameters.get_dataframe_by_dimension('ncascade')
+
+
+def test_get_dataframe(pset):
+    df = pset.parameters.get_dataframe('tmax_allsnow')
+
+    assert df.index.tolist() == [10, 20, 30, 40, 50, 60]
+    assert df.shape == (NHRU, NMONTHS)
+    assert pset.parameters.get_dataframe('seg_length').index.tolist() == [100, 200]
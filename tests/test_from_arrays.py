@@ -0,0 +1,95 @@
+from __future__ import (absolute_import, division, print_function)
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterSet import ParameterSet
+
+
+def test_metadata_from_master_parameters():
+    pset = ParameterSet.from_arrays({'hru_area': ('nhru', [1.0, 2.0]),
+                                     'tmax_allsnow': (('nhru', 'nmonths'), np.zeros((2, 12)))})
+
+    assert pset.parameters.get('hru_area').meta is pset.master_parameters['hru_area'].meta
+    assert pset.parameters.get('hru_area').units == 'acres'
+    assert pset.parameters.get('hru_area').values.dtype == np.float32
+    assert list(pset.dimensions.keys()) == ['nhru', 'nmonths']
+    assert pset.dimensions.get('nmonths').size == 12
+
+
+@pytest.mark.parametrize('data,datatype', [(np.arange(3), 1),
+                                           (np.zeros(3, dtype=np.float32), 2),
+                                           (np.zeros(3), 3),
+                                           (np.array(['a', 'b', 'c']), 4),
+                                           (np.array([True, False, True]), 1)])
+def test_infer_datatype(data, datatype):
+    pset = ParameterSet.from_arrays({'my_param': ('nhru', data)}, verify=False)
+
+    assert pset.parameters.get('my_param').datatype == datatype
+
+
+def test_given_datatype_takes_precedence():
+    pset = ParameterSet.from_arrays({'my_param': ('nhru', np.zeros(3), 2),
+                                     'hru_area': ('nhru', np.zeros(3), 3)}, verify=False)
+    assert pset.parameters.get('my_param').values.dtype == np.float32
+    assert pset.parameters.get('hru_area').values.dtype == np.float64
+
+    pset = ParameterSet.from_arrays({'hru_area': ('nhru', np.zeros(3), 3)})
+    assert pset.parameters.get('hru_area').datatype == 3
+
+
+def test_global_dimensions():
+    pset = ParameterSet.from_arrays({'hru_area': ('nhru', [1.0, 2.0])},
+                                    dimensions=OrderedDict([('nhru', 2), ('nsegment', 5)]))
+
+    assert pset.dimensions.get('nsegment').size == 5
+
+
+def test_copy():
+    data = np.array([1.0, 2.0], dtype=np.float32)
+    pset = ParameterSet.from_arrays({'hru_area': ('nhru', data)})
+    cparam = pset.parameters.get('hru_area')
+
+    data[0] = 100.0
+    assert cparam.values.tolist() == [1.0, 2.0]
+    assert not cparam.storage.flags.writeable
+    assert data.flags.writeable
+
+
+def test_no_copy():
+    data = np.array([1.0, 2.0], dtype=np.float32)
+    pset = ParameterSet.from_arrays({'hru_area': ('nhru', data)}, copy=False)
+    cparam = pset.parameters.get('hru_area')
+
+    assert cparam.storage is data
+    data[0] = 100.0
+    assert cparam.values.tolist() == [100.0, 2.0]
+    assert cparam.stats().maximum == 100.0
+    assert data.flags.writeable
+
+
+def test_lists_are_stored_read_only():
+    pset = ParameterSet.from_arrays({'hru_area': ('nhru', [1.0, 2.0], 3)}, copy=False)
+
+    assert not pset.parameters.get('hru_area').storage.flags.writeable
+
+
+@pytest.mark.parametrize('arrays,dimensions', [({'not_a_param': ('nhru', [1.0])}, None),
+                                               ({'hru_area': ('nhru', [1.0, 2.0])}, {'nsegment': 2}),
+                                               ({'hru_area': ('nhru', [1.0, 2.0])}, {'nhru': 3}),
+                                               ({'hru_area': (('nhru', 'nmonths'), [1.0, 2.0])}, None),
+                                               ({'hru_area': ('nhru', [1.0, 2.0]),
+                                                 'hru_aspect': ('nhru', [1.0, 2.0, 3.0])}, None)])
+def test_invalid_arrays(arrays, dimensions):
+    with pytest.raises(ValueError):
+        ParameterSet.from_arrays(arrays, dimensions=dimensions)
+
+
+def test_invalid_datatype():
+    with pytest.raises(TypeError):
+        ParameterSet.from_arrays({'my_param': ('nhru', np.zeros(3, dtype=np.complex64))}, verify=False)
+
+    with pytest.raises(TypeError):
+        ParameterSet.from_arrays({'nhm_id': ('nhru', [1.5, 2.5])})
@@ -0,0 +1,100 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.Grouping import Grouping
+from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.param_stats import grouped_statistics
+
+NMONTHS = 12
+
+
+@pytest.fixture
+def pset():
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', [10, 20, 30, 40, 50]),
+                                     'hru_type': ('nhru', [1, 2, 1, 1, 0]),
+                                     'hru_segment': ('nhru', [1, 1, 2, 2, 2]),
+                                     'hru_area': ('nhru', [1.0, 2.0, 3.0, np.nan, 5.0]),
+                                     'gwflow_coef': ('ngw', [0.1, 0.2, 0.3, 0.4, 0.5]),
+                                     'tmax_allsnow': (('nhru', 'nmonths'),
+                                                      np.arange(5 * NMONTHS, dtype=np.float64).reshape((5, NMONTHS))),
+                                     'poi_gage_id': ('npoigages', ['01234567']),
+                                     'seg_length': ('nsegment', [5.0, 6.0])},
+                                    dimensions={'nhru': 5, 'ngw': 5, 'nsegment': 2, 'nmonths': NMONTHS,
+                                                'npoigages': 1})
+
+
+def test_from_parameter(pset):
+    grouping = pset.grouping('hru_type')
+
+    assert grouping.labels == [0, 1, 2]
+    assert grouping.codes.tolist() == [1, 2, 1, 1, 0]
+    assert grouping.counts.tolist() == [1, 3, 1]
+    assert grouping.members(1).tolist() == [0, 2, 3]
+    assert not grouping.codes.flags.writeable
+
+    with pytest.raises(ValueError):
+        pset.grouping('tmax_allsnow')
+
+
+def test_from_mapping(pset):
+    grouping = pset.grouping({10: 'b', 40: 'a', 50: 'a'})
+
+    assert grouping.labels == ['a', 'b']
+    assert grouping.codes.tolist() == [1, -1, -1, 0, 0]
+    assert grouping.applies_to('nssr') and not grouping.applies_to('nsegment')
+
+    with pytest.raises(ValueError):
+        pset.grouping({60: 'a'})
+
+    # Local ids are used without nhm_seg
+    segments = pset.grouping({2: 'x'}, dimension='nsegment')
+    assert segments.codes.tolist() == [-1, 0]
+
+
+def test_invalid_codes():
+    with pytest.raises(ValueError):
+        Grouping([0, 2], ['a', 'b'])
+
+
+def test_group_statistics(pset):
+    report = pset.group_statistics('hru_segment', stats=('mean', 'sum', 'min', 'max', 'count'))
+
+    assert report.index.tolist() == [1, 2]
+    assert report['mean'].columns.tolist() == (['hru_type', 'hru_segment', 'hru_area', 'gwflow_coef'] +
+                                               ['tmax_allsnow_{}'.format(ii) for ii in range(1, NMONTHS + 1)])
+
+    # NaN values are ignored
+    assert report['mean', 'hru_area'].tolist() == [1.5, 4.0]
+    assert report['count', 'hru_area'].tolist() == [2, 2]
+    assert report['sum', 'gwflow_coef'].tolist() == pytest.approx([0.3, 1.2])
+    assert report['max', 'tmax_allsnow_2'].tolist() == [13.0, 49.0]
+    assert report['min', 'hru_type'].tolist() == [1, 0]
+
+
+def test_weighted_mean(pset):
+    report = pset.group_statistics(pset.grouping({10: 'a', 20: 'a', 30: 'b'}), names=['tmax_allsnow'],
+                                   weights=np.array([1.0, 3.0, 1.0, 1.0, 1.0]))
+
+    # HRUs 40 and 50 are not in a group
+    assert report['mean', 'tmax_allsnow_1'].tolist() == [9.0, 24.0]
+
+
+def test_group_statistics_errors(pset):
+    with pytest.raises(ValueError):
+        pset.group_statistics('hru_type', names=['poi_gage_id'])
+
+    with pytest.raises(ValueError):
+        pset.group_statistics('hru_type', names=['seg_length'])
+
+    with pytest.raises(ValueError):
+        pset.group_statistics('hru_type', stats=['median'])
+
+
+def test_grouped_statistics_of_empty_group():
+    results = grouped_statistics(np.array([0, 0, 2]), 3, np.array([[1.0], [3.0], [5.0]]), stats=['mean', 'count'])
+
+    assert results['mean'][:, 0].tolist()[0::2] == [2.0, 5.0]
+    assert np.isnan(results['mean'][1, 0])
+    assert results['count'][:, 0].tolist() == [2, 0, 1]
@@ -0,0 +1,38 @@
+from __future__ import (absolute_import, division, print_function)
+
+import subprocess
+import sys
+
+import pytest
+
+
+def _imported(modules):
+    """Get the heavy dependencies which are imported with the given pyPRMS modules in a new interpreter."""
+
+    script = ('import sys\n'
+              'import {}\n'
+              'print(" ".join([mm for mm in ["netCDF4", "xarray", "pandas"] if mm in sys.modules]))\n').format(
+        ', '.join(modules))
+    return subprocess.check_output([sys.executable, '-c', script], universal_newlines=True).split()
+
+
+@pytest.mark.parametrize('modules', [['pyPRMS'],
+                                     ['pyPRMS.ParameterFile', 'pyPRMS.ControlFile', 'pyPRMS.ValidParams'],
+                                     ['pyPRMS.ParamDb', 'pyPRMS.ParamDbRegion']])
+def test_import_defers_heavy_dependencies(modules):
+    assert _imported(modules) == []
+
+
+def test_reading_a_parameter_file_does_not_import_pandas(tmpdir):
+    filename = str(tmpdir.join('test.param'))
+
+    with open(filename, 'w') as fh:
+        fh.write('Written by test\n** Dimensions **\n####\nnhru\n2\n** Parameters **\n'
+                 '####\nhru_area\n1\nnhru\n2\n2\n1.5\n2.5\n')
+
+    script = ('import sys\n'
+              'from pyPRMS.ParameterFile import ParameterFile\n'
+              'pfile = ParameterFile({!r}, verbose=False)\n'
+              'assert pfile.parameters.get("hru_area").values.tolist() == [1.5, 2.5]\n'
+              'print("pandas" in sys.modules)\n').format(filename)
+    assert subprocess.check_output([sys.executable, '-c', script], universal_newlines=True).strip() == 'False'
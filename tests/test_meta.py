@@ -0,0 +1,37 @@
+from __future__ import (absolute_import, division, print_function)
+
+from pyPRMS.Parameters import Parameter, make_meta
+
+
+def test_identical_metadata_is_shared():
+    meta = make_meta(datatype=2, units='mm', description='A parameter')
+
+    assert make_meta(datatype=2, units='mm', description='A parameter') is meta
+    assert Parameter(name='one', datatype=2, units='mm', description='A parameter').meta is meta
+    assert Parameter(name='two', meta=meta).meta is meta
+
+
+def test_changed_metadata_is_shared():
+    p1 = Parameter(name='one', datatype=2, units='mm')
+    p2 = Parameter(name='two', datatype=2, units='mm')
+    meta = p1.meta
+
+    p1.units = 'inches'
+    p2.units = 'inches'
+    assert p1.meta is not meta
+    assert p1.meta is p2.meta
+    assert p1.meta is make_meta(datatype=2, units='inches')
+
+    # Setting the same value keeps the record
+    p1.units = 'inches'
+    assert p1.meta is p2.meta
+    assert meta.units == 'mm'
+
+
+def test_values_are_converted():
+    meta = make_meta(datatype=1, minimum='0', maximum='bounded', default='3', modules=['a', 'b'])
+
+    assert meta.minimum == 0
+    assert meta.maximum == 'bounded'
+    assert meta.default == 3
+    assert meta.modules == ('a', 'b')
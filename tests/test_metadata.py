@@ -0,0 +1,81 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+import pickle
+
+import pytest
+
+from pyPRMS import metadata
+from pyPRMS.Parameters import make_meta
+from pyPRMS.ValidParams import ValidParams
+
+
+@pytest.fixture
+def fresh_registry():
+    metadata.clear_registry()
+    yield
+    metadata.clear_registry()
+
+
+def test_registry_is_compiled_once(fresh_registry, monkeypatch):
+    calls = []
+    compile_all = metadata._compile
+    monkeypatch.setattr(metadata, '_compile', lambda: calls.append(1) or compile_all())
+
+    registry = metadata.get_registry()
+    assert metadata.get_registry() is registry
+    assert ValidParams().get('tmax_allsnow').meta is registry.parameters['tmax_allsnow'].meta
+    assert len(calls) == 1
+
+    metadata.clear_registry()
+    assert metadata.get_registry() is not registry
+    assert len(calls) == 2
+
+
+def test_registry_is_read_only():
+    registry = metadata.get_registry()
+
+    with pytest.raises(TypeError):
+        registry.parameters['my_param'] = None
+
+
+def test_registry_contents():
+    registry = metadata.get_registry()
+
+    assert registry.dims_by_param['tmax_allsnow'] == ('nhru', 'nmonths')
+    assert 'den_init' in registry.params_by_module['snowcomp']
+    assert registry.parameters['tmax_allsnow'].meta.datatype == 2
+    assert registry.variables['dprst_area_max'].units == 'acres'
+    assert 'nhru' in registry.dimensions
+    assert registry.control['start_time'].datatype == 1
+
+    # The records are shared with other parameters with the same metadata
+    meta = registry.parameters['tmax_allsnow'].meta
+    assert make_meta(**meta._asdict()) is meta
+
+
+def test_pickle_cache(fresh_registry, monkeypatch, tmpdir):
+    monkeypatch.setenv(metadata.CACHE_ENV, str(tmpdir))
+    registry = metadata.get_registry()
+
+    filename = metadata._cache_filename(str(tmpdir))
+    assert os.path.isfile(filename)
+
+    # A new process (or a cleared registry) loads the cache instead of compiling
+    metadata.clear_registry()
+    monkeypatch.setattr(metadata, '_compile', lambda: pytest.fail('The XML files were compiled again'))
+    cached = metadata.get_registry()
+
+    assert cached is not registry
+    assert sorted(cached.parameters.keys()) == sorted(registry.parameters.keys())
+    assert cached.parameters['tmax_allsnow'].meta is registry.parameters['tmax_allsnow'].meta
+
+
+def test_stale_cache_is_ignored(fresh_registry, monkeypatch, tmpdir):
+    monkeypatch.setenv(metadata.CACHE_ENV, str(tmpdir))
+
+    with open(metadata._cache_filename(str(tmpdir)), 'wb') as fh:
+        pickle.dump({'version': ('0.0', 0)}, fh)
+
+    assert 'tmax_allsnow' in metadata.get_registry().parameters
+
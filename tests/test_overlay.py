@@ -0,0 +1,89 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.ParamStorage import PatchStorage
+
+
+@pytest.fixture
+def base():
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', [10, 20, 30]),
+                                     'hru_area': ('nhru', [1.0, 2.0, 3.0]),
+                                     'tmax_allsnow': (('nhru', 'nmonths'), np.full((3, 12), 32.0))})
+
+
+def test_shares_data(base):
+    overlay = base.overlay()
+
+    assert overlay.changed == []
+    assert overlay.nbytes == 0
+    for cparam in overlay.parameters.values():
+        assert np.shares_memory(cparam.storage, base.parameters.get(cparam.name).storage)
+
+
+def test_shares_writeable_data(base):
+    base.parameters.get('hru_area').data[0] = 1.5
+    overlay = base.overlay()
+
+    assert overlay.changed == []
+    assert np.shares_memory(overlay.parameters.get('hru_area').storage, base.parameters.get('hru_area').storage)
+    assert base.parameters.get('hru_area').storage.flags.writeable
+
+
+def test_update_all_values(base):
+    overlay = base.overlay()
+    overlay.update_values('hru_area', 5.0)
+
+    assert overlay.changed == ['hru_area']
+    assert overlay.parameters.get('hru_area').values.tolist() == [5.0, 5.0, 5.0]
+    assert base.parameters.get('hru_area').values.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_update_some_values(base):
+    overlay = base.overlay()
+    overlay.update_values('tmax_allsnow', 30.0, hrus=[20])
+
+    cparam = overlay.parameters.get('tmax_allsnow')
+    assert isinstance(cparam.storage, PatchStorage)
+    assert overlay.changed == ['tmax_allsnow']
+    assert (cparam.values[1, :] == 30.0).all()
+    assert (cparam.values[[0, 2], :] == 32.0).all()
+    assert (base.parameters.get('tmax_allsnow').values == 32.0).all()
+
+    # Further changes are added to the same patch
+    overlay.update_values('tmax_allsnow', 31.0, hrus=[30])
+    assert isinstance(cparam.storage, PatchStorage)
+    assert cparam.values[:, 0].tolist() == [32.0, 30.0, 31.0]
+
+
+def test_in_place_edit_is_copied(base):
+    overlay = base.overlay()
+    overlay.parameters.get('hru_area').data[0] = 100.0
+
+    assert overlay.changed == ['hru_area']
+    assert overlay.parameters.get('hru_area').values[0] == 100.0
+    assert base.parameters.get('hru_area').values[0] == 1.0
+
+
+def test_changed_metadata_and_dimensions(base):
+    overlay = base.overlay()
+    overlay.parameters.get('hru_area').units = 'km2'
+    overlay.parameters.add('jh_coef')
+
+    assert overlay.changed == ['hru_area', 'jh_coef']
+    assert base.parameters.get('hru_area').units == 'acres'
+
+
+def test_reset(base):
+    overlay = base.overlay()
+    overlay.update_values('hru_area', 5.0)
+    overlay.update_values('tmax_allsnow', 30.0, hrus=[20])
+
+    overlay.reset('hru_area')
+    assert overlay.changed == ['tmax_allsnow']
+
+    overlay.reset()
+    assert overlay.changed == []
+    assert overlay.parameters.get('tmax_allsnow').values[1, 0] == 32.0
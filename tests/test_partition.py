@@ -0,0 +1,127 @@
+from __future__ import (absolute_import, division, print_function)
+
+import os
+
+import numpy as np
+import pytest
+
+from pyPRMS.NetworkPartition import segment_outlets
+from pyPRMS.ParameterFile import ParameterFile
+from pyPRMS.ParameterSet import ParameterSet
+
+
+def _network(tosegment, hru_segment, pois=None):
+    arrays = {'nhm_id': ('nhru', np.arange(1, len(hru_segment) + 1) * 10),
+              'nhm_seg': ('nsegment', np.arange(1, len(tosegment) + 1) * 100),
+              'hru_area': ('nhru', np.arange(1, len(hru_segment) + 1, dtype=np.float64)),
+              'hru_segment': ('nhru', hru_segment),
+              'tosegment': ('nsegment', tosegment)}
+    if pois is not None:
+        arrays['poi_gage_segment'] = ('npoigages', pois)
+        arrays['poi_gage_id'] = ('npoigages', ['{:08d}'.format(ii + 1) for ii in range(len(pois))])
+    return ParameterSet.from_arrays(arrays)
+
+
+@pytest.fixture
+def watersheds():
+    """Three watersheds: 1 -> 2 -> 3 <- 4; 5 -> 6 <- 7; and 8, with two HRUs on each segment."""
+
+    return _network([2, 3, 0, 3, 6, 0, 6, 0], np.repeat(np.arange(1, 9), 2), pois=[3, 6, 0])
+
+
+@pytest.fixture
+def chain():
+    """A single flow path 1 -> 2 -> 3 -> 4 with one HRU on each segment."""
+
+    return _network([2, 3, 4, 0], [1, 2, 3, 4])
+
+
+def test_segment_outlets():
+    outlets, depth = segment_outlets([2, 3, 0, 3, 0, -1])
+
+    assert outlets.tolist() == [2, 2, 2, 2, 4, 5]
+    assert depth.tolist() == [2, 1, 0, 1, 0, 0]
+
+
+def test_segment_outlets_long_path():
+    nseg = 1000
+    outlets, depth = segment_outlets(np.append(np.arange(2, nseg + 1), 0))
+
+    assert (outlets == nseg - 1).all()
+    assert depth.tolist() == list(range(nseg - 1, -1, -1))
+
+
+@pytest.mark.parametrize('tosegment', [[2, 1], [2, 3, 2, 0], [1]])
+def test_segment_outlets_cycle(tosegment):
+    with pytest.raises(ValueError, match='cycle'):
+        segment_outlets(tosegment)
+
+
+def test_segment_outlets_invalid_segment():
+    with pytest.raises(ValueError, match='do not exist'):
+        segment_outlets([2, 5, 0])
+
+
+def test_balance(watersheds):
+    part = watersheds.partition(2, granularity=1)
+
+    # Whole watersheds of 8, 6, and 2 HRUs
+    assert sorted(part.costs.tolist()) == [8.0, 8.0]
+    assert part.segment_partition.tolist() == [0, 0, 0, 0, 1, 1, 1, 1]
+    assert part.hru_partition.tolist() == np.repeat(part.segment_partition, 2).tolist()
+    assert part.boundaries.empty
+
+
+def test_balance_by_cost(watersheds):
+    part = watersheds.partition(2, cost='hru_area', granularity=4)
+
+    assert part.costs.sum() == pytest.approx(136.0)
+    assert abs(part.costs[0] - part.costs[1]) <= 31.0
+
+
+def test_members_and_pois(watersheds):
+    part = watersheds.partition(2, granularity=1)
+    hrus, segs, pois = part.members(1)
+
+    assert hrus.tolist() == list(range(90, 170, 10))
+    assert segs.tolist() == [500, 600, 700, 800]
+    assert pois.tolist() == [b'00000002']
+    assert part.poi_partition.tolist() == [0, 1, -1]
+
+    view = part.get(1)
+    assert view.parameters.get('tosegment').values.tolist() == [2, 0, 2, 0]
+    assert view.parameters.get('poi_gage_segment').values.tolist() == [2]
+
+
+def test_boundaries(chain):
+    part = chain.partition(2, granularity=1)
+
+    assert part.segment_partition.tolist() == [0, 0, 1, 1]
+    assert part.boundaries.to_dict('records') == [{'nhm_seg': 200, 'partition': 0, 'local_seg': 2,
+                                                   'to_nhm_seg': 300, 'to_partition': 1, 'to_local_seg': 1}]
+
+    # The boundary segment is an outlet of its partition
+    assert part.get(0).parameters.get('tosegment').values.tolist() == [2, 0]
+
+
+def test_too_many_partitions(chain):
+    with pytest.raises(ValueError):
+        chain.partition(5, granularity=1)
+
+    with pytest.raises(ValueError):
+        chain.partition(2, cost=np.ones(3))
+
+
+def test_write_serial_and_parallel(watersheds, tmpdir):
+    part = watersheds.partition(3, granularity=2)
+
+    serial = part.write_parameter_files(str(tmpdir.mkdir('serial')), max_workers=1)
+    parallel = part.write_parameter_files(str(tmpdir.mkdir('parallel')), max_workers=2)
+
+    for pp in range(3):
+        with open(serial[pp]) as f1, open(parallel[pp]) as f2:
+            assert f1.read() == f2.read()
+
+        pfile = ParameterFile(serial[pp], verbose=False)
+        assert pfile.parameters.get('nhm_seg').values.tolist() == part.members(pp)[1].tolist()
+    assert os.path.exists(os.path.join(os.path.dirname(serial[0]), 'boundaries.csv'))
@@ -0,0 +1,56 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterFile import ParameterFile
+from pyPRMS.ParameterSet import ParameterSet, _format_values, _render_parameter
+
+
+@pytest.mark.parametrize('values,datatype,expected', [([0.1, 5.0, 1e-7, -0.0, 123456.78, np.nan], 2,
+                                                       ['0.1', '5.0', '0.0', '-0.0', '123456.78', 'nan']),
+                                                      ([0.1, 1.0 / 3.0, 1e10], 3, ['0.1', '0.333333', '10000000000.0']),
+                                                      ([1, -2], 1, ['1', '-2'])])
+def test_format_values(values, datatype, expected):
+    dtype = {1: np.int32, 2: np.float32, 3: np.float64}[datatype]
+    assert _format_values(np.array(values, dtype=dtype), datatype) == ['{}\n'.format(xx) for xx in expected]
+
+
+def test_format_strings():
+    assert _format_values(np.array([b'01234567', b'']), 4) == ['01234567\n', '\n']
+
+
+def test_float32_written_from_shortest_representation():
+    # The shortest representation of these values has fewer than six decimals
+    values = np.array([0.7, 1.1, 99.95, 1234.5677], dtype=np.float32)
+    assert _format_values(values, 2) == ['0.7\n', '1.1\n', '99.95\n', '1234.5677\n']
+
+
+def test_compact_and_full_storage_render_the_same():
+    data = np.full((6, 12), 0.1)
+    data[1, :] = np.nan
+    data[2, 5] = 2.75
+    pset = ParameterSet.from_arrays({'tmax_allsnow': (('nhru', 'nmonths'), data)}, verify=False)
+
+    cparam = pset.parameters.get('tmax_allsnow')
+    full = _render_parameter(cparam)
+    assert cparam.encode()
+    assert _render_parameter(cparam) == full
+
+    lines = full.splitlines()
+    assert lines[-72:][:4] == ['0.1', 'nan', '0.1', '0.1']
+    assert lines.count('2.75') == 1
+
+
+def test_rewrite_is_stable(tmpdir):
+    rng = np.random.RandomState(0)
+    data = (rng.random_sample(500) * 10.0 ** rng.randint(-7, 7, 500)).astype(np.float32)
+    pset = ParameterSet.from_arrays({'hru_area': ('nhru', data)})
+
+    filename = str(tmpdir.join('test.param'))
+    filename2 = str(tmpdir.join('test2.param'))
+    pset.write_parameter_file(filename)
+    ParameterFile(filename, verbose=False).write_parameter_file(filename2)
+
+    with open(filename) as f1, open(filename2) as f2:
+        assert f1.read() == f2.read()
@@ -0,0 +1,115 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.ParamStorage import DictionaryStorage
+
+NHRU = 6
+NMONTHS = 12
+
+
+@pytest.fixture
+def pset():
+    tmax_allsnow = np.arange(NHRU * NMONTHS, dtype=np.float64).reshape((NHRU, NMONTHS)) / 8.0
+    tmax_allsnow[1, 2] = np.nan
+
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', np.arange(1, NHRU + 1) * 10),
+                                     'hru_type': ('nhru', [1, 1, 2, 1, 0, 1]),
+                                     'hru_area': ('nhru', [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]),
+                                     'tmax_allsnow': (('nhru', 'nmonths'), tmax_allsnow),
+                                     'poi_gage_id': ('npoigages', ['01234567', '07654321', '01234567'])},
+                                    dimensions={'nhru': NHRU, 'nmonths': NMONTHS, 'npoigages': 3})
+
+
+def test_stats(pset):
+    stats = pset.parameters.get('hru_area').stats()
+
+    assert (stats.size, stats.nan_count, stats.unique_count) == (NHRU, 0, NHRU)
+    assert (stats.minimum, stats.maximum, stats.mean) == (1.0, 6.0, 3.5)
+    assert stats.std == pytest.approx(np.std(np.arange(1.0, 7.0)))
+    assert (stats.p25, stats.p50, stats.p75) == tuple(np.percentile(np.arange(1.0, 7.0), [25, 50, 75]))
+
+
+def test_stats_ignore_nan(pset):
+    data = pset.parameters.get('tmax_allsnow').values
+    stats = pset.parameters.get('tmax_allsnow').stats()
+
+    assert (stats.size, stats.nan_count, stats.unique_count) == (NHRU * NMONTHS, 1, NHRU * NMONTHS - 1)
+    assert stats.mean == pytest.approx(np.nanmean(data))
+    assert stats.p50 == pytest.approx(np.nanpercentile(data, 50))
+
+
+def test_stats_of_strings(pset):
+    stats = pset.parameters.get('poi_gage_id').stats()
+
+    assert (stats.size, stats.unique_count) == (3, 2)
+    assert stats.mean is None and stats.minimum is None
+
+
+def test_stats_of_compact_storage(pset):
+    cparam = pset.parameters.get('hru_type')
+    expected = cparam.stats()
+
+    cparam.data = DictionaryStorage(np.array([0, 1, 2], dtype=np.int32), np.array([1, 1, 2, 1, 0, 1], dtype=np.uint8))
+    assert cparam.stats() == expected
+    assert cparam.is_compact
+
+
+def test_stats_are_cached(pset):
+    cparam = pset.parameters.get('hru_area')
+    stats = cparam.stats()
+
+    assert cparam.stats() is stats
+    assert cparam.stats(refresh=True) is not stats
+
+    # Replacing the data clears the cache
+    cparam.data = np.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.0])
+    assert cparam.stats().mean == 1.0
+    assert cparam.unique().tolist() == [1.0]
+
+
+def test_describe(pset):
+    serial = pset.describe(parallel=False)
+    report = pset.describe(max_workers=2)
+
+    assert report.equals(serial)
+    assert report.index.tolist() == ['nhm_id', 'hru_type', 'hru_area', 'tmax_allsnow', 'poi_gage_id']
+    assert report.loc['hru_area', 'datatype'] == 2
+    assert report.loc['hru_area', 'maximum'] == 6.0
+    assert report.loc['tmax_allsnow', 'nan_count'] == 1
+
+    # Parameters without data are left out
+    pset.parameters.add('my_param', datatype=2)
+    assert 'my_param' not in pset.describe().index
+
+
+def test_fingerprint(pset):
+    other = ParameterSet.from_arrays({'hru_area': ('nhru', np.arange(1.0, NHRU + 1.0))})
+    cparam = pset.parameters.get('hru_area')
+
+    # The name and metadata of a parameter are not part of its fingerprint
+    assert cparam.fingerprint() == other.parameters.get('hru_area').fingerprint()
+    assert cparam.fingerprint() != pset.parameters.get('hru_type').fingerprint()
+
+    # Compact storage has the same fingerprint as the full array
+    fingerprint = pset.parameters.get('hru_type').fingerprint()
+    pset.parameters.get('hru_type').data = DictionaryStorage(np.array([0, 1, 2], dtype=np.int32),
+                                                             np.array([1, 1, 2, 1, 0, 1], dtype=np.uint8))
+    assert pset.parameters.get('hru_type').fingerprint() == fingerprint
+
+
+def test_fingerprint_changes(pset):
+    fingerprint = pset.fingerprint()
+    assert pset.fingerprint() == fingerprint
+
+    pset.parameters.get('hru_area').data = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 7.0])
+    assert pset.fingerprint() != fingerprint
+
+    pset.parameters.get('hru_area').data = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    assert pset.fingerprint() == fingerprint
+
+    # The dimensions are part of the fingerprint
+    pset.dimensions.get('npoigages').size = 4
+    assert pset.fingerprint() != fingerprint
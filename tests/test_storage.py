@@ -0,0 +1,221 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterFile import ParameterFile
+from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.ParamStorage import is_fortran_layout, storage_dtype
+
+NHRU = 6
+NSEG = 4
+NMONTHS = 12
+
+
+@pytest.fixture
+def pset():
+    """Small ParameterSet with integer, float, 2D, and string parameters."""
+
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', np.arange(1, NHRU + 1) * 10),
+                                     'nhm_seg': ('nsegment', np.arange(1, NSEG + 1) * 100),
+                                     'hru_segment': ('nhru', [1, 1, 2, 3, 4, 4]),
+                                     'tosegment': ('nsegment', [2, 3, 0, 3]),
+                                     'hru_area': ('nhru', np.linspace(1.5, 9.0, NHRU)),
+                                     'tmax_allsnow': (('nhru', 'nmonths'),
+                                                      np.arange(NHRU * NMONTHS, dtype=np.float64).
+                                                      reshape((NHRU, NMONTHS)) / 8.0),
+                                     'poi_gage_id': ('npoigages', ['01234567', '07654321'])},
+                                    dimensions={'nhru': NHRU, 'nsegment': NSEG, 'nmonths': NMONTHS,
+                                                'npoigages': 2})
+
+
+def _check_layout(cparam):
+    data = cparam.data
+    assert is_fortran_layout(data), cparam.name
+    assert data.dtype.kind == storage_dtype(cparam.datatype).kind, cparam.name
+    assert data.dtype.itemsize >= storage_dtype(cparam.datatype).itemsize, cparam.name
+
+
+def test_layout(pset):
+    for cparam in pset.parameters.values():
+        _check_layout(cparam)
+
+    assert pset.parameters['nhm_id'].data.dtype == np.int32
+    assert pset.parameters['hru_area'].data.dtype == np.float32
+    assert pset.validate()['layout_ok'].all()
+
+
+def test_layout_after_subset(pset):
+    cparam = pset.parameters['tmax_allsnow']
+    cparam.subset_by_index('nhru', [0, 2, 5])
+
+    assert cparam.data.shape == (3, NMONTHS)
+    _check_layout(cparam)
+
+
+def test_layout_of_view(pset):
+    view = pset.view(hrus=[30, 40], segs=[200, 300])
+
+    for cparam in view.parameters.values():
+        _check_layout(cparam)
+
+    # Renumbered segment indices keep the integer storage dtype
+    assert view.parameters['hru_segment'].data.tolist() == [1, 2]
+    assert view.parameters['tosegment'].data.tolist() == [2, 0]
+    assert view.parameters['tosegment'].data.dtype == np.int32
+
+
+def test_layout_after_read(pset, tmpdir):
+    filename = str(tmpdir.join('test.param'))
+    pset.write_parameter_file(filename)
+
+    for cparam in ParameterFile(filename, verbose=False).parameters.values():
+        _check_layout(cparam)
+
+
+def test_round_trip(pset, tmpdir):
+    filename = str(tmpdir.join('test.param'))
+    pset.write_parameter_file(filename)
+    pfile = ParameterFile(filename, verbose=False)
+
+    assert list(pfile.parameters.keys()) == list(pset.parameters.keys())
+    assert pfile.fingerprint() == pset.fingerprint()
+
+    for cparam in pset.parameters.values():
+        np.testing.assert_array_equal(pfile.parameters[cparam.name].data, cparam.data)
+
+    # Writing what was read gives the same file
+    filename2 = str(tmpdir.join('test2.param'))
+    pfile.write_parameter_file(filename2)
+
+    with open(filename) as f1, open(filename2) as f2:
+        assert f1.read() == f2.read()
+
+
+def test_round_trip_compact(pset, tmpdir):
+    pset.parameters['tmax_allsnow'].data = np.full((NHRU, NMONTHS), 2.5)
+    pset.encode()
+    assert pset.parameters['tmax_allsnow'].is_compact
+
+    filename = str(tmpdir.join('test.param'))
+    pset.write_parameter_file(filename)
+
+    np.testing.assert_array_equal(ParameterFile(filename, verbose=False).parameters['tmax_allsnow'].data,
+                                  np.full((NHRU, NMONTHS), 2.5, dtype=np.float32))
+
+
+def test_round_trip_template(pset, tmpdir):
+    template = pset.file_template()
+
+    filename = str(tmpdir.join('test.param'))
+    filename2 = str(tmpdir.join('test2.param'))
+    pset.write_parameter_file(filename)
+    template.write(pset, filename2)
+
+    with open(filename) as f1, open(filename2) as f2:
+        assert f1.read() == f2.read()
+
+
+def test_caller_array_is_not_modified(pset):
+    data = np.linspace(1.0, 2.0, NHRU, dtype=np.float32)
+    pset.parameters['hru_area'].data = data
+
+    assert data.flags.writeable
+    data[0] = 100.0
+    assert pset.parameters['hru_area'].values[0] == 100.0
+
+
+def test_in_place_edit(pset):
+    cparam = pset.parameters['tmax_allsnow']
+    assert not cparam.values.flags.writeable
+
+    cparam.data[2, 3] = -1.0
+    cparam.data[2, 4] = -2.0
+    assert cparam.values[2, 3] == -1.0
+    assert cparam.values[2, 4] == -2.0
+    _check_layout(cparam)
+
+
+def test_in_place_edit_of_compact_storage(pset):
+    cparam = pset.parameters['tmax_allsnow']
+    cparam.data = np.full((NHRU, NMONTHS), 2.5)
+    assert cparam.encode()
+
+    cparam.data[0, 0] = 1.0
+    assert not cparam.is_compact
+    assert cparam.values[0, 0] == 1.0
+    assert cparam.values[0, 1] == 2.5
+
+
+def test_skip_unchanged_after_in_place_edit(pset, tmpdir):
+    filename = str(tmpdir.join('test.param'))
+
+    assert pset.write_parameter_file(filename, skip_unchanged=True)
+    assert not pset.write_parameter_file(filename, skip_unchanged=True)
+
+    pset.parameters['hru_area'].data[0] = 100.0
+    assert pset.write_parameter_file(filename, skip_unchanged=True)
+    assert ParameterFile(filename, verbose=False).parameters['hru_area'].data[0] == 100.0
+
+    # Further edits of the same writeable array are also detected
+    pset.parameters['hru_area'].data[1] = 200.0
+    assert pset.write_parameter_file(filename, skip_unchanged=True)
+    assert ParameterFile(filename, verbose=False).parameters['hru_area'].data[1] == 200.0
+
+
+def test_template_after_in_place_edit(pset, tmpdir):
+    template = pset.file_template()
+
+    data = pset.parameters['tmax_allsnow'].data
+    data[2, 3] = -1.0
+
+    filename = str(tmpdir.join('test.param'))
+    filename2 = str(tmpdir.join('test2.param'))
+    assert 'tmax_allsnow' in template.write(pset, filename)
+    pset.write_parameter_file(filename2)
+
+    with open(filename) as f1, open(filename2) as f2:
+        assert f1.read() == f2.read()
+
+    # Edits after rendering are not served from the template cache either
+    data[2, 4] = -2.0
+    template.write(pset, filename)
+    assert ParameterFile(filename, verbose=False).parameters['tmax_allsnow'].data[2, 4] == -2.0
+
+
+def test_stats_after_in_place_edit(pset):
+    cparam = pset.parameters['hru_area']
+    assert cparam.stats().maximum == pytest.approx(9.0)
+
+    data = cparam.data
+    data[0] = 100.0
+    assert cparam.stats().maximum == pytest.approx(100.0)
+
+    data[0] = 50.0
+    assert cparam.stats().maximum == pytest.approx(50.0)
+
+
+def test_fingerprint_after_in_place_edit(pset):
+    before = pset.fingerprint()
+
+    pset.parameters['hru_area'].data[0] = 100.0
+    assert pset.fingerprint() != before
+
+    pset.parameters['hru_area'].data[0] = 1.5
+    assert pset.fingerprint() == before
+
+
+def test_fingerprint_after_caller_edit(pset):
+    data = np.linspace(1.0, 2.0, NHRU, dtype=np.float32)
+    pset.parameters['hru_area'].data = data
+    before = pset.fingerprint()
+
+    data[0] = 100.0
+    assert pset.fingerprint() != before
+
+
+def test_from_arrays_does_not_modify_caller_arrays():
+    data = np.ones(NHRU, dtype=np.float32)
+    ParameterSet.from_arrays({'hru_area': ('nhru', data)})
+
+    assert data.flags.writeable
@@ -0,0 +1,76 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterFile import ParameterFile
+from pyPRMS.ParameterSet import ParameterSet
+
+NHRU = 6
+NMONTHS = 12
+
+
+@pytest.fixture
+def pset():
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', np.arange(1, NHRU + 1) * 10),
+                                     'hru_area': ('nhru', np.linspace(1.5, 9.0, NHRU)),
+                                     'tmax_allsnow': (('nhru', 'nmonths'), np.full((NHRU, NMONTHS), 32.0)),
+                                     'poi_gage_id': ('npoigages', ['01234567', '07654321'])},
+                                    dimensions={'nhru': NHRU, 'nmonths': NMONTHS, 'npoigages': 2})
+
+
+def _check_same(template, pset, tmpdir):
+    filename = str(tmpdir.join('template.param'))
+    expected = str(tmpdir.join('expected.param'))
+    rendered = template.write(pset, filename)
+    pset.write_parameter_file(expected)
+
+    with open(filename) as f1, open(expected) as f2:
+        assert f1.read() == f2.read()
+    return rendered
+
+
+def test_unchanged_parameters_are_not_rendered(pset, tmpdir):
+    template = pset.file_template(header=['Written by test', 'version 1'])
+
+    assert template.nbytes > 0
+    assert template.render(pset)[1] == []
+
+    filename = str(tmpdir.join('template.param'))
+    template.write(pset, filename)
+
+    with open(filename) as fh:
+        assert fh.readline() == 'Written by test\n'
+
+    pfile = ParameterFile(filename, verbose=False)
+    assert pfile.parameters.get('poi_gage_id').values.tolist() == [b'01234567', b'07654321']
+
+
+def test_overlay_changes(pset, tmpdir):
+    template = pset.file_template()
+
+    overlay = pset.overlay()
+    overlay.update_values('hru_area', 5.0)
+    overlay.update_values('tmax_allsnow', 30.0, hrus=[20])
+
+    assert _check_same(template, overlay, tmpdir) == ['hru_area', 'tmax_allsnow']
+    assert template.render(pset)[1] == []
+
+
+def test_replaced_data(pset, tmpdir):
+    template = pset.file_template()
+
+    # New data with the same values is only matched when the fingerprints are checked
+    pset.parameters.get('tmax_allsnow').data = np.full((NHRU, NMONTHS), 32.0, dtype=np.float32)
+    assert template.render(pset)[1] == ['tmax_allsnow']
+    assert template.render(pset, check_fingerprints=True)[1] == []
+
+    pset.parameters.get('tmax_allsnow').data = np.full((NHRU, NMONTHS), 30.0, dtype=np.float32)
+    assert _check_same(template, pset, tmpdir) == ['tmax_allsnow']
+
+
+def test_changed_dimensions(pset, tmpdir):
+    template = pset.file_template()
+    pset.resize_dimension('nhru', [0, 2, 4])
+
+    assert sorted(_check_same(template, pset, tmpdir)) == ['hru_area', 'nhm_id', 'tmax_allsnow']
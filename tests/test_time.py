@@ -0,0 +1,59 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyPRMS.Statvar import Statvar
+from pyPRMS.prms_helpers import datetime_index, dparse, set_time_index
+
+
+@pytest.mark.parametrize('fields', [([1980, 2000, 2100], ),
+                                    ([1999, 2000, 2000], [12, 2, 11]),
+                                    ([2000, 2000, 2001], [2, 3, 12], [29, 1, 31])])
+def test_same_as_dparse(fields):
+    index = datetime_index(*fields)
+
+    assert index.tolist() == [pd.Timestamp(dparse(*row)) for row in zip(*fields)]
+
+
+def test_time_of_day():
+    index = datetime_index([1995], [6], [15], [23], [59], [30], name='time')
+
+    assert index.name == 'time'
+    assert index[0] == pd.Timestamp('1995-06-15 23:59:30')
+
+
+@pytest.mark.parametrize('fields', [([2001], [2], [29]), ([2000], [4], [31]), ([2000], [1], [0]),
+                                    ([2000], [13], [1]), ([2000], [0])])
+def test_out_of_range(fields):
+    with pytest.raises(ValueError):
+        datetime_index(*fields)
+
+
+def test_set_time_index():
+    df = pd.DataFrame({'yr': [2000, 2000], 'mo': [2, 3], 'dy': [28, 1], 'value': [1.5, 2.5]})
+    values = df['value'].to_numpy()
+
+    assert set_time_index(df, ['yr', 'mo', 'dy']) is df
+    assert df.columns.tolist() == ['value']
+    assert df.index.name == 'time'
+    assert df.index.tolist() == [pd.Timestamp('2000-02-28'), pd.Timestamp('2000-03-01')]
+    assert np.shares_memory(df['value'].to_numpy(), values)
+
+
+def test_statvar(tmpdir):
+    filename = str(tmpdir.join('statvar.txt'))
+
+    with open(filename, 'w') as fh:
+        fh.write('2\nbasin_ppt 1\nseg_outflow 2\n')
+        fh.write('1 1980 10 1 0 0 0 0.5 1.0 2.0\n')
+        fh.write('2 1980 10 2 0 0 0 -999.0 1.5 2.5\n')
+
+    data = Statvar(filename).data
+
+    assert data.index.name == 'thedate'
+    assert data.index.tolist() == [pd.Timestamp('1980-10-01'), pd.Timestamp('1980-10-02')]
+    assert data.columns.tolist() == ['basin_ppt', 'seg_outflow_1', 'seg_outflow_2']
+    assert np.isnan(data['basin_ppt'].iloc[1])
+    assert data['seg_outflow_2'].tolist() == [2.0, 2.5]
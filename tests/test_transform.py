@@ -0,0 +1,109 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.ParameterSet import ParameterSet
+from pyPRMS.ParameterTransform import Adjustment, ParameterTransform
+
+
+@pytest.fixture
+def pset():
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', [10, 20, 30, 40]),
+                                     'hru_area': ('nhru', [1.0, 2.0, 3.0, 4.0]),
+                                     'hru_segment': ('nhru', [1, 1, 2, 2]),
+                                     'jh_coef': (('nhru', 'nmonths'), np.full((4, 12), 0.5))},
+                                    dimensions={'nhru': 4, 'nmonths': 12, 'nsegment': 2})
+
+
+def test_adjust_by_group(pset):
+    grouping = pset.grouping({10: 'a', 20: 'b', 30: 'a'})
+    pset.adjust({'hru_area': [2.0, 10.0]}, grouping=grouping)
+
+    # HRU 40 is not in any group
+    assert pset.parameters.get('hru_area').values.tolist() == [2.0, 20.0, 6.0, 4.0]
+
+
+def test_adjust_by_month(pset):
+    pset.adjust({'jh_coef': np.linspace(0.5, 2.0, 12)}, method='offset')
+
+    data = pset.parameters.get('jh_coef').values
+    assert data[:, 0].tolist() == [1.0, 1.0, 1.0, 1.0]
+
+    # Clipped to the maximum of jh_coef
+    assert (data[:, 11] == 1.5).all()
+
+
+def test_clip_and_round(pset):
+    pset.adjust({'hru_segment': 0.9}, method='scale')
+    assert pset.parameters.get('hru_segment').values.tolist() == [1, 1, 2, 2]
+
+    pset.adjust({'hru_segment': 5}, method='value')
+    assert pset.parameters.get('hru_segment').values.tolist() == [2, 2, 2, 2]
+
+    pset.adjust({'hru_segment': 5}, method='value', clip=False)
+    assert pset.parameters.get('hru_segment').values.tolist() == [5, 5, 5, 5]
+
+
+def test_restore(pset):
+    storage = pset.parameters.get('hru_area').storage
+    transform = pset.adjust({'hru_area': 2.0, 'jh_coef': 2.0})
+    transform2 = pset.adjust({'hru_area': 0.5}, method='offset')
+
+    assert transform.applied
+    assert pset.parameters.get('hru_area').values.tolist() == [2.5, 4.5, 6.5, 8.5]
+
+    with pytest.raises(ValueError):
+        # The data was replaced by the second transform
+        transform.restore()
+
+    transform2.restore()
+    transform.restore()
+    assert not transform.applied
+    assert pset.parameters.get('hru_area').storage is storage
+    assert (pset.parameters.get('jh_coef').values == 0.5).all()
+
+    with pytest.raises(ValueError):
+        transform.restore()
+
+
+def test_restore_writeable_data(pset):
+    data = pset.parameters.get('hru_area').data
+    data[0] = 1.5
+
+    transform = pset.adjust({'hru_area': 2.0})
+
+    # Changes to the replaced array do not change what is restored
+    data[1] = 100.0
+    transform.restore()
+    assert pset.parameters.get('hru_area').values.tolist() == [1.5, 2.0, 3.0, 4.0]
+
+
+def test_adjust_twice_and_restore(pset):
+    transform = ParameterTransform([Adjustment(name='hru_area', method='scale', values=2.0, grouping=None, clip=True),
+                                    Adjustment(name='hru_area', method='offset', values=1.0, grouping=None, clip=True)])
+    applied = transform.apply(pset)
+
+    assert pset.parameters.get('hru_area').values.tolist() == [3.0, 5.0, 7.0, 9.0]
+    assert not transform.applied
+
+    applied.restore()
+    assert pset.parameters.get('hru_area').values.tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_replay(pset):
+    other = ParameterSet.from_arrays({'nhm_id': ('nhru', [1, 2, 3, 4]), 'hru_area': ('nhru', [4.0, 3.0, 2.0, 1.0])})
+    transform = pset.adjust({'hru_area': 3.0})
+
+    transform.apply(other)
+    assert other.parameters.get('hru_area').values.tolist() == [12.0, 9.0, 6.0, 3.0]
+
+
+def test_invalid_adjustment_leaves_data_unchanged(pset):
+    with pytest.raises(ValueError):
+        pset.adjust({'hru_area': 2.0, 'jh_coef': [1.0, 2.0]}, grouping=pset.grouping({10: 'a'}))
+
+    assert pset.parameters.get('hru_area').values.tolist() == [1.0, 2.0, 3.0, 4.0]
+
+    with pytest.raises(ValueError):
+        pset.adjust({'hru_area': 2.0}, method='power')
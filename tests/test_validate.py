@@ -0,0 +1,88 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.constants import NETCDF_FILLVALUES
+from pyPRMS.ParameterSet import ParameterSet
+
+
+@pytest.fixture
+def pset():
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', [10, 20, 30]),
+                                     'hru_area': ('nhru', [1.0, 2.0, 3.0]),
+                                     'jh_coef': (('nhru', 'nmonths'), np.full((3, 12), 0.014))})
+
+
+def test_valid(pset):
+    report = pset.validate()
+
+    assert report.index.tolist() == ['nhm_id', 'hru_area', 'jh_coef']
+    assert report['ok'].all()
+    assert report['master_dims_ok'].tolist() == [True, True, True]
+    assert report.loc['jh_coef', 'size'] == 36
+    assert report.loc['jh_coef', 'minimum'] == -0.5
+    assert report.loc['jh_coef', 'maximum'] == 1.5
+
+
+def test_parameter_without_master_is_ok(pset):
+    pset.parameters.add('my_param', datatype=1)
+    cparam = pset.parameters.get('my_param')
+    cparam.dimensions.add('nhru', 3)
+    cparam.data = [1, 2, 3]
+
+    report = pset.validate()
+    assert report.loc['my_param', 'master_dims_ok'] is None
+    assert report.loc['my_param', 'ok']
+    assert report['ok'].dtype == bool
+
+
+def test_master_dimensions():
+    report = ParameterSet.from_arrays({'jh_coef': ('nhru', [0.1, 0.2, 0.3]),
+                                       'hru_area': ('ngw', [1.0, 2.0, 3.0])}).validate()
+
+    # HRU dimensions can be used in place of each other
+    assert report['master_dims_ok'].tolist() == [False, True]
+    assert report['ok'].tolist() == [False, True]
+
+
+def test_sizes(pset):
+    pset.dimensions.get('nhru').size = 4
+    pset.parameters.get('hru_area').dimensions.get('nhru').size = 4
+
+    report = pset.validate()
+    assert report['dims_ok'].tolist() == [False, True, False]
+    assert report['size_ok'].tolist() == [True, False, True]
+    assert not report['ok'].any()
+
+
+def test_value_counts(pset):
+    pset.parameters.get('hru_area').data = [np.nan, -1.0, 2e9]
+    data = np.full((3, 12), 0.014)
+    data[0, :2] = NETCDF_FILLVALUES[2]
+    data[1, 3] = 2.0
+    pset.parameters.get('jh_coef').data = data
+
+    report = pset.validate()
+    assert report.loc['hru_area', ['nan_count', 'below_min', 'above_max']].tolist() == [1, 1, 1]
+    assert report.loc['jh_coef', ['nan_count', 'fill_count', 'below_min', 'above_max']].tolist() == [0, 2, 0, 3]
+    assert report['ok'].tolist() == [True, False, False]
+
+
+def test_compact_storage():
+    # Compact storage needs at least 64 values
+    data = np.full((6, 12), 0.014)
+    data[1, :] = -1.0
+    pset = ParameterSet.from_arrays({'jh_coef': (('nhru', 'nmonths'), data)})
+    expected = pset.validate()
+
+    assert pset.parameters.get('jh_coef').encode()
+    report = pset.validate()
+    assert report.loc['jh_coef', 'below_min'] == 12
+    assert report.drop(columns='layout_ok').equals(expected.drop(columns='layout_ok'))
+
+
+def test_parallel(pset):
+    pset.parameters.get('hru_area').data = [np.nan, 2.0, 3.0]
+
+    assert pset.validate(parallel=True, max_workers=2).equals(pset.validate())
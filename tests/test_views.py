@@ -0,0 +1,129 @@
+from __future__ import (absolute_import, division, print_function)
+
+import numpy as np
+import pytest
+
+from pyPRMS.Exceptions_custom import ParameterError
+from pyPRMS.ParameterFile import ParameterFile
+from pyPRMS.ParameterSet import ParameterSet
+
+
+@pytest.fixture
+def pset():
+    """Four HRUs draining to a network of three segments, with two cascades and one POI."""
+
+    return ParameterSet.from_arrays({'nhm_id': ('nhru', [10, 20, 30, 40]),
+                                     'nhm_seg': ('nsegment', [100, 200, 300]),
+                                     'hru_area': ('nhru', [1.0, 2.0, 3.0, 4.0]),
+                                     'hru_segment': ('nhru', [1, 2, 3, 0]),
+                                     'hru_segment_nhm': ('nhru', [100, 200, 300, 0]),
+                                     'tosegment': ('nsegment', [2, 3, 0]),
+                                     'tosegment_nhm': ('nsegment', [200, 300, 0]),
+                                     'seg_length': ('nsegment', [5.0, 6.0, 7.0]),
+                                     'poi_gage_segment': ('npoigages', [3]),
+                                     'hru_up_id': ('ncascade', [1, 3]),
+                                     'hru_down_id': ('ncascade', [2, 4]),
+                                     'hru_strmseg_down_id': ('ncascade', [0, 3])})
+
+
+def test_subset_and_renumber(pset):
+    view = pset.view(hrus=[20, 30], segs=[200, 300])
+
+    assert view.dimensions.get('nhru').size == 2
+    assert view.dimensions.get('nsegment').size == 2
+    assert view.parameters.get('hru_area').data.tolist() == [2.0, 3.0]
+    assert view.parameters.get('seg_length').data.tolist() == [6.0, 7.0]
+    assert view.parameters.get('hru_segment').data.tolist() == [1, 2]
+    assert view.parameters.get('tosegment').data.tolist() == [2, 0]
+    assert view.parameters.get('poi_gage_segment').data.tolist() == [2]
+
+
+def test_renumbered_indices_keep_dtype(pset):
+    view = pset.view(hrus=[20, 30], segs=[200, 300])
+
+    for name in ['hru_segment', 'tosegment', 'poi_gage_segment', 'hru_up_id']:
+        assert view.parameters.get(name).data.dtype == np.int32
+
+
+def test_references_outside_the_view(pset):
+    view = pset.view(hrus=[10, 30, 40], segs=[100, 300])
+
+    # Segment 200 is not part of the view
+    assert view.parameters.get('tosegment').data.tolist() == [0, 0]
+    assert view.parameters.get('tosegment_nhm').data.tolist() == [0, 0]
+    assert view.parameters.get('hru_segment_nhm').data.tolist() == [100, 300, 0]
+
+    # Cascades are not subset; HRU 2 is not part of the view
+    assert view.parameters.get('hru_up_id').data.tolist() == [1, 2]
+    assert view.parameters.get('hru_down_id').data.tolist() == [0, 3]
+    assert view.parameters.get('hru_strmseg_down_id').data.tolist() == [0, 2]
+
+
+def test_reading_does_not_change_the_parent(pset):
+    cparam = pset.parameters.get('hru_area')
+    cparam.data[0] = 1.5
+
+    view = pset.view()
+    assert not view.parameters.get('hru_area').data.flags.writeable
+
+    assert cparam.storage.flags.writeable
+    cparam.data[1] = 2.5
+    assert view.parameters.get('hru_area').data.tolist() == [1.5, 2.5, 3.0, 4.0]
+
+
+def test_view_is_read_only(pset):
+    view = pset.view(hrus=[20, 30])
+    cparam = view.parameters.get('hru_area')
+
+    with pytest.raises(ValueError):
+        cparam.data[0] = 100.0
+
+    for func in [lambda: cparam.materialize(), lambda: cparam.encode(),
+                 lambda: cparam.subset_by_index('nhru', [0]), lambda: cparam.remove_by_index('nhru', [0]),
+                 lambda: setattr(cparam, 'data', np.zeros(2)), lambda: setattr(cparam, 'units', 'acres'),
+                 lambda: view.parameters.add('jh_coef'), lambda: view.parameters.remove('hru_area'),
+                 lambda: view.encode(), lambda: view.resize_dimension('nhru', [0]), lambda: view.overlay(),
+                 lambda: view.file_template(), lambda: view.adjust('hru_area', 'scale', 2.0)]:
+        with pytest.raises(ParameterError):
+            func()
+
+    assert pset.parameters.get('hru_area').values.tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_drop_in_parameters(pset):
+    view = pset.view(hrus=[20, 30], segs=[200, 300])
+
+    df = view.parameters.get_dataframe('hru_area')
+    assert df.index.tolist() == [20, 30]
+    assert df['hru_area'].tolist() == [2.0, 3.0]
+
+    assert [cparam.name for cparam in view.parameters.by_dimension('nsegment')] == \
+        ['nhm_seg', 'tosegment', 'tosegment_nhm', 'seg_length']
+    assert 'hru_area' in view.parameters
+    assert list(view.parameters.keys()) == list(pset.parameters.keys())
+
+
+def test_write(pset, tmpdir):
+    filename = str(tmpdir.join('view.param'))
+    pset.view(hrus=[20, 30], segs=[200, 300]).write_parameter_file(filename)
+
+    pfile = ParameterFile(filename, verbose=False)
+    assert pfile.dimensions.get('nhru').size == 2
+    assert pfile.parameters.get('nhm_id').values.tolist() == [20, 30]
+    assert pfile.parameters.get('tosegment').values.tolist() == [2, 0]
+
+
+def test_detach(pset):
+    pset.encode()
+    detached = pset.view(hrus=[20, 30], segs=[200, 300]).detach(names=['hru_area', 'tosegment', 'poi_gage_segment'])
+
+    assert list(detached.parameters.keys()) == ['hru_area', 'tosegment', 'poi_gage_segment']
+    assert detached.dimensions.get('nhru').size == 2
+    assert detached.parameters.get('hru_area').values.tolist() == [2.0, 3.0]
+    assert detached.parameters.get('tosegment').values.tolist() == [2, 0]
+    assert detached.parameters.get('hru_area').units == 'acres'
+
+    # Data which the view does not change is shared with the parent
+    detached = pset.view(segs=[200, 300]).detach()
+    assert detached.parameters.get('hru_area').storage is pset.parameters.get('hru_area').storage
+    assert detached.parameters.get('seg_length').values.tolist() == [6.0, 7.0]